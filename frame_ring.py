@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+
+from multiprocessing import shared_memory
+
+'''
+    Shared-memory ring of fixed-size frame slots
+
+    - One SharedMemory block: a header table (one int64 row per slot) followed by
+      the slot data (max_height x max_width x 3 uint8 each)
+    - Writer (web process): acquire() a slot, decode / resize into it, commit()
+    - Reader (inference process): claim() the slot by (index, sequence), use the
+      frame in place, release() it
+    - A slot is only recycled while it is READY (written, not yet claimed); the
+      sequence number changes on every write, so a reader holding a stale task
+      finds the mismatch in claim() and skips it instead of reading a newer frame
+    - State transitions take a multiprocessing lock; copies happen outside it
+'''
+
+FREE, WRITING, READY, READING = 0, 1, 2, 3
+STATE_NAMES = {FREE: 'free', WRITING: 'writing', READY: 'ready', READING: 'reading'}
+
+# Header columns
+SEQUENCE, STATE, HEIGHT, WIDTH, WRITE_ORDER = range(5)
+HEADER_FIELDS = 5
+
+class SharedFrameRing:
+    def __init__(self, lock, slots = 8, max_height = 480, max_width = 640, name = None):
+        '''
+            lock: multiprocessing.Lock shared by every process using the ring
+            name: attach to an existing ring (inference process) instead of creating one
+        '''
+        self.lock = lock
+        self.slots = slots
+        self.max_height = max_height
+        self.max_width = max_width
+        self.slot_bytes = max_height * max_width * 3
+        header_bytes = slots * HEADER_FIELDS * 8
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create = True, size = header_bytes + slots * self.slot_bytes)
+        else:
+            # Spawned processes share the creator's resource tracker, so only close() here
+            self.shm = shared_memory.SharedMemory(name = name)
+
+        self.header = np.ndarray((slots, HEADER_FIELDS), dtype = np.int64, buffer = self.shm.buf)
+        self.data = np.ndarray((slots, self.slot_bytes), dtype = np.uint8, buffer = self.shm.buf, offset = header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+        # Writer-side counters (web process)
+        self.sequence = 0
+        self.stats = {'writes': 0, 'dropped': 0, 'recycled': 0}
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        # Arguments for attaching from another process
+        return {'name': self.name, 'slots': self.slots, 'max_height': self.max_height, 'max_width': self.max_width}
+
+    def view(self, index, height, width):
+        # (height, width, 3) array over a slot's memory (no copy)
+        return self.data[index, :height * width * 3].reshape(height, width, 3)
+
+    def fit(self, height, width):
+        # Frame size inside the slot limits, keeping the aspect ratio
+        scale = min(1.0, self.max_height / height, self.max_width / width)
+        return max(int(height * scale), 1), max(int(width * scale), 1)
+
+    def acquire(self, height, width):
+        # Reserve a slot for writing; returns (index, sequence, view) or None if every slot is busy
+        with self.lock:
+            states = self.header[:, STATE]
+            free = np.flatnonzero(states == FREE)
+            if len(free):
+                index = int(free[0])
+            else:
+                # Recycle the oldest unclaimed frame (its task will find a new sequence)
+                ready = np.flatnonzero(states == READY)
+                if not len(ready):
+                    self.stats['dropped'] += 1
+                    return None
+                index = int(ready[np.argmin(self.header[ready, WRITE_ORDER])])
+                self.stats['recycled'] += 1
+            self.sequence += 1
+            self.header[index, SEQUENCE] = self.sequence
+            self.header[index, STATE] = WRITING
+            self.header[index, HEIGHT] = height
+            self.header[index, WIDTH] = width
+            self.header[index, WRITE_ORDER] = self.sequence
+            return index, self.sequence, self.view(index, height, width)
+
+    def commit(self, index, sequence):
+        with self.lock:
+            if self.header[index, SEQUENCE] == sequence:
+                self.header[index, STATE] = READY
+                self.stats['writes'] += 1
+
+    def abort(self, index, sequence):
+        with self.lock:
+            if self.header[index, SEQUENCE] == sequence:
+                self.header[index, STATE] = FREE
+
+    def write(self, frame):
+        # Copy (or resize, if larger than a slot) a BGR frame into the ring; returns (index, sequence) or None
+        height, width = self.fit(*frame.shape[:2])
+        slot = self.acquire(height, width)
+        if slot is None:
+            return None
+        index, sequence, view = slot
+        try:
+            if (height, width) == frame.shape[:2]:
+                np.copyto(view, frame)
+            else:
+                cv2.resize(frame, (width, height), dst = view, interpolation = cv2.INTER_AREA)
+        except Exception:
+            self.abort(index, sequence)
+            raise
+        self.commit(index, sequence)
+        return index, sequence
+
+    def claim(self, index, sequence):
+        # Reader: the slot's frame in place, or None if it was recycled since the task was queued
+        with self.lock:
+            if self.header[index, SEQUENCE] != sequence or self.header[index, STATE] != READY:
+                return None
+            self.header[index, STATE] = READING
+            height, width = int(self.header[index, HEIGHT]), int(self.header[index, WIDTH])
+        return self.view(index, height, width)
+
+    def release(self, index, sequence):
+        with self.lock:
+            if self.header[index, SEQUENCE] == sequence:
+                self.header[index, STATE] = FREE
+
+    def status(self):
+        # Occupancy by slot state plus writer counters
+        with self.lock:
+            states = self.header[:, STATE].copy()
+        occupancy = {name: int((states == state).sum()) for state, name in STATE_NAMES.items()}
+        return {
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes,
+            **occupancy,
+            'occupancy': round(1 - occupancy['free'] / self.slots, 3),
+            **self.stats
+        }
+
+    def close(self):
+        # Detach (and free the block if this process created it)
+        del self.header, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,68 @@
+import os
+
+'''
+    Gunicorn multi-worker deployment for main.py
+
+    - Run: gunicorn -c gunicorn_conf.py main:app
+    - The app is imported once in the master (preload_app), which also reads the pose
+      model files before fork; every worker then warms its own MediaPipe graphs
+    - Worker i owns port BASE_PORT + i only, and a replacement worker takes over the
+      same shard. Sessions stay on one worker because the front proxy hashes the
+      session id wherever the request carries it, e.g. for nginx:
+
+        map $uri $frame_session {
+            ~^/frame/([^/]+)/  $1;
+            default            "";
+        }
+
+        upstream pose_workers {
+            hash $http_x_session_id$arg_session_id$frame_session consistent;
+            server 127.0.0.1:5001;
+            server 127.0.0.1:5002;
+        }
+
+      - /process_frame and the other fetch() calls of option1.js: X-Session-Id header
+      - /events (EventSource cannot set headers) and /result_image: session_id query argument
+      - /frame/<session_id>/...: the <img> request behind 'image_url' sends neither, so
+        the session id is taken from the path by the map
+      - /recording_analytics/<recording_id> belongs to no session: it hashes to the
+        empty key, one fixed worker, which keeps its analytics cache warm (any worker
+        could answer it from Firebase)
+
+    - Recording state lives in POSE_RECORDING_DIR (see recording_store.FileRecording),
+      so start / stop / status requests may land on any worker
+    - Every open /events stream holds one worker thread, so threads is sized for one
+      stream plus the frame / image requests of each tab on the shard
+'''
+
+POSE_WORKERS = int(os.environ.get('POSE_WORKERS', 2))
+BASE_PORT = int(os.environ.get('POSE_BASE_PORT', 5001))
+
+# Must be set before main is imported (preload_app imports it in the master)
+os.environ.setdefault('POSE_RECORDING_DIR', '/tmp/cogniactive-recording')
+
+workers = POSE_WORKERS
+bind = [f'0.0.0.0:{BASE_PORT + shard}' for shard in range(POSE_WORKERS)]
+worker_class = 'gthread'
+threads = int(os.environ.get('POSE_WORKER_THREADS', 32))
+preload_app = True
+timeout = 60
+
+def when_ready(server):
+    # Master, after the app is loaded and before the first fork
+    import main
+    main.preload_models()
+
+def pre_fork(server, worker):
+    # Give the new worker the lowest shard no live worker owns (runs in the master)
+    used = {getattr(live, 'shard', None) for live in server.WORKERS.values()}
+    worker.shard = next(shard for shard in range(POSE_WORKERS) if shard not in used)
+
+def post_fork(server, worker):
+    # Keep only this shard's listener, then warm the models in the background
+    worker.sockets = [worker.sockets[worker.shard]]
+    os.environ['POSE_WORKER_SHARD'] = str(worker.shard)
+    server.log.info(f"Worker {worker.pid} serves shard {worker.shard} on port {BASE_PORT + worker.shard}")
+
+    import main
+    main.startup()
@@ -0,0 +1,227 @@
+import time
+import zlib
+import queue
+import threading
+import multiprocessing as mp
+
+from frame_ring import SharedFrameRing
+
+'''
+    Out-of-process pose inference over a shared-memory frame ring
+
+    - The web process decodes each frame straight into a ring slot and queues only
+      (slot, sequence, session_id, received_at, stride) to the owning process
+    - A session is pinned to one process by a stable hash of its id, so its pose
+      graph, tracker, gate and controller live in that process only
+    - Inference processes gate, infer, draw and encode on the slot in place, release
+      it, and send back (result, jpeg) for the web process to publish
+    - Enabled in main.py with POSE_INFERENCE_PROCESSES=N
+'''
+
+class RecordingRelay:
+    # Stand-in for main.recording inside an inference process: the web process records
+    def __init__(self, results):
+        self.results = results
+
+    def add(self, landmarks, predicted = False, kinematics = None):
+        self.results.put(('record', landmarks, predicted, kinematics))
+
+def inference_process(index, ring_spec, lock, tasks, results, expire_interval, queue_capacity):
+    # Entry point of an inference process (spawned, so main is imported fresh here)
+    # queue_capacity: most tasks this process can have waiting (its queue, bounded by the ring)
+    import main
+    from pose_pipeline import landmarks_to_array
+
+    ring = SharedFrameRing(lock, **ring_spec)
+    main.recording = RecordingRelay(results)
+    try:
+        main.warm_up_models()
+    except Exception as e:
+        results.put(('failed', index, str(e)))
+        return
+    results.put(('ready', index, None))
+
+    last_expiry = time.time()
+    while True:
+        if time.time() - last_expiry > expire_interval:
+            main.expire_sessions()
+            last_expiry = time.time()
+
+        try:
+            task = tasks.get(timeout = 1.0)
+        except queue.Empty:
+            continue
+        if task is None:
+            break
+
+        slot, sequence, session_id, received_at, inference_stride = task
+        frame = ring.claim(slot, sequence)
+        if frame is None:
+            # Recycled by the writer before we got to it
+            results.put(('stale', index, session_id))
+            continue
+
+        session = main.get_session(session_id)
+        session.inference_stride = inference_stride
+        started = time.time()
+        try:
+            processed = main.process_decoded_frame(session, frame, received_at)
+        except Exception as e:
+            print(f"[ERROR] Inference process {index}: {e}")
+            processed = None
+        finally:
+            ring.release(slot, sequence)
+
+        frame = None
+        if processed is None:
+            continue
+        result, jpeg = processed
+
+        # Let the controller adapt quality to this process's backlog
+        session.controller.record(time.time() - started, tasks.qsize(), queue_capacity, len(main.sessions))
+
+        with main.lock:
+            landmarks = main.latest_landmarks
+        points = landmarks_to_array(landmarks.landmark) if result['landmarks'] is not None and landmarks else None
+        status = {
+            **session.controller.status(),
+            'roi': session.cropper.status(),
+            'gate': session.gate.status(),
+            'buffers': session.buffers.status(),
+            'inference_stride': session.inference_stride,
+            'inference_process': index
+        }
+        results.put(('result', session_id, (result, jpeg, points, status)))
+
+    with main.sessions_lock:
+        for session in main.sessions.values():
+            session.close()
+    ring.close()
+
+class InferencePool:
+    def __init__(self, processes, publish, record, expire, expire_interval = 30,
+                 slots_per_process = 4, max_height = 480, max_width = 640):
+        '''
+            publish(session_id, result, jpeg, points, status): called for every processed frame
+            record(landmarks, predicted, kinematics): recording hook (main.recording.add)
+            expire(): idle-session cleanup in the web process, every expire_interval seconds
+        '''
+        context = mp.get_context('spawn')
+        self.lock = context.Lock()
+        self.ring = SharedFrameRing(self.lock, slots = processes * slots_per_process,
+                                    max_height = max_height, max_width = max_width)
+        self.task_capacity = slots_per_process * 2
+        self.tasks = [context.Queue(maxsize = self.task_capacity) for _ in range(processes)]
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(
+                target = inference_process,
+                args = (index, self.ring.spec(), self.lock, self.tasks[index], self.results, expire_interval,
+                        min(self.task_capacity, self.ring.slots)),
+                daemon = True
+            )
+            for index in range(processes)
+        ]
+        self.publish = publish
+        self.record = record
+        self.expire = expire
+        self.expire_interval = expire_interval
+
+        self.ready = set()
+        self.failures = {}
+        self.ready_event = threading.Event()
+        self.active = False
+        self.collector = None
+        self.stats = {'submitted': 0, 'dropped': 0, 'stale': 0, 'results': 0}
+
+    def start(self, timeout = 300):
+        # Start the processes and block until every one has warmed its models
+        self.active = True
+        for process in self.processes:
+            process.start()
+        self.collector = threading.Thread(target = self.collect, daemon = True)
+        self.collector.start()
+        if not self.ready_event.wait(timeout):
+            raise RuntimeError('Inference processes did not become ready')
+        if self.failures:
+            raise RuntimeError(f'Inference process failed: {self.failures}')
+
+    def owner(self, session_id):
+        # Stable across restarts (unlike hash())
+        return zlib.crc32(session_id.encode('utf-8')) % len(self.processes)
+
+    def submit(self, session, frame, received_at):
+        # Write a decoded frame into the ring and queue it; False if it had to be dropped
+        slot = self.ring.write(frame)
+        if slot is None:
+            self.stats['dropped'] += 1
+            return False
+        try:
+            self.tasks[self.owner(session.session_id)].put_nowait(
+                (*slot, session.session_id, received_at, session.inference_stride))
+        except queue.Full:
+            self.ring.release(*slot)
+            self.stats['dropped'] += 1
+            return False
+        self.stats['submitted'] += 1
+        return True
+
+    def collect(self):
+        # Web-process thread: publish results, forward recordings, expire idle sessions
+        last_expiry = time.time()
+        while self.active:
+            if time.time() - last_expiry > self.expire_interval:
+                self.expire()
+                last_expiry = time.time()
+
+            try:
+                message = self.results.get(timeout = 0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                kind = message[0]
+                if kind == 'result':
+                    self.stats['results'] += 1
+                    self.publish(message[1], *message[2])
+                elif kind == 'record':
+                    self.record(*message[1:])
+                elif kind == 'stale':
+                    self.stats['stale'] += 1
+                elif kind == 'ready':
+                    self.ready.add(message[1])
+                    if len(self.ready) == len(self.processes):
+                        self.ready_event.set()
+                elif kind == 'failed':
+                    self.failures[message[1]] = message[2]
+                    self.ready_event.set()
+            except Exception as e:
+                print(f"[ERROR] Inference result handling: {e}")
+
+    def alive(self):
+        return self.active and all(process.is_alive() for process in self.processes)
+
+    def status(self):
+        return {
+            'processes': len(self.processes),
+            'alive': sum(process.is_alive() for process in self.processes),
+            'task_queues': [tasks.qsize() for tasks in self.tasks],
+            'task_capacity': self.task_capacity,
+            'ring': self.ring.status(),
+            **self.stats
+        }
+
+    def stop(self):
+        for tasks in self.tasks:
+            try:
+                tasks.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout = 5)
+            if process.is_alive():
+                process.terminate()
+        self.active = False
+        if self.collector is not None:
+            self.collector.join(timeout = 2)
+        self.ring.close()
@@ -0,0 +1,567 @@
+import os
+import sys
+import json
+import time
+import base64
+import bisect
+import threading
+import subprocess
+import http.client
+import numpy as np
+import cv2
+
+from collections import Counter
+from urllib.parse import urlsplit
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+'''
+    Load generator: N simulated option1.js clients against a pose server
+
+    - Each client posts frames from a video file (or synthetic frames) to /process_frame,
+      pacing itself like option1.js: the next frame goes out one interval after the
+      reply, at --fps or at the server-recommended 'capture' interval and size
+    - Status: every client polls /queue_status every 5 s, or holds an /events stream (--events)
+    - Client 0 starts and stops a recording during the run (--record-after / --record-seconds)
+    - Measured per step: latency percentiles per endpoint, staleness (frames sent since
+      the frame a shown result came from, via the result's 'received_at'), drop rate
+      (frames never seen in a result), reply statuses, and server CPU / RSS (whole
+      process tree, so inference processes count too)
+    - --launch starts a local main.py with the Firebase database stubbed out and stops it
+      afterwards; otherwise point --url at a running server (and --server-pid to sample it)
+    - --clients 5,10,20,40 runs one step per client count to find the breaking point
+
+    Example: python load_generator.py --launch --video clip.mp4 --clients 2,4,8,16 --duration 30
+'''
+
+FRAME_QUALITY = 60          # option1.js: toDataURL('image/jpeg', 0.6)
+DEFAULT_CAPTURE_WIDTH = 320
+DEFAULT_INTERVAL_MS = 100
+STATUS_POLL_INTERVAL = 5.0
+REQUEST_TIMEOUT = 30
+
+class StubSnapshot:
+    def __init__(self, value):
+        self.value = value
+
+    def val(self):
+        return self.value
+
+class StubNode:
+    # One path of a StubDatabase: child(), push(), set() and get().val() like pyrebase
+    def __init__(self, stub, path):
+        self.stub = stub
+        self.path = path
+
+    def child(self, name):
+        return StubNode(self.stub, self.path + (str(name),))
+
+    def parent(self, create):
+        node = self.stub.data
+        for name in self.path[:-1]:
+            if create:
+                node = node.setdefault(name, {})
+            elif not isinstance(node.get(name), dict):
+                return None
+            else:
+                node = node[name]
+        return node
+
+    def push(self, data):
+        self.stub.pushed['/'.join(self.path)] += 1
+        key = f'stub-{sum(self.stub.pushed.values())}'
+        self.child(key).set(data)
+        return {'name': key}
+
+    def set(self, data):
+        with self.stub.lock:
+            self.parent(create = True)[self.path[-1]] = json.loads(json.dumps(data))
+
+    def get(self):
+        with self.stub.lock:
+            node = self.parent(create = False)
+            value = node.get(self.path[-1]) if node is not None else None
+            return StubSnapshot(json.loads(json.dumps(value)))
+
+class StubDatabase:
+    # Stand-in for the pyrebase database, kept in memory as a nested dict
+    def __init__(self):
+        self.data = {}
+        self.pushed = Counter()
+        self.lock = threading.Lock()
+
+    def child(self, name):
+        return StubNode(self, (str(name),))
+
+def serve_stubbed(port):
+    # Entry point of the --launch server process
+    import main
+    main.db = StubDatabase()
+    try:
+        main.startup()
+        main.app.run(debug = False, threaded = True, host = '127.0.0.1', port = port)
+    finally:
+        main.stop_processing_thread()
+
+class FrameSource:
+    def __init__(self, path = None, max_frames = 300):
+        '''
+            Frames of a video file (or moving synthetic frames), encoded on demand per
+            capture width the way option1.js does (canvas resize + JPEG data URL)
+        '''
+        self.frames = self.read_video(path, max_frames) if path else self.synthetic_frames(max_frames)
+        if not self.frames:
+            raise ValueError(f'No frames read from {path}')
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def read_video(path, max_frames):
+        capture = cv2.VideoCapture(path)
+        frames = []
+        while len(frames) < max_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+        return frames
+
+    @staticmethod
+    def synthetic_frames(count):
+        # A bright block moving over noise, so the frame gate sees real changes
+        rng = np.random.default_rng(0)
+        frames = []
+        for i in range(count):
+            frame = rng.integers(0, 60, (480, 640, 3), dtype = np.uint8)
+            x = int(320 + 200 * np.sin(i / 15))
+            cv2.rectangle(frame, (x - 60, 140), (x + 60, 400), (200, 180, 160), -1)
+            frames.append(frame)
+        return frames
+
+    def get(self, index, width):
+        width = int(width)
+        with self.lock:
+            encoded = self.encoded.get(width)
+            if encoded is None:
+                encoded = self.encoded[width] = [None] * len(self.frames)
+        position = index % len(self.frames)
+        if encoded[position] is None:
+            # Canvas drawImage stretches to the canvas size (4:3)
+            frame = cv2.resize(self.frames[position], (width, width * 3 // 4), interpolation = cv2.INTER_AREA)
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, FRAME_QUALITY])
+            encoded[position] = 'data:image/jpeg;base64,' + base64.b64encode(buffer).decode('ascii')
+        return encoded[position]
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = Counter()
+        self.events = Counter()
+        self.staleness = []
+        self.frames_sent = 0
+        self.frames_seen = 0
+        self.errors = Counter()
+
+    def request(self, endpoint, seconds, status = None):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if status is not None:
+                self.statuses[status] += 1
+
+    def error(self, endpoint, error):
+        with self.lock:
+            self.errors[f'{endpoint}: {type(error).__name__}'] += 1
+
+    def summary(self, duration):
+        with self.lock:
+            latency = {
+                endpoint: {
+                    'count': len(values),
+                    'p50_ms': round(float(np.percentile(values, 50)) * 1000, 1),
+                    'p90_ms': round(float(np.percentile(values, 90)) * 1000, 1),
+                    'p99_ms': round(float(np.percentile(values, 99)) * 1000, 1),
+                    'max_ms': round(max(values) * 1000, 1)
+                }
+                for endpoint, values in self.latencies.items() if values
+            }
+            staleness = {
+                'mean_frames': round(float(np.mean(self.staleness)), 2),
+                'p90_frames': float(np.percentile(self.staleness, 90)),
+                'max_frames': max(self.staleness)
+            } if self.staleness else None
+            return {
+                'frames_sent': self.frames_sent,
+                'frames_per_second': round(self.frames_sent / duration, 1),
+                'results_per_second': round(self.frames_seen / duration, 1),
+                'drop_rate': round(1 - self.frames_seen / self.frames_sent, 3) if self.frames_sent else None,
+                'staleness': staleness,
+                'latency': latency,
+                'statuses': dict(self.statuses),
+                'events': dict(self.events),
+                'errors': dict(self.errors)
+            }
+
+class Connection:
+    # One keep-alive HTTP connection (a browser tab reuses its connections too)
+    def __init__(self, base_url, session_id):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.headers = {'X-Session-Id': session_id}
+        self.connection = None
+
+    def request(self, method, path, payload = None):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout = REQUEST_TIMEOUT)
+        headers = dict(self.headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except Exception:
+            self.close()
+            raise
+        return response.status, json.loads(data) if data else None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class SimulatedClient(threading.Thread):
+    def __init__(self, index, base_url, frames, stats, stop_event, fps = None, events = False,
+                 record_after = None, record_seconds = None):
+        super().__init__(daemon = True)
+        self.index = index
+        self.session_id = f'load-{os.getpid()}-{index}'
+        self.base_url = base_url
+        self.frames = frames
+        self.stats = stats
+        self.stop_event = stop_event
+        self.fps = fps
+        self.use_events = events
+        self.record_after = record_after
+        self.record_seconds = record_seconds
+
+        self.connection = Connection(base_url, self.session_id)
+        self.send_times = []
+        self.seen_versions = set()
+        self.seen_frames = set()
+        self.observe_lock = threading.Lock()
+        self.width = DEFAULT_CAPTURE_WIDTH
+        self.interval = 1 / fps if fps else DEFAULT_INTERVAL_MS / 1000
+        self.last_version = None
+        self.last_epoch = None
+        self.event_connection = None
+
+    def call(self, endpoint, method = 'GET', payload = None):
+        started = time.time()
+        try:
+            status, data = self.connection.request(method, endpoint, payload)
+        except Exception as e:
+            self.stats.error(endpoint, e)
+            return None
+        reply_status = data.get('status') if isinstance(data, dict) else None
+        self.stats.request(endpoint, time.time() - started, reply_status if endpoint == '/process_frame' else None)
+        if status >= 400 and status != 503:
+            self.stats.error(endpoint, RuntimeError(status))
+        return data
+
+    def observe(self, result):
+        # Account a result once per version: which sent frame it came from and how far behind it is
+        if result.get('status') != 'success' or result.get('received_at') is None:
+            return
+        with self.observe_lock:
+            key = (result.get('epoch'), result['version'])
+            if key in self.seen_versions:
+                return
+            self.seen_versions.add(key)
+            source = bisect.bisect_right(self.send_times, result['received_at']) - 1
+            if source < 0:
+                return
+            new_frame = source not in self.seen_frames
+            self.seen_frames.add(source)
+            latest = len(self.send_times) - 1
+        with self.stats.lock:
+            self.stats.staleness.append(latest - source)
+            if new_frame:
+                self.stats.frames_seen += 1
+
+    def run(self):
+        if self.use_events:
+            threading.Thread(target = self.read_events, daemon = True).start()
+
+        self.call('/start_processing', 'POST')
+        started = time.time()
+        next_poll = started + STATUS_POLL_INTERVAL
+        recording = False
+        frame_index = self.index * 7
+
+        while not self.stop_event.is_set():
+            image = self.frames.get(frame_index, self.width)
+            frame_index += 1
+
+            with self.observe_lock:
+                self.send_times.append(time.time())
+            with self.stats.lock:
+                self.stats.frames_sent += 1
+
+            reply = self.call('/process_frame', 'POST', {
+                'image': image,
+                'session_id': self.session_id,
+                'last_version': self.last_version,
+                'last_epoch': self.last_epoch
+            })
+            if reply is not None:
+                self.apply_reply(reply)
+
+            # Status polling (option1.js before the event stream)
+            now = time.time()
+            if not self.use_events and now >= next_poll:
+                self.call('/queue_status')
+                next_poll = now + STATUS_POLL_INTERVAL
+
+            # One client drives the recording
+            if self.record_after is not None:
+                elapsed = now - started
+                if not recording and self.record_after <= elapsed < self.record_after + self.record_seconds:
+                    recording = self.call('/start_recording', 'POST') is not None
+                elif recording and elapsed >= self.record_after + self.record_seconds:
+                    self.call('/stop_recording', 'POST')
+                    recording = False
+
+            self.stop_event.wait(self.interval)
+
+        if recording:
+            self.call('/stop_recording', 'POST')
+        self.connection.close()
+        if self.event_connection is not None:
+            self.event_connection.close()
+
+    def apply_reply(self, reply):
+        capture = reply.get('capture')
+        if capture and not self.fps:
+            self.interval = capture['interval_ms'] / 1000
+            self.width = capture['width']
+        if reply.get('status') == 'success':
+            self.last_version = reply.get('version')
+            self.last_epoch = reply.get('epoch')
+            self.observe(reply)
+
+    def read_events(self):
+        # One /events stream per client; results pushed here count like polled ones
+        url = urlsplit(self.base_url)
+        self.event_connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout = REQUEST_TIMEOUT)
+        try:
+            self.event_connection.request('GET', f'/events?session_id={self.session_id}')
+            response = self.event_connection.getresponse()
+            name = None
+            while not self.stop_event.is_set():
+                line = response.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8').rstrip('\n')
+                if line.startswith('event: '):
+                    name = line[7:]
+                elif line.startswith('data: ') and name:
+                    with self.stats.lock:
+                        self.stats.events[name] += 1
+                    if name == 'result':
+                        self.observe(json.loads(line[6:]))
+                    name = None
+        except Exception as e:
+            if not self.stop_event.is_set():
+                self.stats.error('/events', e)
+
+class ProcessSampler(threading.Thread):
+    def __init__(self, pid, interval = 0.5):
+        # CPU % and RSS of a process and its children (psutil if installed, else /proc)
+        super().__init__(daemon = True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+
+    def tree(self, pid):
+        # pid and all its descendants from /proc/<pid>/task/*/children
+        pids = [pid]
+        for task in os.listdir(f'/proc/{pid}/task'):
+            try:
+                with open(f'/proc/{pid}/task/{task}/children') as f:
+                    for child in f.read().split():
+                        pids.extend(self.tree(int(child)))
+            except OSError:
+                pass
+        return pids
+
+    def read(self):
+        # (cpu seconds, rss bytes) of the process tree
+        if psutil is not None:
+            process = psutil.Process(self.pid)
+            processes = [process, *process.children(recursive = True)]
+            cpu = sum(sum(p.cpu_times()[:2]) for p in processes)
+            rss = sum(p.memory_info().rss for p in processes)
+            return cpu, rss
+
+        cpu, rss = 0.0, 0
+        for pid in self.tree(self.pid):
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / self.clock_ticks
+                rss += int(fields[21]) * self.page_size
+            except (OSError, IndexError):
+                pass
+        return cpu, rss
+
+    def run(self):
+        last_cpu, last_time = self.read()[0], time.time()
+        while not self.stop_event.wait(self.interval):
+            try:
+                cpu, rss = self.read()
+            except Exception:
+                break
+            now = time.time()
+            self.samples.append(((cpu - last_cpu) / (now - last_time) * 100, rss))
+            last_cpu, last_time = cpu, now
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout = 2)
+        if not self.samples:
+            return None
+        cpu = [sample[0] for sample in self.samples]
+        rss = [sample[1] for sample in self.samples]
+        return {
+            'cpu_percent_mean': round(float(np.mean(cpu)), 1),
+            'cpu_percent_max': round(max(cpu), 1),
+            'rss_mb_max': round(max(rss) / 2 ** 20, 1)
+        }
+
+def wait_ready(base_url, timeout = 300):
+    # Poll /ready until the server answers 200
+    url = urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout = 5)
+            connection.request('GET', '/ready')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(1)
+    return False
+
+def run_step(base_url, frames, clients, duration, server_pid = None, **client_options):
+    # One load step with a fixed number of clients
+    stats = LoadStats()
+    stop_event = threading.Event()
+    sampler = ProcessSampler(server_pid) if server_pid else None
+    if sampler is not None:
+        sampler.start()
+
+    threads = [
+        SimulatedClient(index, base_url, frames, stats, stop_event, **{
+            **client_options,
+            # Only the first client records
+            'record_after': client_options.get('record_after') if index == 0 else None
+        })
+        for index in range(clients)
+    ]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    stop_event.wait(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout = REQUEST_TIMEOUT)
+
+    summary = stats.summary(time.time() - started)
+    summary['clients'] = clients
+    summary['server'] = sampler.stop() if sampler is not None else None
+    return summary
+
+def print_summary(summary):
+    frames = summary['latency'].get('/process_frame', {})
+    staleness = summary['staleness'] or {}
+    server = summary['server'] or {}
+    print(f"[INFO] {summary['clients']:>3} clients | "
+          f"{summary['frames_per_second']:>6} frames/s sent, {summary['results_per_second']:>6} results/s | "
+          f"drop {summary['drop_rate']} | "
+          f"latency p50 {frames.get('p50_ms')} p99 {frames.get('p99_ms')} ms | "
+          f"stale mean {staleness.get('mean_frames')} max {staleness.get('max_frames')} | "
+          f"cpu {server.get('cpu_percent_mean')}% rss {server.get('rss_mb_max')} MB")
+    if summary['errors']:
+        print(f"[WARNING] Errors: {summary['errors']}")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Simulate option1.js clients against the pose server")
+    parser.add_argument('--url', default = 'http://127.0.0.1:5000')
+    parser.add_argument('--launch', action = 'store_true', help = "start a local main.py with Firebase stubbed")
+    parser.add_argument('--port', type = int, default = 5050, help = "port of the launched server")
+    parser.add_argument('--server-pid', type = int, help = "sample CPU / RSS of this server process")
+    parser.add_argument('--video', help = "video file to take frames from (synthetic frames if omitted)")
+    parser.add_argument('--max-frames', type = int, default = 300)
+    parser.add_argument('--clients', default = '4', help = "client count, or a comma-separated ramp")
+    parser.add_argument('--duration', type = float, default = 20.0, help = "seconds per step")
+    parser.add_argument('--fps', type = float, help = "fixed client rate (default: follow the server's capture hint)")
+    parser.add_argument('--events', action = 'store_true', help = "hold an /events stream instead of polling")
+    parser.add_argument('--record-after', type = float, default = 5.0)
+    parser.add_argument('--record-seconds', type = float, default = 5.0)
+    parser.add_argument('--no-record', action = 'store_true')
+    parser.add_argument('--json', help = "write all step summaries to this file")
+    parser.add_argument('--serve', action = 'store_true', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_stubbed(args.port)
+        raise SystemExit(0)
+
+    server = None
+    base_url, server_pid = args.url, args.server_pid
+    if args.launch:
+        base_url = f'http://127.0.0.1:{args.port}'
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port)],
+                                  cwd = os.path.dirname(os.path.abspath(__file__)))
+        server_pid = server.pid
+
+    try:
+        print(f"[INFO] Waiting for {base_url}/ready")
+        if not wait_ready(base_url):
+            print("[ERROR] Server did not become ready")
+            raise SystemExit(1)
+
+        frames = FrameSource(args.video, args.max_frames)
+        summaries = []
+        for clients in [int(count) for count in args.clients.split(',')]:
+            summary = run_step(
+                base_url, frames, clients, args.duration, server_pid,
+                fps = args.fps,
+                events = args.events,
+                record_after = None if args.no_record else args.record_after,
+                record_seconds = args.record_seconds
+            )
+            summaries.append(summary)
+            print_summary(summary)
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(summaries, f, indent = 2)
+            print(f"[INFO] Summaries written to {args.json}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout = 10)
@@ -7,12 +7,16 @@ import threading
 import queue
 import time
 import base64
-import pyrebase
+import uuid
 
+from collections import OrderedDict
 from flask import Flask, render_template, Response, jsonify, request
+from mediapipe.framework.formats import landmark_pb2
 from datetime import datetime
-from io import BytesIO
-from PIL import Image
+from recording_store import MemoryRecording, FileRecording
+from recording_analytics import ANALYTICS_VERSION, LANDMARK_IDS, records_to_array, analyze_recording, analyze_records
+from inference_pool import InferencePool
+from pose_pipeline import QUALITY_LADDER, QualityController, PoseCropper, LandmarkPredictor, KinematicsEngine, FrameGate, FrameBufferPool, OverlayRenderer, landmarks_to_array
 
 # Firebase configuration
 config = {
@@ -26,8 +30,20 @@ config = {
     "appId": "",
     "measurementId": ""
 }
-firebase = pyrebase.initialize_app(config)
-db = firebase.database()
+
+# Firebase is connected on first use (or during warm-up), not at import
+db = None
+db_lock = threading.Lock()
+
+def get_db():
+    # Lazily import pyrebase and connect to the realtime database
+    global db
+    
+    with db_lock:
+        if db is None:
+            import pyrebase
+            db = pyrebase.initialize_app(config).database()
+        return db
 
 # Flask application initialization
 app = Flask(__name__)
@@ -40,8 +56,7 @@ processing_thread = None
 
 # MediaPipe initialization
 mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
+overlay_renderer = OverlayRenderer(mp_pose.POSE_CONNECTIONS)
 
 # Global variables
 TARGET_LANDMARKS = [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22]
@@ -62,122 +77,501 @@ LANDMARK_NAMES = {
 }
 
 pose = None
-is_recording = False
-recorded_data = []
-start_time = None
+# Recording state (POSE_RECORDING_DIR shares it between gunicorn workers, see gunicorn_conf.py)
+RECORDING_DIR = os.environ.get('POSE_RECORDING_DIR')
+recording = FileRecording(RECORDING_DIR) if RECORDING_DIR else MemoryRecording()
 latest_landmarks = None
-latest_result = None
 lock = threading.Lock()
 
-def init_pose():
+# (height, width) of the last decoded frame, saved with a recording for its analytics
+last_frame_size = None
+
+# Post-session analytics of each saved recording (recording_analytics.py)
+'''
+    - Computed when a recording is saved and stored in Firebase under
+      pose_analytics/<recording_id>/v<ANALYTICS_VERSION>
+    - /recording_analytics/<recording_id> serves it from an in-process cache, else from
+      Firebase, else recomputes it from pose_json/<recording_id> (older recordings, or a
+      new ANALYTICS_VERSION) and stores it
+    - Recordings saved before landmark 'id' was the MediaPipe index are only analysed
+      from their frames that kept all 33 landmarks; with none, the route answers
+      'unsupported' instead of numbers
+'''
+ANALYTICS_CACHE_SIZE = 32
+analytics_cache = OrderedDict()
+analytics_lock = threading.Lock()
+
+# Per-session processing state
+'''
+    - Each browser tab sends a session_id with its frames ('default' if missing)
+    - A session owns its pose model, quality controller and latest result
+    - Sessions idle for SESSION_TIMEOUT seconds are closed by the worker
+'''
+SESSION_TIMEOUT = 60
+
+# Crop inference input to the person box from the previous frame's landmarks
+POSE_ROI_CROP = True
+
+# Run pose inference on every k-th frame of a session, predict landmarks in between
+'''
+    - Default stride; a client may ask for its own with 'inference_stride'
+    - Predicted results are marked with 'predicted': True
+'''
+INFERENCE_STRIDE = 1
+MAX_INFERENCE_STRIDE = 6
+
+# Skip inference on static / duplicate frames (reuse last result) and drop blurred ones
+FRAME_GATE = True
+
+# Joint angles, velocities and accelerations of every joint chain (pose_pipeline.JOINT_CHAINS),
+# returned with each result as 'kinematics' and recorded with its frame
+KINEMATICS = True
+
+# Run pose inference in N separate processes fed through a shared-memory frame ring
+# (0 keeps the in-process worker thread, see inference_pool.py)
+INFERENCE_PROCESSES = int(os.environ.get('POSE_INFERENCE_PROCESSES', 0))
+inference_pool = None
+
+# Processed JPEGs kept per session, served as image/jpeg at /frame/<session_id>/<epoch>/<version>.jpg
+'''
+    - Versions restart at 1 when a session is recreated (expiry, server restart), so the
+      URL also carries the session's epoch, a random id of this incarnation; only such
+      URLs are cacheable as immutable
+    - /result_image without both version and epoch is the mutable latest frame (no-cache)
+'''
+FRAME_RING_SIZE = 8
+FRAME_CACHE_CONTROL = 'private, max-age=60, immutable'
+
+# Server-sent event stream per session (/events?session_id=...)
+'''
+    - Replaces polling /queue_status, /recording_status and the results; the polling
+      endpoints stay for older clients
+    - Events: 'result' (same body as a /process_frame reply, pushed as soon as a new
+      version is published), 'recording' and 'queue' (pushed only when they change)
+    - Recording / queue changes are checked every EVENT_POLL_INTERVAL seconds; an idle
+      stream sends a comment every EVENT_KEEPALIVE seconds so proxies keep it open
+'''
+EVENT_POLL_INTERVAL = 1.0
+EVENT_KEEPALIVE = 15
+EVENT_RETRY_MS = 3000
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+# Startup / readiness
+'''
+    - startup() warms one pose model per model complexity the quality ladder reaches
+      with synthetic frames, then starts the worker and marks the node ready
+    - Warmed models are handed to the first session that needs that complexity
+    - /ready answers 503 until warm-up has finished (for load balancer health checks)
+'''
+WARMUP_FRAMES = 3
+warm_poses = {}
+warm_poses_lock = threading.Lock()
+ready_event = threading.Event()
+startup_thread = None
+startup_lock = threading.Lock()
+startup_info = {'started_at': None, 'ready_at': None, 'warmup_seconds': None, 'error': None}
+
+def init_pose(model_complexity = 1):
     # Initialize mediaPipe pose model
     return mp_pose.Pose(
         min_detection_confidence = 0.8,
         min_tracking_confidence = 0.8,
-        model_complexity = 1,
+        model_complexity = model_complexity,
         static_image_mode = False
     )
 
+def take_warm_pose(model_complexity):
+    # Use a pre-warmed model if one is left for this complexity, otherwise build a new one
+    with warm_poses_lock:
+        pose_model = warm_poses.pop(model_complexity, None)
+    return pose_model if pose_model is not None else init_pose(model_complexity)
+
+def warm_up_models():
+    # Load every pose graph the quality ladder can ask for and run synthetic frames through it
+    rng = np.random.default_rng(0)
+    frames = [
+        np.zeros((240, 320, 3), dtype = np.uint8),
+        rng.integers(0, 256, (240, 320, 3), dtype = np.uint8)
+    ]
+    # Only the levels the controller can reach (best_level down to the cheapest)
+    reachable = QUALITY_LADDER[QualityController().best_level:]
+    complexities = sorted({level['model_complexity'] for level in reachable}, reverse = True)
+    
+    for complexity in complexities:
+        with warm_poses_lock:
+            if complexity in warm_poses:
+                continue
+        try:
+            pose_model = init_pose(complexity)
+            for _ in range(WARMUP_FRAMES):
+                for frame in frames:
+                    pose_model.process(frame)
+        except Exception as e:
+            # The session's starting complexity must load; cheaper levels may fail (e.g. model download)
+            if complexity == complexities[0]:
+                raise
+            print(f"[WARNING] Pose model (complexity {complexity}) warm-up failed: {e}")
+            continue
+        # Tracking state from noise frames must not leak into a real session
+        pose_model.reset()
+        with warm_poses_lock:
+            warm_poses[complexity] = pose_model
+        print(f"[INFO] Pose model (complexity {complexity}) warmed up")
+    
+    # Encoder / decoder paths
+    _, buffer = cv2.imencode('.jpg', frames[1], [cv2.IMWRITE_JPEG_QUALITY, 70])
+    cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+def preload_models():
+    # Pre-fork (gunicorn master): fetch and read the model files so workers share them via
+    # the page cache. MediaPipe graphs own threads and cannot cross fork(), so each worker
+    # still builds and warms its own graphs in startup().
+    from mediapipe.python.solutions import download_utils
+    
+    reachable = QUALITY_LADDER[QualityController().best_level:]
+    model_names = {0: 'lite', 1: 'full', 2: 'heavy'}
+    package_dir = os.path.dirname(os.path.dirname(mp.__file__))
+    paths = ['mediapipe/modules/pose_detection/pose_detection.tflite']
+    for complexity in sorted({level['model_complexity'] for level in reachable}):
+        path = f'mediapipe/modules/pose_landmark/pose_landmark_{model_names[complexity]}.tflite'
+        try:
+            # The full model ships with the wheel; lite / heavy are downloaded on first use
+            if complexity != 1:
+                download_utils.download_oss_model(path)
+            paths.append(path)
+        except Exception as e:
+            print(f"[WARNING] Could not fetch {path}: {e}")
+    
+    for path in paths:
+        with open(os.path.join(package_dir, path), 'rb') as f:
+            f.read()
+    print(f"[INFO] Preloaded {len(paths)} model files")
+
+def run_startup(start_worker = True):
+    # Warm-up sequence (runs in the startup thread)
+    startup_info['started_at'] = time.time()
+    try:
+        if INFERENCE_PROCESSES:
+            start_inference_pool()
+        else:
+            warm_up_models()
+        try:
+            get_db()
+        except Exception as e:
+            # Recording upload retries the connection; pose serving does not depend on it
+            print(f"[WARNING] Firebase connection failed during warm-up: {e}")
+        if start_worker and inference_pool is None:
+            start_processing_thread()
+        startup_info['ready_at'] = time.time()
+        startup_info['warmup_seconds'] = round(startup_info['ready_at'] - startup_info['started_at'], 2)
+        ready_event.set()
+        print(f"[INFO] Server ready after {startup_info['warmup_seconds']}s warm-up")
+    except Exception as e:
+        startup_info['error'] = str(e)
+        print(f"[ERROR] Startup failed: {e}")
+
+def startup(wait = False, start_worker = True):
+    # Start warm-up once; safe to call from any route or entry point
+    # (start_worker = False when frames are processed elsewhere, e.g. pose_asgi.py)
+    global startup_thread
+    
+    with startup_lock:
+        if startup_thread is None or (not startup_thread.is_alive() and not ready_event.is_set()):
+            startup_info['error'] = None
+            startup_thread = threading.Thread(target = run_startup, args = (start_worker,), daemon = True)
+            startup_thread.start()
+    if wait:
+        startup_thread.join()
+    return ready_event.is_set()
+
+class PoseSession:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.controller = QualityController()
+        self.cropper = PoseCropper()
+        self.predictor = LandmarkPredictor()
+        self.kinematics = KinematicsEngine()
+        self.gate = FrameGate()
+        self.buffers = FrameBufferPool()
+        self.inference_stride = INFERENCE_STRIDE
+        self.frame_count = 0
+        self.pose = None
+        self.pose_complexity = None
+        self.latest_result = None
+        self.result_version = 0
+        self.result_changed = threading.Condition()
+        self.worker_status = None
+        self.frames = OrderedDict()
+        self.last_seen = time.time()
+        self.epoch = uuid.uuid4().hex[:12]
+
+    def get_pose(self):
+        # (Re)create the pose model when the controller changes model complexity
+        complexity = self.controller.settings['model_complexity']
+        if self.pose is None or self.pose_complexity != complexity:
+            if self.pose is not None:
+                self.pose.close()
+            self.pose = take_warm_pose(complexity)
+            self.pose_complexity = complexity
+        return self.pose
+
+    def close(self):
+        if self.pose is not None:
+            self.pose.close()
+            self.pose = None
+        self.buffers.clear()
+        self.frames.clear()
+
+def get_session(session_id):
+    # Get or create session state
+    with sessions_lock:
+        session = sessions.get(session_id)
+        if session is None:
+            session = PoseSession(session_id)
+            sessions[session_id] = session
+        session.last_seen = time.time()
+        return session
+
+def array_to_landmark_list(points):
+    # (N, 4) array -> MediaPipe landmark list, so predicted frames reuse the drawing path
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in points:
+        landmark_list.landmark.add(x = x, y = y, z = z, visibility = visibility)
+    return landmark_list
+
+def run_pose_inference(session, frame, settings):
+    # Crop, downscale and run the session's pose model on a BGR frame; returns full-frame landmarks or None
+    
+    # Crop to the tracked person (full frame when tracking is lost)
+    if POSE_ROI_CROP:
+        crop_bgr, crop_box = session.cropper.crop(frame)
+    else:
+        crop_bgr, crop_box = frame, None
+    
+    # Downscale to the controller's inference width (landmarks are normalized)
+    h, w = crop_bgr.shape[:2]
+    if w > settings['inference_width']:
+        inference_h = max(int(h * settings['inference_width'] / w), 1)
+        crop_bgr = cv2.resize(crop_bgr, (settings['inference_width'], inference_h),
+                              dst = session.buffers.get('resized', (inference_h, settings['inference_width'], 3)),
+                              interpolation = cv2.INTER_AREA)
+    
+    # Only the inference region is converted to RGB (MediaPipe input), into a pooled contiguous buffer
+    inference_rgb = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB,
+                                 dst = session.buffers.get('inference', crop_bgr.shape))
+    inference_rgb.flags.writeable = False
+    
+    # Pose estimation (the pooled buffer must be writable again even if this fails)
+    try:
+        results = session.get_pose().process(inference_rgb)
+    finally:
+        inference_rgb.flags.writeable = True
+    
+    # Map crop landmarks back to the full frame and pick the next crop
+    if crop_box is not None:
+        if results.pose_landmarks:
+            session.cropper.map_landmarks(results.pose_landmarks.landmark, crop_box, frame.shape)
+            session.cropper.update(results.pose_landmarks.landmark)
+        else:
+            session.cropper.reset()
+    
+    return results.pose_landmarks
+
+def expire_sessions():
+    # Close sessions that stopped sending frames (called from the worker thread)
+    now = time.time()
+    with sessions_lock:
+        expired = [sid for sid, session in sessions.items() if now - session.last_seen > SESSION_TIMEOUT]
+        closed = [sessions.pop(sid) for sid in expired]
+    for session in closed:
+        session.close()
+
+def decode_frame(image_data):
+    # Decode a base64 JPEG data URI straight to BGR
+    global last_frame_size
+    
+    image_bytes = base64.b64decode(image_data[image_data.index(',') + 1:])
+    frame = cv2.imdecode(np.frombuffer(image_bytes, dtype = np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError('Could not decode frame')
+    last_frame_size = frame.shape[:2]
+    return frame
+
+def process_session_frame(session, image_data, received_at):
+    # Decode, process and publish one frame; returns the result or None if gated
+    processed = process_decoded_frame(session, decode_frame(image_data), received_at)
+    if processed is None:
+        return None
+    result, jpeg = processed
+    return publish_result(session, result, jpeg)
+
+def process_decoded_frame(session, frame, received_at):
+    # Gate, infer (or predict), draw and encode a BGR frame (drawn on in place)
+    # Returns (result, jpeg bytes), or None if the frame gate skipped it
+    global latest_landmarks
+    
+    settings = session.controller.settings
+    
+    # Frame gate: reuse last result for static / duplicate frames, drop blurred ones
+    # (skipped frames are not recorded, a reused pose is not a measurement)
+    verdict = session.gate.check(frame, session.cropper.box if POSE_ROI_CROP else None) if FRAME_GATE else 'process'
+    if verdict != 'process':
+        return None
+    
+    # Strided inference: predict landmarks between every k-th frame
+    session.frame_count += 1
+    pose_landmarks = None
+    predicted = False
+    
+    if session.inference_stride > 1 and session.frame_count % session.inference_stride != 0:
+        points = session.predictor.predict(received_at)
+        if points is not None:
+            pose_landmarks = array_to_landmark_list(points)
+            predicted = True
+    
+    if not predicted:
+        pose_landmarks = run_pose_inference(session, frame, settings)
+        if pose_landmarks:
+            session.predictor.update(landmarks_to_array(pose_landmarks.landmark), received_at)
+        else:
+            session.predictor.reset()
+    
+    # Draw pose landmarks
+    image_bgr = frame
+    
+    landmarks_data = None
+    kinematics = None
+    
+    if pose_landmarks:
+        with lock:
+            latest_landmarks = pose_landmarks
+
+        points = landmarks_to_array(pose_landmarks.landmark)
+        
+        if KINEMATICS:
+            kinematics = session.kinematics.update(points, received_at, frame.shape)
+        
+        # Draw skeleton, joints and index labels
+        if settings['overlay']:
+            overlay_renderer.render(image_bgr, points)
+        
+        # Prepare landmarks data (skip small confidence, 'id' keeps the landmark index)
+        visible = np.flatnonzero(points[:, 3] >= 0.8)
+        landmarks_data = [
+            {'id': index, 'x': x, 'y': y, 'z': z, 'visibility': visibility}
+            for index, (x, y, z, visibility) in zip(visible.tolist(), points[visible].tolist())
+        ]
+        
+        # Check data to be empty or not
+        if landmarks_data:
+            # Record data if recording status is active
+            recording.add(landmarks_data, predicted, kinematics)
+    
+    # Encode processed image (kept as raw JPEG bytes, the result only references it)
+    _, buffer = cv2.imencode('.jpg', image_bgr, [cv2.IMWRITE_JPEG_QUALITY, settings['jpeg_quality']])
+    
+    result = {
+        'status': 'success',
+        'landmarks': landmarks_data,
+        'predicted': predicted,
+        'kinematics': kinematics,
+        # Arrival time of the source frame (lets a client tell how stale a result is)
+        'received_at': received_at
+    }
+    return result, buffer.tobytes()
+
+def publish_result(session, result, jpeg):
+    # Make a result the session's latest (versioned so clients can skip unchanged ones)
+    with lock:
+        session.result_version += 1
+        version = session.result_version
+        session.frames[version] = jpeg
+        while len(session.frames) > FRAME_RING_SIZE:
+            session.frames.popitem(last = False)
+        result['version'] = version
+        result['epoch'] = session.epoch
+        result['image_url'] = f'/frame/{session.session_id}/{session.epoch}/{version}.jpg'
+        session.latest_result = result
+
+    # Wake the session's event streams
+    with session.result_changed:
+        session.result_changed.notify_all()
+
+    return result
+
+def handle_pool_result(session_id, result, jpeg, points, status):
+    # Publish a frame processed by an inference process (runs on the pool's collector thread)
+    global latest_landmarks
+    
+    session = get_session(session_id)
+    with lock:
+        if points is not None:
+            latest_landmarks = array_to_landmark_list(points)
+        session.worker_status = status
+    
+    # Mirror the inference process's controller so capture recommendations follow it
+    if status['latency_ms'] is not None:
+        session.controller.latency = status['latency_ms'] / 1000
+    session.controller.level = status['level']
+    publish_result(session, result, jpeg)
+    
+    if not result_queue.full():
+        result_queue.put(result)
+
+def start_inference_pool():
+    # Spawn the inference processes and wait until each has warmed its models
+    global inference_pool
+    
+    pool = InferencePool(
+        INFERENCE_PROCESSES,
+        publish = handle_pool_result,
+        record = recording.add,
+        expire = expire_sessions,
+        expire_interval = SESSION_TIMEOUT / 2
+    )
+    pool.start()
+    inference_pool = pool
+    print(f"[INFO] {INFERENCE_PROCESSES} inference processes ready")
+
 def process_frame_worker():
     # Using multiple threads for different tasks
-    global latest_result, latest_landmarks, is_recording, recorded_data, start_time, processing_active
-    
-    # Initialize pose model 
-    local_pose = init_pose()
+    global processing_active
     
     print("[INFO] Frame processing thread started")
+    last_expiry = time.time()
     
     while processing_active:
         try:
+            # Close idle sessions periodically
+            if time.time() - last_expiry > SESSION_TIMEOUT / 2:
+                expire_sessions()
+                last_expiry = time.time()
+            
             # Get frame from queue with timeout to avoid blocking
             if not frame_queue.empty():
-                image_data = frame_queue.get(timeout = 0.1)
-                
-                # Decode base64 image
-                image_bytes = base64.b64decode(image_data.split(',')[1])
-                image = Image.open(BytesIO(image_bytes))
-                frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-                
-                # Convert color space for MediaPipe
-                image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                image_rgb.flags.writeable = False
-                
-                # Pose estimation
-                results = local_pose.process(image_rgb)
-                
-                # Draw pose landmarks
-                image_rgb.flags.writeable = True
-                image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+                session_id, image_data, received_at = frame_queue.get(timeout = 0.1)
+                try:
+                    session = get_session(session_id)
+                    frame_started = time.time()
+                    result = process_session_frame(session, image_data, received_at)
+                finally:
+                    # Clear frame queue 
+                    frame_queue.task_done()
                 
-                landmarks_data = None
-                
-                if results.pose_landmarks:
-                    with lock:
-                        latest_landmarks = results.pose_landmarks
-
-                    # Draw pose connections
-                    mp_drawing.draw_landmarks(
-                        image_bgr,
-                        results.pose_landmarks,
-                        mp_pose.POSE_CONNECTIONS,
-                        landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
-                    )
-                    
-                    # Show landmarks
-                    h, w, c = image_bgr.shape
-
-                    # Prepare landmarks data
-                    landmarks_data = []
-
-                    for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                        # Skip small confidence
-                        if landmark.visibility < 0.8:
-                            continue 
-
-                        cx, cy = int(landmark.x * w), int(landmark.y * h)
-                        cv2.circle(image_bgr, (cx, cy), 8, (0, 0, 255), -1)
-                        cv2.putText(image_bgr, str(idx), (cx + 10, cy - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-                        landmarks_data.append({
-                            'x': float(landmark.x),
-                            'y': float(landmark.y),
-                            'z': float(landmark.z),
-                            'visibility': float(landmark.visibility)
-                        })
+                if result is not None:
+                    # Put result in queue 
+                    if not result_queue.full():
+                        result_queue.put(result)
                     
-                    # Check data to be empty or not
-                    if landmarks_data:
-                        # Record data if recording status is active
-                        if is_recording and start_time:
-                            elapsed_time = (datetime.now() - start_time).total_seconds()
-                            record = {
-                                'timestamp': elapsed_time,
-                                'landmarks': landmarks_data
-                            }
-                            with lock:
-                                recorded_data.append(record)
-                
-                # Encode processed image to base64
-                _, buffer = cv2.imencode('.jpg', image_bgr, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                processed_image = base64.b64encode(buffer).decode('utf-8')
-                
-                result = {
-                    'status': 'success',
-                    'image': f'data:image/jpeg;base64,{processed_image}',
-                    'landmarks': landmarks_data
-                }
-                
-                # Update latest result
-                with lock:
-                    latest_result = result
-                
-                # Put result in queue 
-                if not result_queue.full():
-                    result_queue.put(result)
-                
-                # Clear frame queue 
-                frame_queue.task_done()
+                    # Let the controller adapt quality to the observed load
+                    session.controller.record(
+                        time.time() - frame_started,
+                        frame_queue.qsize(),
+                        frame_queue.maxsize,
+                        len(sessions)
+                    )
                 
             else:
                 # No frames to process, sleep briefly
@@ -190,7 +584,9 @@ def process_frame_worker():
             continue
     
     # Cleanup
-    local_pose.close()
+    with sessions_lock:
+        for session in sessions.values():
+            session.close()
     print("[INFO] Frame processing thread stopped")
 
 def start_processing_thread():
@@ -211,6 +607,9 @@ def stop_processing_thread():
     if processing_thread is not None:
         processing_thread.join(timeout=2)
         print("[INFO] Processing thread stopped")
+    if inference_pool is not None:
+        inference_pool.stop()
+        print("[INFO] Inference processes stopped")
 
 @app.route('/')
 def index():
@@ -230,16 +629,291 @@ def favicon():
 def start_processing():
     # Start the processing thread
     try:
-        start_processing_thread()
-        return jsonify({'status': 'success', 'message': '處理線程已啟動'})
+        if startup():
+            return jsonify({'status': 'success', 'message': '處理線程已啟動'})
+        return jsonify({'status': 'warming_up', 'message': '模型載入中'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+# Route payloads (shared by the Flask routes below and the asyncio serving mode in pose_asgi.py)
+def apply_client_options(session, data):
+    # Per-session options a client may send with its frames
+    if data.get('inference_stride'):
+        session.inference_stride = min(max(int(data['inference_stride']), 1), MAX_INFERENCE_STRIDE)
+
+def node_load():
+    # (queued frames, queue capacity, parallel workers) of this node
+    if inference_pool is not None:
+        pool = inference_pool.status()
+        return sum(pool['task_queues']), pool['task_capacity'] * pool['processes'], pool['processes']
+    return frame_queue.qsize(), frame_queue.maxsize, 1
+
+def latest_result_payload(session, last_version = None, load = None, last_epoch = None):
+    # Latest processed result of a session
+    '''
+        - last_version / last_epoch: result the client already shows -> tiny 'unchanged'
+          reply (versions restart when a session is recreated, so both must match)
+        - The processed image is referenced by 'image_url', not embedded
+        - Every reply carries 'capture': the interval / size the client should capture at,
+          from the session's processing latency and the node's load (load overrides node_load())
+    '''
+    queue_depth, queue_capacity, workers = load or node_load()
+    capture = session.controller.recommend(queue_depth, queue_capacity, len(sessions), workers)
+    
+    with lock:
+        result = session.latest_result
+    
+    if result is None:
+        return {'status': 'processing', 'message': '處理中', 'capture': capture}
+    if last_version is not None and (result['epoch'], result['version']) == (last_epoch, last_version):
+        return {'status': 'unchanged', 'version': result['version'], 'epoch': result['epoch'], 'capture': capture}
+    return {**result, 'capture': capture}
+
+def processed_frame_bytes(session_id, version = None, epoch = None):
+    # (jpeg, None) from a session's frame ring, or (None, (error payload, status code))
+    with sessions_lock:
+        session = sessions.get(session_id)
+    
+    with lock:
+        if session is None or not session.frames:
+            return None, ({'status': 'no_data', 'message': '無法獲取資料'}, 404)
+        if epoch is not None and epoch != session.epoch:
+            # A frame of an earlier incarnation of this session
+            return None, ({'status': 'expired', 'message': '結果已更新'}, 404)
+        if version is None:
+            version = next(reversed(session.frames))
+        jpeg = session.frames.get(version)
+    
+    if jpeg is None:
+        return None, ({'status': 'expired', 'message': '結果已更新'}, 404)
+    return jpeg, None
+
+def frame_cache_control(version, epoch):
+    # Immutable only when the URL names one frame of one session incarnation
+    return FRAME_CACHE_CONTROL if version is not None and epoch is not None else 'no-cache'
+
+def pose_data_payload():
+    # Current pose landmarks data
+    with lock:
+        if latest_landmarks is None:
+            return {'status': 'no_data', 'message': '無法獲取資料'}
+        
+        landmarks = []
+        for landmark in latest_landmarks.landmark:
+            landmarks.append({
+                'x': float(landmark.x),
+                'y': float(landmark.y),
+                'z': float(landmark.z),
+                'visibility': float(landmark.visibility)
+            })
+    return {'status': 'success', 'data': landmarks}
+
+def begin_recording():
+    # Start recording pose data
+    recording.start()
+    return {'status': 'success', 'message': '開始記錄'}
+
+def finish_recording():
+    # Stop recording and save data to firebase (blocking network call)
+    finished = recording.stop()
+    if finished is None:
+        return {'status': 'error', 'message': '不在記錄狀態'}
+    records, start_time = finished
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    frame_size = list(last_frame_size) if last_frame_size is not None else None
+    
+    # Prepare JSON data
+    json_data = {
+        'recording_info': {
+            'timestamp': timestamp,
+            'total_frames': len(records),
+            'start_time': start_time.isoformat() if start_time else None,
+            'frame_size': frame_size,
+            # Landmark 'id' is the MediaPipe index (older recordings numbered the filtered list)
+            'landmark_ids': LANDMARK_IDS
+        },
+        'frames': []
+    }
+    
+    for record in records:
+        frame_data = {
+            'timestamp': round(record['timestamp'], 3),
+            'predicted': record.get('predicted', False),
+            'landmarks': []
+        }
+        if record.get('kinematics'):
+            frame_data['kinematics'] = record['kinematics']
+        for i, landmark in enumerate(record['landmarks']):
+            i = landmark.get('id', i)
+            frame_data['landmarks'].append({
+                'id': i,
+                'name': LANDMARK_NAMES.get(i, f'LANDMARK_{i}'),
+                'x': round(landmark['x'], 6),
+                'y': round(landmark['y'], 6),
+                'z': round(landmark['z'], 6),
+                'visibility': round(landmark['visibility'], 6)
+            })
+        json_data['frames'].append(frame_data)
+    
+    # Save to firebase
+    recording_id = get_db().child("pose_json").push(json_data)['name']
+    
+    # The recording is saved either way, analytics can be recomputed on the first view
+    try:
+        analytics = store_analytics(recording_id, analyze_records(records, frame_size))
+    except Exception as e:
+        print(f"[ERROR] Recording analytics: {e}")
+        analytics = None
+    
+    return {
+        'status': 'success',
+        'message': '記錄已經保存',
+        'records': len(records),
+        'recording_id': recording_id,
+        # Summary only, the angle series are served by /recording_analytics/<recording_id>
+        'analytics': {key: value for key, value in analytics.items() if key != 'series'} if analytics else None
+    }
+
+def cache_analytics(recording_id, analytics):
+    with analytics_lock:
+        analytics_cache[recording_id] = analytics
+        analytics_cache.move_to_end(recording_id)
+        while len(analytics_cache) > ANALYTICS_CACHE_SIZE:
+            analytics_cache.popitem(last = False)
+    return analytics
+
+def store_analytics(recording_id, analytics):
+    # Save a recording's analytics under its id and version, and cache it
+    get_db().child("pose_analytics").child(recording_id).child(f'v{ANALYTICS_VERSION}').set(analytics)
+    return cache_analytics(recording_id, analytics)
+
+def recording_analytics_payload(recording_id):
+    # Analytics of a saved recording: cache, stored artifact, or recomputed from its frames
+    with analytics_lock:
+        analytics = analytics_cache.get(recording_id)
+        if analytics is not None:
+            analytics_cache.move_to_end(recording_id)
+    if analytics is None:
+        analytics = get_db().child("pose_analytics").child(recording_id).child(f'v{ANALYTICS_VERSION}').get().val()
+        if analytics is not None:
+            cache_analytics(recording_id, analytics)
+    if analytics is None:
+        saved = get_db().child("pose_json").child(recording_id).get().val()
+        if not saved:
+            return {'status': 'error', 'message': '找不到記錄'}, 404
+        info = saved.get('recording_info') or {}
+        landmark_ids = info.get('landmark_ids') == LANDMARK_IDS
+        points, times = records_to_array(saved.get('frames') or [], landmark_ids)
+        if not landmark_ids and np.isnan(points).all():
+            # Older recording whose frames all lost landmarks to the visibility filter
+            return {'status': 'unsupported', 'message': '舊格式記錄無法分析'}, 422
+        analytics = store_analytics(recording_id, analyze_recording(points, times, info.get('frame_size')))
+    return {'status': 'success', 'recording_id': recording_id, 'analytics': analytics}, 200
+
+def recording_status_payload():
+    # Current recording status
+    return recording.status()
+
+def queue_status_payload():
+    # Queue and per-session status for monitoring
+    with sessions_lock:
+        session_status = {
+            # Sessions served by an inference process report that process's state
+            sid: session.worker_status or {
+                **session.controller.status(),
+                'roi': session.cropper.status(),
+                'gate': session.gate.status(),
+                'buffers': session.buffers.status(),
+                'inference_stride': session.inference_stride
+            }
+            for sid, session in sessions.items()
+        }
+    
+    status = {
+        'frame_queue_size': frame_queue.qsize(),
+        'result_queue_size': result_queue.qsize(),
+        'processing_active': processing_active,
+        'active_sessions': len(session_status),
+        'sessions': session_status
+    }
+    if inference_pool is not None:
+        status['processing_active'] = inference_pool.alive()
+        status['inference_pool'] = inference_pool.status()
+    return status
+
+def queue_health_payload(session, load = None, active = None):
+    # Coarse node health for the event stream (changes far less often than queue_status)
+    queue_depth, queue_capacity, workers = load or node_load()
+    if active is None:
+        active = inference_pool.alive() if inference_pool is not None else processing_active
+    
+    if queue_depth >= queue_capacity:
+        state = 'saturated'
+    elif queue_depth > queue_capacity // 2:
+        state = 'busy'
+    else:
+        state = 'ok'
+    
+    return {
+        'state': state,
+        'processing_active': active,
+        'ready': ready_event.is_set(),
+        'workers': workers,
+        'active_sessions': len(sessions),
+        'level': session.controller.level if session is not None else None
+    }
+
+recording_status_cache = {'at': 0.0, 'payload': None}
+recording_status_lock = threading.Lock()
+
+def recording_status_snapshot():
+    # recording.status() shared by every stream for EVENT_POLL_INTERVAL (FileRecording reads its spools)
+    with recording_status_lock:
+        now = time.time()
+        if recording_status_cache['payload'] is None or now - recording_status_cache['at'] >= EVENT_POLL_INTERVAL:
+            recording_status_cache['payload'] = recording.status()
+            recording_status_cache['at'] = now
+        return recording_status_cache['payload']
+
+def session_events(session_id, sent, load = None, active = None):
+    # [(event, payload)] that changed since the stream's last call ('sent' is the stream's own state)
+    with sessions_lock:
+        session = sessions.get(session_id)
+    
+    events = []
+    if session is not None:
+        with lock:
+            version = session.result_version
+        if version and (session.epoch, version) != (sent.get('epoch'), sent.get('version')):
+            payload = latest_result_payload(session, None, load)
+            sent['epoch'], sent['version'] = payload.get('epoch'), payload.get('version')
+            events.append(('result', payload))
+    
+    for name, payload in (('recording', recording_status_snapshot()),
+                          ('queue', queue_health_payload(session, load, active))):
+        if payload != sent.get(name):
+            sent[name] = payload
+            events.append((name, payload))
+    return events
+
+def format_event(name, payload):
+    # One text/event-stream message
+    return f'event: {name}\ndata: {json.dumps(payload, ensure_ascii = False)}\n\n'
+
+def ready_payload(worker_alive):
+    # Readiness: models warm and a worker serving frames
+    is_ready = ready_event.is_set() and worker_alive
+    status = {
+        'status': 'ready' if is_ready else 'warming_up',
+        'warm_models': sorted(warm_poses.keys()),
+        **startup_info
+    }
+    return status, 200 if is_ready else 503
+
 @app.route('/process_frame', methods=['POST'])
 def process_frame_route():
     # Receive frame from frontend and queue for processing
-    global latest_result
-    
     try:
         data = request.get_json()
         image_data = data.get('image')
@@ -247,148 +921,145 @@ def process_frame_route():
         if not image_data:
             return jsonify({'status': 'error', 'message': '沒有收到圖片資訊'})
         
+        # Do not queue frames before the models are warm
+        if not ready_event.is_set():
+            startup()
+            return jsonify({'status': 'warming_up', 'message': '模型載入中'})
+        
+        session = get_session(data.get('session_id') or 'default')
+        apply_client_options(session, data)
+        
+        # Inference processes: decode here straight into the shared frame ring
+        if inference_pool is not None:
+            if not inference_pool.submit(session, decode_frame(image_data), time.time()):
+                print("[WARNING] Inference processes busy, skipping frame")
         # Add frame to queue 
-        if not frame_queue.full():
-            frame_queue.put(image_data)
+        elif not frame_queue.full():
+            frame_queue.put((session.session_id, image_data, time.time()))
         else:
             # Queue is full, skip this frame to prevent memory buildup
             print("[WARNING] Frame queue full, skipping frame")
         
         # Return latest processed result immediately
-        with lock:
-            if latest_result is not None:
-                return jsonify(latest_result)
-            else:
-                return jsonify({'status': 'processing', 'message': '處理中'})
+        return jsonify(latest_result_payload(session, data.get('last_version'), last_epoch = data.get('last_epoch')))
         
     except Exception as e:
         print(f"[ERROR] process_frame_route: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+def frame_response(session_id, version, epoch = None):
+    # Raw JPEG of a session's processed frame (see frame_cache_control)
+    jpeg, error = processed_frame_bytes(session_id, version, epoch)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    
+    response = Response(jpeg, mimetype = 'image/jpeg')
+    response.headers['Cache-Control'] = frame_cache_control(version, epoch)
+    return response
+
+@app.route('/frame/<session_id>/<epoch>/<int:version>.jpg')
+def processed_frame(session_id, epoch, version):
+    return frame_response(session_id, version, epoch)
+
+@app.route('/result_image')
+def result_image():
+    # Query-string form: ?session_id=...&epoch=...&version=... (latest frame when version is omitted)
+    return frame_response(
+        request.args.get('session_id') or 'default',
+        request.args.get('version', type = int),
+        request.args.get('epoch')
+    )
+
 @app.route('/pose_data')
 def pose_data():
     # Get current pose landmarks data
-    global latest_landmarks
-    
-    with lock:
-        if latest_landmarks is None:
-            return jsonify({'status': 'no_data', 'message': '無法獲取資料'})
-    
     try:
-        landmarks = []
-        with lock:
-            for landmark in latest_landmarks.landmark:
-                landmarks.append({
-                    'x': float(landmark.x),
-                    'y': float(landmark.y),
-                    'z': float(landmark.z),
-                    'visibility': float(landmark.visibility)
-                })
-        return jsonify({'status': 'success', 'data': landmarks})
+        return jsonify(pose_data_payload())
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/start_recording', methods=['POST'])
 def start_recording():
     # Start recording pose data
-    global is_recording, recorded_data, start_time
-    
     try:
-        with lock:
-            is_recording = True
-            recorded_data = []
-            start_time = datetime.now()
-        
-        return jsonify({'status': 'success', 'message': '開始記錄'})
+        return jsonify(begin_recording())
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/stop_recording', methods=['POST'])
 def stop_recording():
     # Stop recording and save data to firebase
-    global is_recording, recorded_data, start_time
-    
     try:
-        with lock:
-            if not is_recording:
-                return jsonify({'status': 'error', 'message': '不在記錄狀態'})
-            
-            is_recording = False
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            # Prepare JSON data
-            json_data = {
-                'recording_info': {
-                    'timestamp': timestamp,
-                    'total_frames': len(recorded_data),
-                    'start_time': start_time.isoformat() if start_time else None
-                },
-                'frames': []
-            }
-            
-            for record in recorded_data:
-                frame_data = {
-                    'timestamp': round(record['timestamp'], 3),
-                    'landmarks': []
-                }
-                for i, landmark in enumerate(record['landmarks']):
-                    frame_data['landmarks'].append({
-                        'id': i,
-                        'name': LANDMARK_NAMES.get(i, f'LANDMARK_{i}'),
-                        'x': round(landmark['x'], 6),
-                        'y': round(landmark['y'], 6),
-                        'z': round(landmark['z'], 6),
-                        'visibility': round(landmark['visibility'], 6)
-                    })
-                json_data['frames'].append(frame_data)
-            
-            # Save to firebase
-            db.child("pose_json").push(json_data)
-            
-            data_count = len(recorded_data)
-            recorded_data = []
-            start_time = None
-        
-        return jsonify({
-            'status': 'success',
-            'message': '記錄已經保存',
-            'records': data_count
-        })
+        return jsonify(finish_recording())
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/recording_analytics/<recording_id>')
+def recording_analytics(recording_id):
+    # Range of motion, peak velocities, symmetry and angle series of a saved recording
+    try:
+        payload, status = recording_analytics_payload(recording_id)
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/recording_status')
 def recording_status():
     # Get current recording status
-    global is_recording, start_time, recorded_data
-    
-    with lock:
-        status = {
-            'is_recording': is_recording,
-            'records_count': len(recorded_data)
-        }
-        
-        if is_recording and start_time:
-            elapsed = (datetime.now() - start_time).total_seconds()
-            status['elapsed_time'] = round(elapsed, 1)
-    
-    return jsonify(status)
+    return jsonify(recording_status_payload())
 
 @app.route('/queue_status')
 def queue_status():
     # Get queue status for monitoring
-    return jsonify({
-        'frame_queue_size': frame_queue.qsize(),
-        'result_queue_size': result_queue.qsize(),
-        'processing_active': processing_active
-    })
+    return jsonify(queue_status_payload())
+
+def event_stream(session_id):
+    # Generator behind /events: wakes on new results, otherwise every EVENT_POLL_INTERVAL
+    sent = {'version': 0}
+    last_write = time.time()
+    yield f'retry: {EVENT_RETRY_MS}\n\n'
+    
+    while True:
+        with sessions_lock:
+            session = sessions.get(session_id)
+        if session is None:
+            time.sleep(EVENT_POLL_INTERVAL)
+        else:
+            with session.result_changed:
+                version = (session.epoch, session.result_version)
+                if not session.result_version or version == (sent.get('epoch'), sent.get('version')):
+                    session.result_changed.wait(EVENT_POLL_INTERVAL)
+        
+        chunk = ''.join(format_event(name, payload) for name, payload in session_events(session_id, sent))
+        if chunk:
+            yield chunk
+            last_write = time.time()
+        elif time.time() - last_write > EVENT_KEEPALIVE:
+            yield ': keepalive\n\n'
+            last_write = time.time()
+
+@app.route('/events')
+def events():
+    # One long-lived event stream per session (holds one server thread while open)
+    session_id = request.args.get('session_id') or 'default'
+    response = Response(event_stream(session_id), mimetype = 'text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-# Start processing thread when app starts
-start_processing_thread()
+@app.route('/ready')
+def ready():
+    # Readiness probe: 200 once models are warm and the worker is running
+    if inference_pool is not None:
+        worker_alive = inference_pool.alive()
+    else:
+        worker_alive = processing_thread is not None and processing_thread.is_alive()
+    status, code = ready_payload(worker_alive)
+    return jsonify(status), code
 
 if __name__ == '__main__':
     try:
+        startup()
         app.run(debug = False, threaded = True, host = '0.0.0.0', port = 5000)
     finally:
         # Cleanup on shutdown
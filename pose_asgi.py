@@ -0,0 +1,371 @@
+import asyncio
+import json
+import re
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import main
+
+'''
+    Asyncio (ASGI) serving mode for the pose service
+
+    - Same routes as main.py: /process_frame, /pose_data, /start_recording, /stop_recording,
+      /recording_status, /queue_status (plus /start_processing, /ready, /recording_analytics/<id>
+      and the processed frames)
+    - Decode, inference and encoding run in a single-thread executor (the same serialisation
+      as the Flask worker thread); the Firebase upload runs in a separate I/O executor
+    - Each session's next result is an asyncio future: /process_frame with 'wait': true waits
+      for a result newer than 'last_version' / 'last_epoch' without holding a thread
+    - /events streams a session's results, recording and queue health (server-sent events)
+      as a coroutine, so open streams cost no threads
+    - Pages and static files are passed to the Flask app when asgiref is installed
+    - Run: uvicorn pose_asgi:app --host 0.0.0.0 --port 5000
+'''
+
+# Frames in flight across all sessions (same bound as the Flask frame queue)
+MAX_INFLIGHT = main.frame_queue.maxsize
+
+# Longest a 'wait' request is held for a newer result (seconds)
+WAIT_TIMEOUT = 2.0
+
+FRAME_PATH = re.compile(r'^/frame/([^/]+)/([^/]+)/(\d+)\.jpg$')
+ANALYTICS_PATH = re.compile(r'^/recording_analytics/([^/]+)$')
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    flask_app = WsgiToAsgi(main.app)
+except ImportError:
+    flask_app = None
+
+inference_executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'pose-inference')
+io_executor = ThreadPoolExecutor(max_workers = 4, thread_name_prefix = 'pose-io')
+
+class SessionChannel:
+    def __init__(self, loop):
+        # Async side of a PoseSession: its frame in flight and the future of its next result
+        self.loop = loop
+        self.inflight = None
+        self.next_result = loop.create_future()
+
+    def publish(self, result):
+        if not self.next_result.done():
+            self.next_result.set_result(result)
+        self.next_result = self.loop.create_future()
+
+channels = {}
+inflight = 0
+serving = False
+expiry_task = None
+stats = {'submitted': 0, 'skipped': 0, 'completed': 0, 'gated': 0, 'errors': 0}
+
+def get_channel(session_id):
+    channel = channels.get(session_id)
+    if channel is None:
+        channel = SessionChannel(asyncio.get_running_loop())
+        channels[session_id] = channel
+    return channel
+
+def process_and_record(session, image_data, received_at):
+    # Runs in the inference executor
+    result = main.process_session_frame(session, image_data, received_at)
+    if result is not None:
+        # Let the controller adapt quality to the observed load
+        session.controller.record(
+            time.time() - received_at,
+            inflight,
+            MAX_INFLIGHT,
+            len(main.sessions)
+        )
+    return result
+
+def submit_frame(session, image_data):
+    # One frame in flight per session; skip frames while busy (like a full frame queue)
+    global inflight
+
+    channel = get_channel(session.session_id)
+    if channel.inflight is not None or inflight >= MAX_INFLIGHT:
+        stats['skipped'] += 1
+        return
+
+    inflight += 1
+    stats['submitted'] += 1
+    future = asyncio.get_running_loop().run_in_executor(
+        inference_executor, process_and_record, session, image_data, time.time())
+    channel.inflight = future
+    future.add_done_callback(lambda done: frame_done(channel, done))
+
+def frame_done(channel, future):
+    # Runs on the event loop when the executor finishes a frame
+    global inflight
+
+    inflight -= 1
+    channel.inflight = None
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        stats['errors'] += 1
+        print(f"[ERROR] Frame processing error: {future.exception()}")
+        return
+
+    result = future.result()
+    if result is None:
+        stats['gated'] += 1
+        return
+    stats['completed'] += 1
+    channel.publish(result)
+
+async def expire_sessions_periodically():
+    # Close idle sessions (on the inference thread, which owns the pose graphs)
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(main.SESSION_TIMEOUT / 2)
+        await loop.run_in_executor(inference_executor, main.expire_sessions)
+        for session_id in list(channels):
+            if session_id not in main.sessions and channels[session_id].inflight is None:
+                channels.pop(session_id)
+
+# Route handlers: (scope, body) -> (status, content type, body bytes, extra headers)
+def json_response(payload, status = 200):
+    return status, 'application/json', json.dumps(payload, ensure_ascii = False).encode('utf-8'), []
+
+def parse_json(body):
+    return json.loads(body) if body else {}
+
+async def start_processing(scope, body):
+    if main.startup(start_worker = False):
+        return json_response({'status': 'success', 'message': '處理線程已啟動'})
+    return json_response({'status': 'warming_up', 'message': '模型載入中'})
+
+async def process_frame(scope, body):
+    # Receive frame from frontend and submit it for processing
+    try:
+        data = parse_json(body)
+        image_data = data.get('image')
+
+        if not image_data:
+            return json_response({'status': 'error', 'message': '沒有收到圖片資訊'})
+
+        # Do not accept frames before the models are warm
+        if not main.ready_event.is_set():
+            main.startup(start_worker = False)
+            return json_response({'status': 'warming_up', 'message': '模型載入中'})
+
+        session = main.get_session(data.get('session_id') or 'default')
+        main.apply_client_options(session, data)
+        submit_frame(session, image_data)
+
+        last_version, last_epoch = data.get('last_version'), data.get('last_epoch')
+        load = (inflight, MAX_INFLIGHT, 1)
+        payload = main.latest_result_payload(session, last_version, load, last_epoch)
+
+        # Long poll: wait for a newer result instead of answering 'unchanged' / 'processing'
+        if data.get('wait') and payload['status'] in ('unchanged', 'processing'):
+            try:
+                await asyncio.wait_for(asyncio.shield(get_channel(session.session_id).next_result), WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            payload = main.latest_result_payload(session, last_version, load, last_epoch)
+
+        return json_response(payload)
+
+    except Exception as e:
+        print(f"[ERROR] process_frame: {e}")
+        return json_response({'status': 'error', 'message': str(e)})
+
+async def pose_data(scope, body):
+    try:
+        return json_response(main.pose_data_payload())
+    except Exception as e:
+        return json_response({'status': 'error', 'message': str(e)})
+
+async def start_recording(scope, body):
+    try:
+        return json_response(main.begin_recording())
+    except Exception as e:
+        return json_response({'status': 'error', 'message': str(e)})
+
+async def stop_recording(scope, body):
+    # The Firebase upload blocks, keep it off the event loop
+    try:
+        payload = await asyncio.get_running_loop().run_in_executor(io_executor, main.finish_recording)
+        return json_response(payload)
+    except Exception as e:
+        return json_response({'status': 'error', 'message': str(e)})
+
+async def recording_status(scope, body):
+    return json_response(main.recording_status_payload())
+
+async def queue_status(scope, body):
+    payload = main.queue_status_payload()
+    payload.update({
+        'serving_mode': 'asgi',
+        'frame_queue_size': inflight,
+        'processing_active': serving,
+        'frames': dict(stats)
+    })
+    return json_response(payload)
+
+async def ready(scope, body):
+    payload, status = main.ready_payload(serving)
+    return json_response(payload, status)
+
+async def result_image(scope, body):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    version = query.get('version', [None])[0]
+    return frame_response(
+        query.get('session_id', ['default'])[0],
+        int(version) if version and version.isdigit() else None,
+        query.get('epoch', [None])[0]
+    )
+
+async def recording_analytics(recording_id):
+    # May read Firebase and recompute, keep it off the event loop
+    try:
+        payload, status = await asyncio.get_running_loop().run_in_executor(
+            io_executor, main.recording_analytics_payload, recording_id)
+        return json_response(payload, status)
+    except Exception as e:
+        return json_response({'status': 'error', 'message': str(e)}, 500)
+
+def frame_response(session_id, version, epoch = None):
+    jpeg, error = main.processed_frame_bytes(session_id, version, epoch)
+    if error is not None:
+        return json_response(*error)
+    return 200, 'image/jpeg', jpeg, [(b'cache-control', main.frame_cache_control(version, epoch).encode('latin-1'))]
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def events(scope, receive, send):
+    # Server-sent event stream of one session (see main.session_events)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    session_id = query.get('session_id', ['default'])[0]
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': f'retry: {main.EVENT_RETRY_MS}\n\n'.encode('utf-8'), 'more_body': True})
+
+    sent = {'version': 0}
+    last_write = time.time()
+    try:
+        while not disconnected.done():
+            # Wake on the session's next result, a disconnect, or the poll interval
+            await asyncio.wait([disconnected, get_channel(session_id).next_result],
+                               timeout = main.EVENT_POLL_INTERVAL, return_when = asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                break
+
+            chunk = ''.join(
+                main.format_event(name, payload)
+                for name, payload in main.session_events(session_id, sent, (inflight, MAX_INFLIGHT, 1), serving)
+            )
+            if not chunk and time.time() - last_write > main.EVENT_KEEPALIVE:
+                chunk = ': keepalive\n\n'
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+                last_write = time.time()
+    finally:
+        disconnected.cancel()
+
+# Streaming handlers: (scope, receive, send), they send the response themselves
+STREAMS = {
+    ('GET', '/events'): events
+}
+
+ROUTES = {
+    ('POST', '/start_processing'): start_processing,
+    ('POST', '/process_frame'): process_frame,
+    ('GET', '/pose_data'): pose_data,
+    ('POST', '/start_recording'): start_recording,
+    ('POST', '/stop_recording'): stop_recording,
+    ('GET', '/recording_status'): recording_status,
+    ('GET', '/queue_status'): queue_status,
+    ('GET', '/ready'): ready,
+    ('GET', '/result_image'): result_image
+}
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+async def lifespan(receive, send):
+    global serving, expiry_task
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Warm-up runs in its own thread; /ready reports when it is done
+            main.startup(start_worker = False)
+            serving = True
+            expiry_task = asyncio.ensure_future(expire_sessions_periodically())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            serving = False
+            if expiry_task is not None:
+                expiry_task.cancel()
+            inference_executor.shutdown(wait = True)
+            io_executor.shutdown(wait = True)
+            with main.sessions_lock:
+                for session in main.sessions.values():
+                    session.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    stream = STREAMS.get((method, path))
+    if stream is not None:
+        await stream(scope, receive, send)
+        return
+
+    handler = ROUTES.get((method, path))
+    match = FRAME_PATH.match(path) if method == 'GET' else None
+    analytics = ANALYTICS_PATH.match(path) if method == 'GET' else None
+
+    if handler is None and match is None and analytics is None:
+        if flask_app is not None:
+            await flask_app(scope, receive, send)
+            return
+        response = json_response({'status': 'error', 'message': 'Not found'}, 404)
+    elif match is not None:
+        response = frame_response(match.group(1), int(match.group(3)), match.group(2))
+    elif analytics is not None:
+        response = await recording_analytics(analytics.group(1))
+    else:
+        response = await handler(scope, await read_body(receive))
+
+    status, content_type, body, headers = response
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
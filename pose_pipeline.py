@@ -0,0 +1,629 @@
+import cv2
+import time
+import numpy as np
+
+from collections import OrderedDict
+
+'''
+    Helpers for the pose processing pipeline in main.py
+
+    - QualityController: steps a session through a ladder of inference /
+      encode settings to hold a target fps under load
+    - PoseCropper: runs inference on a padded person box from the previous
+      frame's landmarks and maps landmarks back to full-frame coordinates
+    - LandmarkPredictor: constant-velocity prediction of landmarks for the
+      frames skipped by strided inference
+    - KinematicsEngine: 3D joint angles, angular / linear velocities and
+      accelerations of every joint chain from a per-session landmark ring
+    - FrameGate: cheap pre-inference check for static, duplicate and blurred frames
+    - FrameBufferPool: reusable, shape-keyed NumPy buffers for per-frame image work
+    - OverlayRenderer: skeleton overlay in one polylines call plus cached label sprites
+'''
+
+# Quality ladder (index 0 = best quality, last = cheapest)
+'''
+    - model_complexity: MediaPipe Pose model (2 heavy, 1 full, 0 lite)
+    - inference_width: frame width fed to the model (landmarks are normalized,
+      so they map back to the full frame unchanged)
+    - overlay: draw skeleton / landmark overlay on the returned image
+    - jpeg_quality: quality of the returned JPEG
+    - capture_width: frame width recommended to the client (4:3, 320 is the old fixed size)
+'''
+QUALITY_LADDER = [
+    {'model_complexity': 2, 'inference_width': 640, 'overlay': True, 'jpeg_quality': 80, 'capture_width': 480},
+    {'model_complexity': 1, 'inference_width': 640, 'overlay': True, 'jpeg_quality': 80, 'capture_width': 320},
+    {'model_complexity': 1, 'inference_width': 480, 'overlay': True, 'jpeg_quality': 70, 'capture_width': 320},
+    {'model_complexity': 0, 'inference_width': 480, 'overlay': True, 'jpeg_quality': 70, 'capture_width': 320},
+    {'model_complexity': 0, 'inference_width': 320, 'overlay': True, 'jpeg_quality': 60, 'capture_width': 240},
+    {'model_complexity': 0, 'inference_width': 320, 'overlay': False, 'jpeg_quality': 50, 'capture_width': 240},
+]
+
+class QualityController:
+    def __init__(self, target_fps = 10, best_level = 1, ladder = QUALITY_LADDER,
+                 degrade_patience = 5, recover_patience = 30, cooldown = 2.0, smoothing = 0.2):
+        '''
+            target_fps: frames per second each session should be served at
+            best_level: highest-quality ladder step the controller recovers to
+                        (1 keeps the previous default of model_complexity = 1)
+            degrade_patience / recover_patience: consecutive frames over / under
+                        budget before stepping (recovery is slower on purpose)
+            cooldown: seconds to hold a level after changing it, so the new
+                        model's warm-up does not trigger another step
+            smoothing: EWMA factor for per-frame latency
+        '''
+        self.target_fps = target_fps
+        self.best_level = best_level
+        self.ladder = ladder
+        self.degrade_patience = degrade_patience
+        self.recover_patience = recover_patience
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+
+        self.level = best_level
+        self.latency = None
+        self.over_budget = 0
+        self.under_budget = 0
+        self.last_change = 0.0
+        self.changes = 0
+
+    @property
+    def settings(self):
+        return self.ladder[self.level]
+
+    def record(self, latency, queue_depth, queue_capacity, active_sessions = 1):
+        # Feed one frame's processing latency and queue depth; returns True if the level changed
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        # One worker serves every session, so the per-frame budget shrinks with load
+        budget = 1.0 / (self.target_fps * max(active_sessions, 1))
+        queue_full = queue_depth >= queue_capacity - 1
+
+        if self.latency > budget * 0.9 or queue_full:
+            self.over_budget += 1
+            self.under_budget = 0
+        elif self.latency < budget * 0.6 and queue_depth == 0:
+            self.under_budget += 1
+            self.over_budget = 0
+        else:
+            self.over_budget = 0
+            self.under_budget = 0
+
+        now = time.time()
+        if now - self.last_change < self.cooldown:
+            return False
+
+        if self.over_budget >= self.degrade_patience and self.level < len(self.ladder) - 1:
+            return self.set_level(self.level + 1, now)
+        if self.under_budget >= self.recover_patience and self.level > self.best_level:
+            return self.set_level(self.level - 1, now)
+        return False
+
+    def recommend(self, queue_depth, queue_capacity, active_sessions = 1, workers = 1,
+                  min_interval = 0.1, max_interval = 1.0):
+        # Capture interval / size for the client, so frames the node cannot process are never sent
+        interval = 1.0 / self.target_fps
+        if self.latency is not None:
+            # Sessions share the workers' time; keep 20% headroom
+            interval = max(interval, self.latency * max(active_sessions, 1) / max(workers, 1) * 1.2)
+        if queue_capacity and queue_depth >= queue_capacity - 1:
+            interval *= 1.5
+        interval = min(max(interval, min_interval), max_interval)
+
+        width = self.settings['capture_width']
+        return {
+            # Rounded to 10 ms so clients do not reschedule on every small change
+            'interval_ms': int(round(interval * 100)) * 10,
+            'width': width,
+            'height': width * 3 // 4
+        }
+
+    def set_level(self, level, now = None):
+        self.level = level
+        self.over_budget = 0
+        self.under_budget = 0
+        self.last_change = now if now is not None else time.time()
+        self.changes += 1
+        return True
+
+    def status(self):
+        return {
+            'level': self.level,
+            'settings': dict(self.settings),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'target_fps': self.target_fps,
+            'changes': self.changes
+        }
+
+class PoseCropper:
+    def __init__(self, padding = 0.25, min_size = 0.3, min_visibility = 0.5,
+                 min_visible = 4, regrow = 1.8, full_frame = 0.9):
+        '''
+            padding: margin added around the landmark box (fraction of box size)
+            min_size: smallest crop side (fraction of the frame)
+            min_visibility / min_visible: landmarks needed to trust the box,
+                        otherwise tracking is treated as lost (full frame)
+            regrow: the crop is only moved when the person leaves it or it is
+                        this many times larger than needed, so MediaPipe's own
+                        tracker sees a stable input between frames
+            full_frame: crops covering more than this fraction of both sides
+                        fall back to the full frame
+        '''
+        self.padding = padding
+        self.min_size = min_size
+        self.min_visibility = min_visibility
+        self.min_visible = min_visible
+        self.regrow = regrow
+        self.full_frame = full_frame
+
+        # Normalized (x0, y0, x1, y1) in full-frame coordinates, None = full frame
+        self.box = None
+        self.crops = 0
+        self.full_frames = 0
+
+    def crop(self, image):
+        # Crop view of image for inference and its pixel box (x0, y0, x1, y1)
+        h, w = image.shape[:2]
+        if self.box is None:
+            self.full_frames += 1
+            return image, (0, 0, w, h)
+
+        x0 = int(self.box[0] * w)
+        y0 = int(self.box[1] * h)
+        x1 = max(int(np.ceil(self.box[2] * w)), x0 + 1)
+        y1 = max(int(np.ceil(self.box[3] * h)), y0 + 1)
+        self.crops += 1
+        return image[y0:y1, x0:x1], (x0, y0, x1, y1)
+
+    def map_landmarks(self, landmarks, box, frame_shape):
+        # Map crop-normalized landmarks back to full-frame normalized coordinates (in place)
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        crop_w = x1 - x0
+        crop_h = y1 - y0
+        if (crop_w, crop_h) == (w, h):
+            return
+
+        for landmark in landmarks:
+            landmark.x = (landmark.x * crop_w + x0) / w
+            landmark.y = (landmark.y * crop_h + y0) / h
+            # z shares the scale of x
+            landmark.z = landmark.z * crop_w / w
+
+    def update(self, landmarks):
+        # Choose next frame's crop from this frame's full-frame landmarks
+        if landmarks is None:
+            self.box = None
+            return
+
+        points = np.array([[lm.x, lm.y, lm.visibility] for lm in landmarks])
+        visible = points[points[:, 2] >= self.min_visibility, :2]
+        if len(visible) < self.min_visible:
+            self.box = None
+            return
+
+        (x0, y0), (x1, y1) = visible.min(axis = 0), visible.max(axis = 0)
+        pad_x = max((x1 - x0) * self.padding, (self.min_size - (x1 - x0)) / 2, 0)
+        pad_y = max((y1 - y0) * self.padding, (self.min_size - (y1 - y0)) / 2, 0)
+        target = np.clip([x0 - pad_x, y0 - pad_y, x1 + pad_x, y1 + pad_y], 0.0, 1.0)
+
+        if (target[2] - target[0]) > self.full_frame and (target[3] - target[1]) > self.full_frame:
+            self.box = None
+            return
+
+        # Keep the current crop while it still holds the person with half the padding
+        # and is not much too large
+        if self.box is not None:
+            inner = np.clip([x0 - pad_x / 2, y0 - pad_y / 2, x1 + pad_x / 2, y1 + pad_y / 2], 0.0, 1.0)
+            contains = (self.box[0] <= inner[0] and self.box[1] <= inner[1] and
+                        self.box[2] >= inner[2] and self.box[3] >= inner[3])
+            current_area = (self.box[2] - self.box[0]) * (self.box[3] - self.box[1])
+            target_area = (target[2] - target[0]) * (target[3] - target[1])
+            if contains and current_area <= target_area * self.regrow:
+                return
+
+        self.box = tuple(float(v) for v in target)
+
+    def reset(self):
+        self.box = None
+
+    def status(self):
+        return {
+            'box': [round(v, 3) for v in self.box] if self.box is not None else None,
+            'crops': self.crops,
+            'full_frames': self.full_frames
+        }
+
+def landmarks_to_array(landmarks):
+    # MediaPipe landmark list -> (N, 4) array of x, y, z, visibility
+    return np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in landmarks], dtype = float)
+
+class LandmarkPredictor:
+    def __init__(self, alpha = 0.85, beta = 0.3, max_gap = 1.0):
+        '''
+            Alpha-beta filter per landmark coordinate (the steady-state form of
+            a constant-velocity Kalman filter), updated in one vectorized step.
+            - alpha / beta: position / velocity correction gains
+            - max_gap: seconds without a measurement after which the state is
+              dropped instead of extrapolated
+        '''
+        self.alpha = alpha
+        self.beta = beta
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.visibility = None
+        self.timestamp = None
+
+    @property
+    def ready(self):
+        return self.position is not None
+
+    def update(self, points, timestamp):
+        # Feed measured (N, 4) landmarks; the measurement itself is still what gets returned to clients
+        xyz = points[:, :3]
+        delta_t = timestamp - self.timestamp if self.timestamp is not None else None
+
+        if self.position is None or delta_t is None or delta_t <= 0 or delta_t > self.max_gap:
+            self.position = xyz.copy()
+            self.velocity = np.zeros_like(xyz)
+        else:
+            predicted = self.position + self.velocity * delta_t
+            residual = xyz - predicted
+            self.position = predicted + self.alpha * residual
+            self.velocity = self.velocity + (self.beta / delta_t) * residual
+
+        self.visibility = points[:, 3].copy()
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        # Extrapolated (N, 4) landmarks at timestamp, or None if the state is stale
+        if self.position is None:
+            return None
+
+        delta_t = timestamp - self.timestamp
+        if delta_t < 0 or delta_t > self.max_gap:
+            return None
+
+        predicted = np.empty((len(self.position), 4))
+        predicted[:, :3] = self.position + self.velocity * delta_t
+        predicted[:, 3] = self.visibility
+        return predicted
+
+# Joint chains: name -> (proximal, joint, distal) landmark indices, angle measured at the joint
+JOINT_CHAINS = {
+    'left_shoulder': (23, 11, 13),
+    'right_shoulder': (24, 12, 14),
+    'left_elbow': (11, 13, 15),
+    'right_elbow': (12, 14, 16),
+    'left_wrist': (13, 15, 19),
+    'right_wrist': (14, 16, 20),
+    'left_hip': (11, 23, 25),
+    'right_hip': (12, 24, 26),
+    'left_knee': (23, 25, 27),
+    'right_knee': (24, 26, 28),
+    'left_ankle': (25, 27, 31),
+    'right_ankle': (26, 28, 32)
+}
+CHAIN_NAMES = list(JOINT_CHAINS)
+CHAIN_INDEX = np.array(list(JOINT_CHAINS.values()))
+
+def isotropic_points(points, frame_shape = None):
+    # (..., 33, 3+) normalized landmarks -> (..., 33, 3) in frame widths (y rescaled by the aspect ratio, z is already in x scale)
+    xyz = np.array(points[..., :3], dtype = float)
+    if frame_shape is not None:
+        xyz[..., 1] *= frame_shape[0] / frame_shape[1]
+    return xyz
+
+def joint_angles(xyz, chains = CHAIN_INDEX):
+    # Angles in degrees at each chain's joint: (..., 33, 3) -> (..., chains)
+    joint = xyz[..., chains[:, 1], :]
+    proximal = xyz[..., chains[:, 0], :] - joint
+    distal = xyz[..., chains[:, 2], :] - joint
+    norms = np.linalg.norm(proximal, axis = -1) * np.linalg.norm(distal, axis = -1)
+    cosine = (proximal * distal).sum(axis = -1) / np.maximum(norms, 1e-9)
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+def chain_visibility(points, chains = CHAIN_INDEX):
+    # Lowest visibility of each chain's three landmarks: (..., 33, 4) -> (..., chains)
+    return points[..., chains, 3].min(axis = -1)
+
+class KinematicsEngine:
+    def __init__(self, size = 32, window = 5, max_gap = 0.5, min_visibility = 0.5):
+        '''
+            Per-session ring of (33, 4) landmarks with their timestamps.
+            On every update a quadratic is fitted over the last `window` samples
+            for all chain angles and distal-point coordinates at once (one
+            polyfit over a (window, chains * 4) matrix); its slope and curvature
+            at the newest sample give velocity and acceleration.
+            - Positions are in frame widths, so speeds are frame widths / s
+            - Angular values are degrees, degrees / s and degrees / s^2
+            - max_gap: seconds without landmarks after which the ring restarts
+            - min_visibility: chains whose landmarks fall below it are reported as None
+        '''
+        self.size = size
+        self.window = window
+        self.max_gap = max_gap
+        self.min_visibility = min_visibility
+        self.points = np.zeros((size, 33, 4))
+        self.times = np.zeros(size)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.head = -1
+
+    def update(self, points, timestamp, frame_shape = None):
+        # Add (33, 4) landmarks; returns {quantity: {chain: value or None}} for this frame
+        if self.count and (timestamp <= self.times[self.head] or timestamp - self.times[self.head] > self.max_gap):
+            self.reset()
+
+        self.head = (self.head + 1) % self.size
+        self.points[self.head] = points
+        self.times[self.head] = timestamp
+        self.count = min(self.count + 1, self.size)
+
+        # Last samples in time order
+        k = min(self.window, self.count)
+        order = np.arange(self.head - k + 1, self.head + 1) % self.size
+        samples = self.points[order]
+        xyz = isotropic_points(samples, frame_shape)
+
+        angles = joint_angles(xyz)
+        distal = xyz[:, CHAIN_INDEX[:, 2], :]
+        valid = chain_visibility(samples) >= self.min_visibility
+        chains = len(CHAIN_NAMES)
+
+        velocity = acceleration = None
+        if k >= 2:
+            # One fit for every series: (k, chains) angles + (k, chains * 3) distal coordinates
+            series = np.concatenate([angles, distal.reshape(k, -1)], axis = 1)
+            coefficients = np.polyfit(self.times[order] - timestamp, series, min(2, k - 1))
+            velocity = coefficients[-2]
+            if k >= 3:
+                acceleration = 2 * coefficients[0]
+
+        # Derivatives need the chain visible over the whole window
+        steady = valid.all(axis = 0)
+        kinematics = {'angle': self.by_chain(angles[-1], valid[-1], 1)}
+        if velocity is not None:
+            kinematics['angular_velocity'] = self.by_chain(velocity[:chains], steady, 1)
+            kinematics['speed'] = self.by_chain(
+                np.linalg.norm(velocity[chains:].reshape(chains, 3), axis = 1), steady, 3)
+        if acceleration is not None:
+            kinematics['angular_acceleration'] = self.by_chain(acceleration[:chains], steady, 1)
+            kinematics['acceleration'] = self.by_chain(
+                np.linalg.norm(acceleration[chains:].reshape(chains, 3), axis = 1), steady, 3)
+        return kinematics
+
+    @staticmethod
+    def by_chain(values, valid, digits):
+        return {
+            name: round(value, digits) if ok else None
+            for name, value, ok in zip(CHAIN_NAMES, values.tolist(), valid.tolist())
+        }
+
+    def status(self):
+        return {'samples': self.count}
+
+class FrameGate:
+    def __init__(self, blur_size = (160, 120), diff_size = (64, 48), blur_threshold = 15.0,
+                 static_threshold = 4.0, block = 4, hash_distance = 0, max_skipped = 10):
+        '''
+            Runs on a downsampled grayscale copy before inference.
+            - blurred: Laplacian variance below blur_threshold -> drop frame
+            - change: absolute difference to the last processed frame, averaged over
+              block x block cells of the diff_size thumbnail (each cell ~1/16 of the
+              frame width), largest cell wins; inside the tracked person box when one
+              is given, so a moving arm is not averaged away by a still background
+            - duplicate: difference hash within hash_distance bits of the last processed
+              frame and no cell changed by static_threshold -> reuse previous result
+            - static: no cell changed by static_threshold (grey levels) -> reuse previous result
+            Comparisons are against the last processed frame, so slow drift still
+            triggers inference, and after max_skipped consecutive skips the next
+            frame is processed anyway to refresh tracking.
+        '''
+        self.blur_size = blur_size
+        self.diff_size = diff_size
+        self.blur_threshold = blur_threshold
+        self.static_threshold = static_threshold
+        self.block = block
+        self.hash_distance = hash_distance
+        self.max_skipped = max_skipped
+
+        self.previous_small = None
+        self.previous_hash = None
+        self.skipped = 0
+        self.stats = {'processed': 0, 'static': 0, 'duplicate': 0, 'blurred': 0}
+        self.buffers = FrameBufferPool()
+
+    def change(self, small, box = None):
+        # Largest block-mean absolute difference to the last processed thumbnail (within box)
+        diff = cv2.absdiff(small, self.previous_small)
+        if box is not None:
+            h, w = diff.shape
+            x0, y0 = int(box[0] * w), int(box[1] * h)
+            x1, y1 = max(int(np.ceil(box[2] * w)), x0 + 1), max(int(np.ceil(box[3] * h)), y0 + 1)
+            diff = diff[y0:y1, x0:x1]
+        h, w = diff.shape
+        cells = (max(-(-w // self.block), 1), max(-(-h // self.block), 1))
+        return float(cv2.resize(diff, cells, interpolation = cv2.INTER_AREA).max())
+
+    def check(self, frame, box = None):
+        # Returns 'process', 'static', 'duplicate' or 'blurred'
+        # box: normalized (x0, y0, x1, y1) of the tracked person (PoseCropper.box), None = whole frame
+        blur_w, blur_h = self.blur_size
+        diff_w, diff_h = self.diff_size
+        resized = cv2.resize(frame, self.blur_size, dst = self.buffers.get('resized', (blur_h, blur_w, 3)),
+                             interpolation = cv2.INTER_AREA)
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst = self.buffers.get('gray', (blur_h, blur_w)))
+        # Two 'small' buffers alternate so the last processed one is kept for comparison
+        small_name = 'small_b' if self.previous_small is self.buffers.peek('small_a') else 'small_a'
+        small = cv2.resize(gray, self.diff_size, dst = self.buffers.get(small_name, (diff_h, diff_w)),
+                           interpolation = cv2.INTER_AREA)
+
+        # Difference hash: sign of horizontal gradient on a 9x8 thumbnail
+        thumb = cv2.resize(small, (9, 8), interpolation = cv2.INTER_AREA)
+        frame_hash = np.packbits(thumb[:, 1:] > thumb[:, :-1])
+
+        verdict = 'process'
+        if self.skipped < self.max_skipped:
+            if cv2.Laplacian(gray, cv2.CV_64F).var() < self.blur_threshold:
+                verdict = 'blurred'
+            elif self.previous_small is not None and self.change(small, box) < self.static_threshold:
+                same_hash = np.unpackbits(frame_hash ^ self.previous_hash).sum() <= self.hash_distance
+                verdict = 'duplicate' if same_hash else 'static'
+
+        if verdict == 'process':
+            self.stats['processed'] += 1
+            self.previous_small = small
+            self.previous_hash = frame_hash
+            self.skipped = 0
+        else:
+            self.stats[verdict] += 1
+            self.skipped += 1
+        return verdict
+
+    def reset(self):
+        self.previous_small = None
+        self.previous_hash = None
+        self.skipped = 0
+
+    def status(self):
+        total = sum(self.stats.values())
+        return {
+            **self.stats,
+            'skip_ratio': round(1 - self.stats['processed'] / total, 3) if total else 0.0
+        }
+
+class FrameBufferPool:
+    def __init__(self, max_buffers = 16):
+        '''
+            Reusable arrays keyed by (name, shape, dtype), filled through OpenCV dst= arguments.
+            A handful of shapes per name are kept (the crop size changes as the person moves);
+            the least recently used buffer is dropped beyond max_buffers.
+        '''
+        self.max_buffers = max_buffers
+        self.buffers = OrderedDict()
+        self.allocations = 0
+        self.hits = 0
+
+    def get(self, name, shape, dtype = np.uint8):
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(shape, dtype = dtype)
+            self.buffers[key] = buffer
+            self.allocations += 1
+            if len(self.buffers) > self.max_buffers:
+                self.buffers.popitem(last = False)
+        else:
+            self.buffers.move_to_end(key)
+            self.hits += 1
+        return buffer
+
+    def peek(self, name):
+        # Most recently used buffer with this name (any shape), or None
+        for key in reversed(self.buffers):
+            if key[0] == name:
+                return self.buffers[key]
+        return None
+
+    def clear(self):
+        self.buffers.clear()
+
+    def status(self):
+        return {
+            'buffers': len(self.buffers),
+            'bytes': int(sum(buffer.nbytes for buffer in self.buffers.values())),
+            'allocations': self.allocations,
+            'hits': self.hits
+        }
+
+class OverlayRenderer:
+    def __init__(self, connections, min_visibility = 0.5, label_visibility = 0.8,
+                 line_color = (224, 224, 224), line_thickness = 2, joint_radius = 2,
+                 dot_color = (0, 0, 255), dot_radius = 8, label_color = (255, 255, 255)):
+        '''
+            connections: landmark index pairs (e.g. mp_pose.POSE_CONNECTIONS)
+            min_visibility: landmarks / connections drawn as the skeleton
+            label_visibility: landmarks that get the red dot and index label
+            The dot + label of each index is rendered once into a sprite and
+            blitted through its mask afterwards (putText is the slow call).
+        '''
+        self.connections = np.array(sorted(connections), dtype = np.int32).reshape(-1, 2)
+        self.min_visibility = min_visibility
+        self.label_visibility = label_visibility
+        self.line_color = line_color
+        self.line_thickness = line_thickness
+        self.dot_color = dot_color
+        self.dot_radius = dot_radius
+        self.label_color = label_color
+        self.sprites = {}
+
+        # Pixel offsets of a filled disk for the small joint markers
+        offset = np.arange(-joint_radius, joint_radius + 1)
+        dy, dx = np.meshgrid(offset, offset, indexing = 'ij')
+        inside = dx ** 2 + dy ** 2 <= joint_radius ** 2
+        self.joint_offsets = np.stack([dx[inside], dy[inside]], axis = 1)
+
+    def sprite(self, index):
+        # (image, mask, anchor_x, anchor_y) of the dot + index label, rendered on first use
+        sprite = self.sprites.get(index)
+        if sprite is None:
+            text = str(index)
+            (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+            pad = 2
+            # Same layout as the old per-landmark calls: dot at the landmark, text at (+10, -10)
+            left = self.dot_radius + pad
+            top = max(self.dot_radius, 10 + text_h) + pad
+            width = left + max(self.dot_radius, 10 + text_w) + pad + 1
+            height = top + max(self.dot_radius, baseline - 10) + pad + 1
+
+            image = np.zeros((height, width, 3), dtype = np.uint8)
+            mask = np.zeros((height, width), dtype = np.uint8)
+            for canvas, dot_color, text_color in ((image, self.dot_color, self.label_color), (mask, 255, 255)):
+                cv2.circle(canvas, (left, top), self.dot_radius, dot_color, -1)
+                cv2.putText(canvas, text, (left + 10, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
+            sprite = (image, mask, left, top)
+            self.sprites[index] = sprite
+        return sprite
+
+    def blit(self, image, index, x, y):
+        # Copy the sprite through its mask onto image (native copyTo into a view), clipped at the borders
+        sprite, mask, left, top = self.sprite(index)
+        h, w = image.shape[:2]
+        x0, y0 = x - left, y - top
+        x1, y1 = x0 + sprite.shape[1], y0 + sprite.shape[0]
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, w), min(y1, h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        sy, sx = slice(cy0 - y0, cy1 - y0), slice(cx0 - x0, cx1 - x0)
+        cv2.copyTo(sprite[sy, sx], mask[sy, sx], image[cy0:cy1, cx0:cx1])
+
+    def render(self, image, points):
+        # Draw (N, 4) normalized landmarks onto a BGR image in place
+        h, w = image.shape[:2]
+        pixels = (points[:, :2] * (w, h)).astype(np.int32)
+        visible = points[:, 3] >= self.min_visibility
+
+        # All connections in one call
+        edges = self.connections[visible[self.connections[:, 0]] & visible[self.connections[:, 1]]]
+        if len(edges):
+            cv2.polylines(image, list(pixels[edges]), False, self.line_color, self.line_thickness)
+
+        # Joint markers in one fancy-indexed assignment
+        joints = (pixels[visible][:, None, :] + self.joint_offsets[None]).reshape(-1, 2)
+        inside = (joints[:, 0] >= 0) & (joints[:, 0] < w) & (joints[:, 1] >= 0) & (joints[:, 1] < h)
+        image[joints[inside, 1], joints[inside, 0]] = self.line_color
+
+        # Dot + label sprites for confident landmarks
+        for index in np.flatnonzero(points[:, 3] >= self.label_visibility).tolist():
+            self.blit(image, index, int(pixels[index, 0]), int(pixels[index, 1]))
+        return image
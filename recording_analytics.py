@@ -0,0 +1,198 @@
+import warnings
+import numpy as np
+
+from pose_pipeline import CHAIN_NAMES, CHAIN_INDEX, isotropic_points, joint_angles, chain_visibility
+
+'''
+    Post-session analytics of a finished recording
+
+    - records_to_array(): recorded frames -> (frames, 33, 4) landmarks and their times;
+      landmarks missing from a frame (dropped for low visibility) are NaN
+    - analyze_recording(): range of motion, angle series, peak angular velocity and
+      endpoint speed per joint chain (pose_pipeline.JOINT_CHAINS), and left / right
+      symmetry indices, computed over the whole array at once
+    - The result is a compact, JSON-ready artifact stamped with ANALYTICS_VERSION;
+      main.py stores it per recording id and version, so changing the computation
+      means bumping the version and old artifacts are recomputed on their next view
+'''
+
+ANALYTICS_VERSION = 1
+
+# recording_info['landmark_ids'] of recordings whose landmark 'id' is the MediaPipe index
+# (older recordings numbered the visibility-filtered list instead)
+LANDMARK_IDS = 'mediapipe'
+
+# Chains whose landmarks fall below this visibility are left out of a frame
+MIN_VISIBILITY = 0.5
+
+# Fewer valid frames than this and a chain reports None
+MIN_VALID_FRAMES = 3
+
+# Centered moving mean (frames) applied before differentiating
+SMOOTHING_FRAMES = 5
+
+# Range of motion between these percentiles (a few bad frames do not set the extremes)
+ROM_PERCENTILES = (2, 98)
+
+# Angle series are averaged down to at most this many points
+SERIES_POINTS = 300
+
+# (left, right) chain pairs compared by the symmetry indices
+SYMMETRY_PAIRS = {
+    name[len('left_'):]: (CHAIN_NAMES.index(name), CHAIN_NAMES.index('right_' + name[len('left_'):]))
+    for name in CHAIN_NAMES if name.startswith('left_')
+}
+
+def records_to_array(records, landmark_ids = True):
+    '''
+        Recorded frames (main.recording records or the saved pose_json frames)
+        -> (points (frames, 33, 4), times (frames,)), sorted by time with
+        repeated timestamps dropped
+        - A frame identical to the one before it is a reused pose (older recordings
+          recorded frames skipped by the frame gate with the last landmarks), not a
+          measurement, and is dropped too
+        - landmark_ids: each landmark's 'id' is its MediaPipe index (LANDMARK_IDS);
+          otherwise (older recordings) a frame is only placed when it has all 33
+          landmarks, in index order, and is left NaN when some were filtered out
+    '''
+    points = np.full((len(records), 33, 4), np.nan)
+    times = np.empty(len(records))
+    for row, record in enumerate(records):
+        times[row] = record['timestamp']
+        landmarks = record.get('landmarks') or []
+        if not landmark_ids and len(landmarks) != 33:
+            continue
+        for index, landmark in enumerate(landmarks):
+            points[row, landmark['id'] if landmark_ids else index] = (
+                landmark['x'], landmark['y'], landmark['z'], landmark['visibility'])
+
+    times, rows = np.unique(times, return_index = True)
+    points = points[rows]
+    repeated = np.zeros(len(points), dtype = bool)
+    same = (points[1:] == points[:-1]) | (np.isnan(points[1:]) & np.isnan(points[:-1]))
+    repeated[1:] = same.all(axis = (1, 2))
+    return points[~repeated], times[~repeated]
+
+def moving_mean(series, width):
+    # Centered moving mean along axis 0 ignoring NaNs: (frames, n) -> (frames, n), NaN stays NaN
+    valid = np.isfinite(series)
+    padding = ((width // 2 + 1, width // 2), (0, 0))
+    sums = np.cumsum(np.pad(np.where(valid, series, 0.0), padding), axis = 0)
+    counts = np.cumsum(np.pad(valid.astype(float), padding), axis = 0)
+    smoothed = (sums[width:] - sums[:-width]) / np.maximum(counts[width:] - counts[:-width], 1)
+    smoothed[~valid] = np.nan
+    return smoothed
+
+def downsample(times, series, points):
+    # Average (frames, n) series into at most `points` equal time bins; empty bins are dropped
+    if len(times) <= points:
+        return times, series
+    duration = max(times[-1] - times[0], 1e-9)
+    bins = np.minimum(((times - times[0]) / duration * points).astype(int), points - 1)
+    valid = np.isfinite(series)
+
+    sums = np.zeros((points, series.shape[1]))
+    counts = np.zeros((points, series.shape[1]))
+    np.add.at(sums, bins, np.where(valid, series, 0.0))
+    np.add.at(counts, bins, valid)
+    frames = np.bincount(bins, minlength = points)
+    bin_times = np.bincount(bins, weights = times, minlength = points) / np.maximum(frames, 1)
+
+    averaged = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    used = frames > 0
+    return bin_times[used], averaged[used]
+
+def symmetry_index(left, right):
+    # Robinson symmetry index in percent, positive when the left side is larger (NaN if either side is)
+    mean = (left + right) / 2
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        index = 100 * (left - right) / mean
+    return np.where(np.abs(mean) < 1e-6, 0.0, index)
+
+def rounded(values, digits):
+    # Array -> list of rounded floats, None where NaN
+    return [None if not np.isfinite(value) else round(float(value), digits) for value in values]
+
+def analyze_recording(points, times, frame_size = None):
+    '''
+        points: (frames, 33, 4) normalized landmarks, times: (frames,) seconds
+        frame_size: (height, width) of the camera frames, so y is scaled like x
+        (square frames are assumed without it)
+        Returns the artifact: {'version', 'frames', 'duration', 'frame_size',
+        'chains': {chain: rom / peaks}, 'symmetry': {joint: indices},
+        'series': {'timestamps', 'angle': {chain: [...]}}}
+    '''
+    frames = len(times)
+    chains = len(CHAIN_NAMES)
+
+    # Angles and distal points of every chain, NaN where the chain is not visible
+    xyz = isotropic_points(points, frame_size)
+    visible = chain_visibility(points) >= MIN_VISIBILITY
+    angles = np.where(visible, joint_angles(xyz), np.nan)
+    endpoints = np.where(visible[..., None], xyz[:, CHAIN_INDEX[:, 2]], np.nan)
+
+    # Derivatives of the smoothed series against the (uneven) frame times
+    if frames >= MIN_VALID_FRAMES:
+        smoothed = moving_mean(np.concatenate([angles, endpoints.reshape(frames, -1)], axis = 1), SMOOTHING_FRAMES)
+        rates = np.gradient(smoothed, times, axis = 0)
+        angular_velocity = np.abs(rates[:, :chains])
+        speed = np.linalg.norm(rates[:, chains:].reshape(frames, chains, 3), axis = -1)
+    else:
+        angular_velocity = speed = np.full((frames, chains), np.nan)
+
+    valid_frames = visible.sum(axis = 0)
+    enough = valid_frames >= MIN_VALID_FRAMES
+
+    # Column-wise reductions; chains without data give NaN (and a warning we do not need)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(angles, ROM_PERCENTILES, axis = 0) if frames else np.full((2, chains), np.nan)
+        mean_angle = np.nanmean(angles, axis = 0)
+        peak_velocity = np.nanmax(angular_velocity, axis = 0) if frames else np.full(chains, np.nan)
+        peak_speed = np.nanmax(speed, axis = 0) if frames else np.full(chains, np.nan)
+
+    rom, low, high, mean_angle, peak_velocity, peak_speed = (
+        np.where(enough, values, np.nan) for values in (high - low, low, high, mean_angle, peak_velocity, peak_speed))
+
+    # Left / right symmetry of range of motion and peak angular velocity
+    left, right = (np.array(side) for side in zip(*SYMMETRY_PAIRS.values()))
+    rom_symmetry = symmetry_index(rom[left], rom[right])
+    velocity_symmetry = symmetry_index(peak_velocity[left], peak_velocity[right])
+
+    series_times, series = downsample(times, angles, SERIES_POINTS)
+    summary = {
+        'rom': rounded(rom, 1),
+        'min_angle': rounded(low, 1),
+        'max_angle': rounded(high, 1),
+        'mean_angle': rounded(mean_angle, 1),
+        'peak_angular_velocity': rounded(peak_velocity, 1),
+        'peak_speed': rounded(peak_speed, 3)
+    }
+    rom_symmetry, velocity_symmetry = rounded(rom_symmetry, 1), rounded(velocity_symmetry, 1)
+
+    return {
+        'version': ANALYTICS_VERSION,
+        'frames': frames,
+        'duration': round(float(times[-1] - times[0]), 3) if frames else 0.0,
+        'frame_size': list(frame_size) if frame_size is not None else None,
+        'chains': {
+            name: {
+                'valid_frames': int(valid_frames[index]),
+                **{key: values[index] for key, values in summary.items()}
+            }
+            for index, name in enumerate(CHAIN_NAMES)
+        },
+        'symmetry': {
+            joint: {'rom': rom_symmetry[index], 'peak_angular_velocity': velocity_symmetry[index]}
+            for index, joint in enumerate(SYMMETRY_PAIRS)
+        },
+        'series': {
+            'timestamps': rounded(series_times, 3),
+            'angle': {name: rounded(series[:, index], 1) for index, name in enumerate(CHAIN_NAMES)}
+        }
+    }
+
+def analyze_records(records, frame_size = None, landmark_ids = True):
+    # records_to_array() + analyze_recording()
+    points, times = records_to_array(records, landmark_ids)
+    return analyze_recording(points, times, frame_size)
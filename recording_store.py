@@ -0,0 +1,191 @@
+import os
+import glob
+import json
+import uuid
+import fcntl
+import threading
+
+from datetime import datetime
+
+'''
+    Recording state for main.py
+
+    - MemoryRecording: one process (Flask dev server, ASGI mode)
+    - FileRecording: several gunicorn workers; the recording flag and start time live
+      in a state file and every worker spools its frames to its own JSONL file, so the
+      start / stop requests and the frames may all land on different workers
+    - Both expose start(), add(landmarks, predicted, kinematics), stop() and status()
+'''
+
+class MemoryRecording:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = False
+        self.records = []
+        self.start_time = None
+
+    def start(self):
+        with self.lock:
+            self.active = True
+            self.records = []
+            self.start_time = datetime.now()
+
+    def is_active(self):
+        return self.active
+
+    def add(self, landmarks, predicted = False, kinematics = None):
+        # Append one frame of landmarks (and its kinematics) if recording (timestamp relative to the start)
+        with self.lock:
+            if not self.active or self.start_time is None:
+                return
+            self.records.append({
+                'timestamp': (datetime.now() - self.start_time).total_seconds(),
+                'landmarks': landmarks,
+                'predicted': predicted,
+                'kinematics': kinematics
+            })
+
+    def stop(self):
+        # (records, start_time) of the finished recording, or None if not recording
+        with self.lock:
+            if not self.active:
+                return None
+            records, start_time = self.records, self.start_time
+            self.active = False
+            self.records = []
+            self.start_time = None
+        return records, start_time
+
+    def status(self):
+        with self.lock:
+            status = {
+                'is_recording': self.active,
+                'records_count': len(self.records)
+            }
+            if self.active and self.start_time:
+                status['elapsed_time'] = round((datetime.now() - self.start_time).total_seconds(), 1)
+        return status
+
+class FileRecording:
+    def __init__(self, directory):
+        '''
+            directory: shared by all workers of one host
+            - state.json: {'active', 'start_time', 'recording_id'}, replaced atomically
+              and re-read by a worker only when its inode / mtime changes
+            - frames-<recording_id>-<pid>.jsonl: one spool per worker, line buffered
+            - stop() takes an flock on state.lock, so two stop requests cannot both save
+        '''
+        self.directory = directory
+        os.makedirs(directory, exist_ok = True)
+        self.state_path = os.path.join(directory, 'state.json')
+        self.lock_path = os.path.join(directory, 'state.lock')
+
+        self.lock = threading.Lock()
+        self.state_stamp = None
+        self.active = False
+        self.start_time = None
+        self.recording_id = None
+        self.spool = None
+        self.spool_pid = None
+
+    def refresh(self):
+        # Reload the shared state if another worker changed it
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            self.active, self.start_time, self.recording_id, self.state_stamp = False, None, None, None
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp == self.state_stamp:
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.state_stamp = stamp
+        self.active = state.get('active', False)
+        self.start_time = datetime.fromisoformat(state['start_time']) if state.get('start_time') else None
+        if state.get('recording_id') != self.recording_id:
+            self.close_spool()
+        self.recording_id = state.get('recording_id')
+
+    def write_state(self, state):
+        temp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def spool_paths(self, recording_id):
+        return glob.glob(os.path.join(self.directory, f'frames-{recording_id}-*.jsonl'))
+
+    def close_spool(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def start(self):
+        with self.lock:
+            for path in glob.glob(os.path.join(self.directory, 'frames-*.jsonl')):
+                os.remove(path)
+            self.write_state({
+                'active': True,
+                'start_time': datetime.now().isoformat(),
+                'recording_id': uuid.uuid4().hex
+            })
+            self.refresh()
+
+    def is_active(self):
+        with self.lock:
+            self.refresh()
+            return self.active
+
+    def add(self, landmarks, predicted = False, kinematics = None):
+        with self.lock:
+            self.refresh()
+            if not self.active or self.start_time is None:
+                return
+            # A forked worker must not keep writing to its parent's spool
+            if self.spool is None or self.spool_pid != os.getpid():
+                path = os.path.join(self.directory, f'frames-{self.recording_id}-{os.getpid()}.jsonl')
+                self.spool = open(path, 'a', buffering = 1)
+                self.spool_pid = os.getpid()
+            self.spool.write(json.dumps({
+                'timestamp': (datetime.now() - self.start_time).total_seconds(),
+                'landmarks': landmarks,
+                'predicted': predicted,
+                'kinematics': kinematics
+            }) + '\n')
+
+    def stop(self):
+        with self.lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.refresh()
+            if not self.active:
+                return None
+            recording_id, start_time = self.recording_id, self.start_time
+            self.write_state({'active': False, 'start_time': None, 'recording_id': recording_id})
+            self.refresh()
+            self.close_spool()
+
+            # Merge every worker's spool in time order
+            records = []
+            for path in self.spool_paths(recording_id):
+                with open(path) as f:
+                    records.extend(json.loads(line) for line in f if line.strip())
+                os.remove(path)
+            records.sort(key = lambda record: record['timestamp'])
+        return records, start_time
+
+    def status(self):
+        with self.lock:
+            self.refresh()
+            count = 0
+            if self.active:
+                for path in self.spool_paths(self.recording_id):
+                    with open(path, 'rb') as f:
+                        count += f.read().count(b'\n')
+            status = {
+                'is_recording': self.active,
+                'records_count': count
+            }
+            if self.active and self.start_time:
+                status['elapsed_time'] = round((datetime.now() - self.start_time).total_seconds(), 1)
+        return status
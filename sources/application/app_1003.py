@@ -9,6 +9,8 @@ import os
 import threading
 import time
 
+from pipeline_config import load_pipeline_config
+
 # web application initialization
 app = Flask(__name__)
 
@@ -42,6 +44,12 @@ LANDMARK_NAMES = {
     22: 'RIGHT_THUMB'
 }
 
+# Capture and pose settings (tuned for this machine by app_check_camera.py --tune)
+PIPELINE = load_pipeline_config({
+    'camera': {'width': 640, 'height': 480, 'fps': 30},
+    'pose': {'model_complexity': 1}
+})
+
 camera = None
 camera_lock = threading.Lock()
 
@@ -65,105 +73,172 @@ def init_pose():
     return mp_pose.Pose(
         min_detection_confidence = 0.5,
         min_tracking_confidence = 0.5,
-        model_complexity = 1,
+        model_complexity = PIPELINE['pose']['model_complexity'],
         static_image_mode = False
     )
 
-def generate_frames():
-    # video frame
-    global camera, is_recording, recorded_data, start_time, latest_landmarks, pose
+def process_camera_frame(frame, local_pose):
+    # pose detection, drawing and recording for one camera frame; JPEG bytes or None
+    global latest_landmarks
     
-    # create parallel threading: processing of pose instance
-    local_pose = init_pose()
+    # check empty frame or not
+    if frame.size == 0:
+        return None
     
-    while True:
-        with camera_lock:
-            if camera is None or not camera.isOpened():
-                break
-            
-            success, frame = camera.read()
+    # convert color space
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    image.flags.writeable = False
+    
+    # pose detection
+    results = local_pose.process(image)
+    
+    # 3D human pose
+    image.flags.writeable = True
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    
+    if results.pose_landmarks:
+        # record newest landmarks
+        latest_landmarks = results.pose_landmarks
         
-        if not success or frame is None:
-            time.sleep(0.01)
-            continue
+        # compose 3D pose
+        mp_drawing.draw_landmarks(
+            image,
+            results.pose_landmarks,
+            mp_pose.POSE_CONNECTIONS,
+            landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
+        )
         
-        try:
-            # check empty frame or not
-            if frame.size == 0:
-                continue
-            
-            # convert color space
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
+        # show target landmarks
+        for idx in TARGET_LANDMARKS:
+            landmark = results.pose_landmarks.landmark[idx]
+
+            h, w, c = image.shape
+
+            cx, cy = int(landmark.x * w), int(landmark.y * h)
             
-            # pose detection
-            results = local_pose.process(image)
+            # highlight target landmarks
+            cv2.circle(image, (cx, cy), 8, (0, 0, 255), -1)
+            cv2.putText(image, str(idx), (cx + 10, cy - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+        # while recording, need to save data 
+        if is_recording and start_time:
+            elapsed_time = (datetime.now() - start_time).total_seconds()
             
-            # 3D human pose
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            landmarks_list = []
+
+            for landmark in results.pose_landmarks.landmark:
+                landmarks_list.append({
+                    'x': landmark.x,
+                    'y': landmark.y,
+                    'z': landmark.z,
+                    'visibility': landmark.visibility
+                })
             
-            if results.pose_landmarks:
-                # record newest landmarks
-                latest_landmarks = results.pose_landmarks
-                
-                # compose 3D pose
-                mp_drawing.draw_landmarks(
-                    image,
-                    results.pose_landmarks,
-                    mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
-                )
-                
-                # show target landmarks
-                for idx in TARGET_LANDMARKS:
-                    landmark = results.pose_landmarks.landmark[idx]
+            record = {
+                'timestamp': elapsed_time,
+                'landmarks': landmarks_list
+            }
+            recorded_data.append(record)
+    
+    # encode format is JPEG
+    ret, buffer = cv2.imencode('.jpg', image)
 
-                    h, w, c = image.shape
+    if not ret:
+        return None
+    return buffer.tobytes()
 
-                    cx, cy = int(landmark.x * w), int(landmark.y * h)
-                    
-                    # highlight target landmarks
-                    cv2.circle(image, (cx, cy), 8, (0, 0, 255), -1)
-                    cv2.putText(image, str(idx), (cx + 10, cy - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+class FrameBroadcaster:
+    '''
+        One capture + inference producer for the camera, shared by every /video_feed viewer
+        - The producer thread reads the camera, runs pose detection and encodes each
+          frame once, then publishes it as the latest frame (landmarks go to
+          latest_landmarks for /pose_data as before)
+        - Each viewer waits for a frame newer than the one it sent last; a slow viewer
+          gets the newest frame next and skips the ones in between, so it never holds
+          up the producer or the other viewers
+        - The producer stops by itself once the camera is released
+    '''
+    def __init__(self, subscriber_timeout = 5.0):
+        self.condition = threading.Condition()
+        self.subscriber_timeout = subscriber_timeout
+        self.running = False
+        self.thread = None
+        self.sequence = 0
+        self.frame = None
+        self.subscribers = 0
 
-                # while recording, need to save data 
-                if is_recording and start_time:
-                    elapsed_time = (datetime.now() - start_time).total_seconds()
-                    
-                    landmarks_list = []
-
-                    for landmark in results.pose_landmarks.landmark:
-                        landmarks_list.append({
-                            'x': landmark.x,
-                            'y': landmark.y,
-                            'z': landmark.z,
-                            'visibility': landmark.visibility
-                        })
+    def start(self):
+        # Called with camera_lock held, right after the camera is opened
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target = self.produce, daemon = True)
+        self.thread.start()
+
+    def publish(self, frame_bytes):
+        with self.condition:
+            self.sequence += 1
+            self.frame = frame_bytes
+            self.condition.notify_all()
+
+    def produce(self):
+        # create the pose instance in the producer thread
+        local_pose = init_pose()
+        
+        try:
+            while True:
+                with camera_lock:
+                    if camera is None or not camera.isOpened():
+                        # decided under camera_lock, so start() never races with this exit
+                        with self.condition:
+                            self.running = False
+                            self.condition.notify_all()
+                        break
                     
-                    record = {
-                        'timestamp': elapsed_time,
-                        'landmarks': landmarks_list
-                    }
-                    recorded_data.append(record)
-            
-            # encode format is JPEG
-            ret, buffer = cv2.imencode('.jpg', image)
+                    success, frame = camera.read()
+                
+                if not success or frame is None:
+                    time.sleep(0.01)
+                    continue
+                
+                try:
+                    frame_bytes = process_camera_frame(frame, local_pose)
+                    if frame_bytes is not None:
+                        self.publish(frame_bytes)
+                except Exception as e:
+                    print(f"[Error] In video frame: {e}")
+                    time.sleep(0.01)
+        finally:
+            # clear memory
+            local_pose.close()
 
-            if not ret:
-                continue
-            frame_bytes = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                   
-        except Exception as e:
-            print(f"[Error] In video frame: {e}")
-            time.sleep(0.01)
-            continue
-    
-    # clear memory
-    local_pose.close()
+    def subscribe(self):
+        # multipart JPEG parts for one viewer, always the newest frame
+        with self.condition:
+            self.subscribers += 1
+            last_sequence = self.sequence
+        
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(
+                        lambda: self.sequence != last_sequence or not self.running,
+                        self.subscriber_timeout
+                    )
+                    if not self.running:
+                        break
+                    if self.sequence == last_sequence:
+                        continue
+                    last_sequence, frame_bytes = self.sequence, self.frame
+                
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+broadcaster = FrameBroadcaster()
 
 def get_pose_data():
     # get pose data for 3D visualization and chart
@@ -205,9 +280,9 @@ def start_camera():
             camera = cv2.VideoCapture(0)
             
             # camera settings
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            camera.set(cv2.CAP_PROP_FPS, 30)
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, PIPELINE['camera']['width'])
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, PIPELINE['camera']['height'])
+            camera.set(cv2.CAP_PROP_FPS, PIPELINE['camera']['fps'])
             
             # waiting initialization
             time.sleep(1)
@@ -224,6 +299,9 @@ def start_camera():
                 camera = None
                 return jsonify({'status': 'error', 'message': 'Camera 無法讀取影像'})
             
+            # single capture + inference producer for all viewers
+            broadcaster.start()
+            
             return jsonify({'status': 'success', 'message': 'Camera 已經啟動'})
             
         except Exception as e:
@@ -251,8 +329,8 @@ def stop_camera():
 
 @app.route('/video_feed')
 def video_feed():
-    # video streaming route
-    return Response(generate_frames(),
+    # video streaming route (every viewer shares the broadcaster's frames)
+    return Response(broadcaster.subscribe(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/pose_data')
@@ -5,6 +5,7 @@ import threading
 import queue
 import time
 import base64
+import json
 import pyrebase
 
 from flask import Flask, render_template, Response, jsonify, request
@@ -12,6 +13,7 @@ from datetime import datetime
 from io import BytesIO
 from PIL import Image
 from scipy.signal import butter, lfilter, periodogram
+from pipeline_config import load_pipeline_config
 
 # Firebase configuration
 config = {
@@ -24,6 +26,9 @@ db = firebase.database()
 # Flask application initialization
 app = Flask(__name__)
 
+# Pose model setting tuned for this machine (app_check_camera.py --tune); frames come from the browser
+PIPELINE = load_pipeline_config({'pose': {'model_complexity': 1}})
+
 # Asynchronous processing queue (max 3 frames to prevent memory overflow)
 '''
     - Before operating current task, no need to wait other task
@@ -97,12 +102,41 @@ fps = 30
 g_values = []  
 bpm_history = []  
 
+# Motion gating variables
+'''
+    - MOTION_THRESHOLD: mean speed of target landmarks (normalized units/s)
+      above which a frame is treated as a motion artifact
+    - MOTION_HOLDOFF: seconds after motion ends before green samples are trusted again
+    - MAX_MASKED_RATIO: skip BPM estimation if too much of the window is masked
+    - Masked frames are stored as NaN in g_values and interpolated over
+'''
+MOTION_THRESHOLD = 0.25
+MOTION_HOLDOFF = 0.5
+MAX_MASKED_RATIO = 0.3
+previous_pose = None
+motion_until = 0.0
+motion_gated_frames = 0
+
+# Server-sent event stream (/events)
+'''
+    - One long-lived stream per page instead of polling /get_heart_rate, /queue_status
+      and /recording_status (those routes stay for older pages)
+    - Events, each sent only when it changes: 'heart_rate', 'recording' and 'queue';
+      landmarks and motion state are not streamed, the frame POST reply carries them
+    - A new result (which may bring a new heart rate) wakes the streams at once; the
+      rest is checked every EVENT_POLL_INTERVAL
+'''
+EVENT_POLL_INTERVAL = 1.0
+EVENT_KEEPALIVE = 15
+result_version = 0
+result_changed = threading.Condition()
+
 def init_pose():
     # Initialize MediaPipe Pose model
     return mp_pose.Pose(
         min_detection_confidence = 0.8,
         min_tracking_confidence = 0.8,
-        model_complexity = 1,
+        model_complexity = PIPELINE['pose']['model_complexity'],
         static_image_mode = False
     )
 
@@ -135,20 +169,33 @@ def calculate_heart_rate(g_values_window, fps):
     # Calculate heart rate from green channel values using rPPG
     """
     Args:
-        g_values_window: Window of green channel values
+        g_values_window: Window of green channel values (NaN = masked by motion gating)
         fps: Frame Rate
     Returns:
         Heart rate in BPM or None if invalid
     """
     try:
+        values = np.array(g_values_window, dtype = float)
+        
+        # Skip window if motion masked too much of it, otherwise interpolate over masked samples
+        masked = np.isnan(values)
+        if masked.mean() > MAX_MASKED_RATIO:
+            return None
+        if masked.any():
+            indices = np.arange(len(values))
+            values[masked] = np.interp(indices[masked], indices[~masked], values[~masked])
+        
+        # Remove DC so the filter start-up transient does not dominate the spectrum
+        values -= np.mean(values)
+        
         # Apply bandpass filter
-        filtered_signal = bandpass_filter(np.array(g_values_window), fs = fps)
+        filtered_signal = bandpass_filter(values, fs = fps)
         
         # Calculate power spectral density using periodogram
         frequencies, power = periodogram(filtered_signal, fs = fps)
         
         # Find dominant frequency in valid heart rate range (0.8-3.0 Hz = 48-180 BPM)
-        valid_indices = np.where((frequencies >= 0.8) and (frequencies <= 3.0))
+        valid_indices = np.where((frequencies >= 0.8) & (frequencies <= 3.0))
         if len(valid_indices[0]) == 0:
             return None
         
@@ -185,10 +232,41 @@ def smooth_bpm(new_bpm, history, max_history=5):
         history.pop(0)
     return np.mean(history)
 
+def pose_velocity(landmarks, timestamp):
+    # Mean speed of target landmarks since the previous pose
+    """
+    Args:
+        landmarks: MediaPipe pose landmark list
+        timestamp: Frame time in seconds
+    Returns:
+        Speed in normalized image units per second (0 for the first pose)
+    """
+    global previous_pose
+    
+    points = np.array([[landmarks[idx].x, landmarks[idx].y] for idx in TARGET_LANDMARKS])
+    speed = 0.0
+    
+    if previous_pose is not None:
+        delta_t = timestamp - previous_pose[0]
+        if delta_t > 0:
+            speed = float(np.mean(np.linalg.norm(points - previous_pose[1], axis = 1)) / delta_t)
+    
+    previous_pose = (timestamp, points)
+    return speed
+
+def is_motion_artifact(speed, timestamp):
+    # Flag high-motion intervals, holding the flag for MOTION_HOLDOFF after motion stops
+    global motion_until
+    
+    if speed > MOTION_THRESHOLD:
+        motion_until = timestamp + MOTION_HOLDOFF
+    return timestamp < motion_until
+
 def process_frame_worker():
     # Background thread worker for processing frames asynchronously
     global latest_result, latest_landmarks, is_recording, recorded_data, start_time
-    global processing_active, latest_bpm, g_values, bpm_history
+    global processing_active, latest_bpm, g_values, bpm_history, result_version
+    global previous_pose, motion_gated_frames
     
     # Initialize pose model in worker thread
     local_pose = init_pose()
@@ -218,6 +296,16 @@ def process_frame_worker():
                 image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
                 
                 landmarks_data = None
+                frame_time = time.time()
+                motion_level = 0.0
+                
+                if results.pose_landmarks:
+                    # Pose kinematics for motion gating
+                    motion_level = pose_velocity(results.pose_landmarks.landmark, frame_time)
+                else:
+                    previous_pose = None
+                
+                in_motion = is_motion_artifact(motion_level, frame_time)
                 
                 if results.pose_landmarks:
                     with lock:
@@ -260,11 +348,20 @@ def process_frame_worker():
                         with lock:
                             recorded_data.append(record)
                 
-                # Face detection: rPPG heart rate estimation
-                face_result = mp_face.process(image_rgb)
+                # Face detection: rPPG heart rate estimation (skipped while moving)
                 current_bpm = None
                 
-                if face_result.detections:
+                if in_motion:
+                    # Mask this slot out of the signal buffer, no green extraction or spectrum
+                    g_values.append(np.nan)
+                    motion_gated_frames += 1
+                    if len(g_values) > fps * 10:
+                        g_values = g_values[-(fps * 10):]
+                    face_result = None
+                else:
+                    face_result = mp_face.process(image_rgb)
+                
+                if face_result is not None and face_result.detections:
                     # Get first detected face bounding box
                     detection = face_result.detections[0]
                     bbox = detection.location_data.relative_bounding_box
@@ -308,7 +405,10 @@ def process_frame_worker():
                 
                 # Display heart rate on frame
                 with lock:
-                    if latest_bpm is not None:
+                    if in_motion:
+                        cv2.putText(image_bgr, "Heart Rate: Paused (motion)", 
+                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
+                    elif latest_bpm is not None:
                         cv2.putText(image_bgr, f"Heart Rate: {latest_bpm} BPM", 
                                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
                     else:
@@ -323,12 +423,19 @@ def process_frame_worker():
                     'status': 'success',
                     'image': f'data:image/jpeg;base64,{processed_image}',
                     'landmarks': landmarks_data,
-                    'bpm': latest_bpm if latest_bpm is not None else 0
+                    'bpm': latest_bpm if latest_bpm is not None else 0,
+                    'motion_gated': in_motion,
+                    'motion_level': round(motion_level, 3)
                 }
                 
                 # Update latest result
                 with lock:
                     latest_result = result
+                    result_version += 1
+                
+                # Wake the event streams
+                with result_changed:
+                    result_changed.notify_all()
                 
                 # Put result in queue (non-blocking)
                 if not result_queue.full():
@@ -443,15 +550,20 @@ def pose_data():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
-@app.route('/get_heart_rate')
-def get_heart_rate():
-    # Get current heart rate
+def heart_rate_payload():
+    # Current heart rate
     with lock:
-        return jsonify({
+        return {
             'status': 'success',
             'bpm': latest_bpm if latest_bpm is not None else 0,
-            'detecting': latest_bpm is None
-        })
+            'detecting': latest_bpm is None,
+            'motion_gated': time.time() < motion_until
+        }
+
+@app.route('/get_heart_rate')
+def get_heart_rate():
+    # Get current heart rate
+    return jsonify(heart_rate_payload())
 
 @app.route('/start_recording', methods=['POST'])
 def start_recording():
@@ -525,11 +637,8 @@ def stop_recording():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
-@app.route('/recording_status')
-def recording_status():
-    # Get current recording status
-    global is_recording, start_time, recorded_data
-    
+def recording_status_payload():
+    # Current recording status
     with lock:
         status = {
             'is_recording': is_recording,
@@ -540,7 +649,12 @@ def recording_status():
             elapsed = (datetime.now() - start_time).total_seconds()
             status['elapsed_time'] = round(elapsed, 1)
     
-    return jsonify(status)
+    return status
+
+@app.route('/recording_status')
+def recording_status():
+    # Get current recording status
+    return jsonify(recording_status_payload())
 
 @app.route('/queue_status')
 def queue_status():
@@ -549,9 +663,65 @@ def queue_status():
         'frame_queue_size': frame_queue.qsize(),
         'result_queue_size': result_queue.qsize(),
         'processing_active': processing_active,
-        'heart_rate_samples': len(g_values)
+        'heart_rate_samples': len(g_values),
+        'motion_gated_frames': motion_gated_frames
     })
 
+def queue_health_payload():
+    # Coarse queue health for the event stream (changes far less often than queue_status)
+    depth = frame_queue.qsize()
+    if depth >= frame_queue.maxsize:
+        state = 'saturated'
+    elif depth > frame_queue.maxsize // 2:
+        state = 'busy'
+    else:
+        state = 'ok'
+    return {'state': state, 'processing_active': processing_active}
+
+def changed_events(sent):
+    # [(event, payload)] that changed since the stream's last call ('sent' is the stream's own state)
+    events = []
+    with lock:
+        sent['version'] = result_version
+    
+    for name, payload in (('heart_rate', heart_rate_payload()),
+                          ('recording', recording_status_payload()),
+                          ('queue', queue_health_payload())):
+        if payload != sent.get(name):
+            sent[name] = payload
+            events.append((name, payload))
+    return events
+
+def event_stream():
+    # Generator behind /events: wakes on new results, otherwise every EVENT_POLL_INTERVAL
+    sent = {'version': 0}
+    last_write = time.time()
+    yield 'retry: 3000\n\n'
+    
+    while True:
+        with result_changed:
+            if result_version == sent['version']:
+                result_changed.wait(EVENT_POLL_INTERVAL)
+        
+        chunk = ''.join(
+            f'event: {name}\ndata: {json.dumps(payload, ensure_ascii = False)}\n\n'
+            for name, payload in changed_events(sent)
+        )
+        if chunk:
+            yield chunk
+            last_write = time.time()
+        elif time.time() - last_write > EVENT_KEEPALIVE:
+            yield ': keepalive\n\n'
+            last_write = time.time()
+
+@app.route('/events')
+def events():
+    # Server-sent events: heart rate, recording and queue health
+    response = Response(event_stream(), mimetype = 'text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # Start processing thread when app starts
 start_processing_thread()
 
@@ -1,13 +1,12 @@
 import tkinter as tk
 import cv2
-import time
 import numpy as np
 import threading
 
 from tkinter import ttk
 from PIL import Image, ImageTk
-from collections import deque
-from scipy import signal
+from ppg_engine import HeartRateEngine, MultiFaceHeartRateEngine, CameraSource, LatestFrameSource
+from pipeline_config import load_pipeline_config
 
 # User Interface 
 class HeartRateMonitor:
@@ -20,50 +19,39 @@ class HeartRateMonitor:
         # Camera and Detection 
         self.camera = None
         self.is_running = False
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
-        
-        # Heart Rate Calculation
+
+        # rPPG Engine (Capture -> ROI -> Signal -> BPM, No Display Dependency)
         '''
-            buffered size need to add certain amount for analysis
+            processing size and rate tuned for this machine by app_check_camera.py --tune
         '''
-        self.buffer_size = 300  
-        self.data_buffer = deque(maxlen = self.buffer_size)
+        pipeline = load_pipeline_config({'camera': {'width': 960, 'height': 540, 'fps': 30}})
+        self.frame_size = (pipeline['camera']['width'], pipeline['camera']['height'])
+        self.engine = HeartRateEngine(frame_size = self.frame_size)
+        self.target_fps = pipeline['camera']['fps']
 
-        # Sampling
-        self.times = deque(maxlen = self.buffer_size)
-        self.fps = 25
-        
-        # Store Signal Data
-        self.freqs = []
-        self.fft_spectrum = []
-
-        # Store BPM Data
-        self.bpm = 0
-        self.bpm_history = deque(maxlen = 30)  
-        self.bpm_smooth = deque(maxlen = 5)    
-        
-        # Signal Quality 
-        self.signal_quality = 0
-        self.last_valid_bpm = 0
+        # Multi-Face Tracking (Every Face Annotated, Panels Follow the Largest One)
+        self.multi_face = tk.BooleanVar(value = False)
 
         # Threading Operations
         self.lock = threading.Lock()
 
-        # Per Frame for FPS
-        self.last_frame_time = time.time()
-        self.frame_times = deque(maxlen = 30)
-        self.actual_fps = 0
-
-        # Visualization (In 5 Seconds)
-        self.spectrum_freqs = []
-        self.spectrum_power = []
-        self.waveform_data = deque(maxlen = 150) 
-        self.waveform_times = deque(maxlen = 150)
+        # Render Scheduler
+        '''
+            processing thread only records what changed, GUI is redrawn
+            in one pass every render_interval ms on the main thread
+        '''
+        self.render_interval = 50
+        self.render_job = None
+        self.pending_labels = {}
+        self.pending_frame = None
+        self.waveform_dirty = False
+        self.spectrum_dirty = False
+        self.waveform_x_cache = {}
 
         # Create GUI
         self.create_widgets()
+        self.create_plot_items()
+        self.render_job = self.root.after(self.render_interval, self.render_tick)
 
     def create_widgets(self):
         # Title 
@@ -342,6 +330,20 @@ class HeartRateMonitor:
         )
         self.reset_button.pack(side = tk.LEFT, padx = 5)
         
+        self.multi_face_check = tk.Checkbutton(
+            button_frame,
+            text = "Multi-Face",
+            variable = self.multi_face,
+            command = self.select_engine,
+            font = ('Arial', 11),
+            bg = '#2c3e50',
+            fg = 'white',
+            selectcolor = '#34495e',
+            activebackground = '#2c3e50',
+            activeforeground = 'white'
+        )
+        self.multi_face_check.pack(side = tk.LEFT, padx = 5)
+        
         quit_button = tk.Button(
             button_frame,
             text = "Quit",
@@ -357,6 +359,12 @@ class HeartRateMonitor:
         )
         quit_button.pack(side = tk.RIGHT, padx = 5)
         
+    def select_engine(self):
+        # Swap Engines While Stopped (the Checkbox Is Disabled While Running)
+        engine_class = MultiFaceHeartRateEngine if self.multi_face.get() else HeartRateEngine
+        self.engine = engine_class(frame_size = self.frame_size)
+        self.reset_data()
+        
     def toggle_camera(self):
         if not self.is_running:
             self.start_camera()
@@ -364,22 +372,17 @@ class HeartRateMonitor:
             self.stop_camera()
             
     def start_camera(self):
-        self.camera = cv2.VideoCapture(0)
-        if not self.camera.isOpened():
+        # Capture at Processing Size on a Dedicated Grab Thread (Newest Frame Only)
+        width, height = self.engine.frame_size
+        camera = CameraSource(0, width = width, height = height, fps = self.target_fps)
+        if not camera.is_opened():
+            camera.release()
             self.status_label.config(text = "● Camera Error", fg = '#e74c3c')
             return
-        
-        # Camera Setting
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
-        self.camera.set(cv2.CAP_PROP_FPS, 30)
-        self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        
-        self.camera.set(cv2.CAP_PROP_BRIGHTNESS, 20)
-        self.camera.set(cv2.CAP_PROP_CONTRAST, 20)
-        self.camera.set(cv2.CAP_PROP_SATURATION, 64)
+        self.camera = LatestFrameSource(camera)
         
         self.is_running = True
+        self.multi_face_check.config(state = tk.DISABLED)
         self.start_button.config(text = "Stop Camera", bg = '#c0392b')
         self.status_label.config(text = "● Running", fg = '#27ae60')
         
@@ -391,329 +394,240 @@ class HeartRateMonitor:
         self.is_running = False
         if self.camera:
             self.camera.release()
+        self.multi_face_check.config(state = tk.NORMAL)
         self.start_button.config(text = "Start Camera", bg = '#27ae60')
         self.status_label.config(text = "● Stopped", fg = '#95a5a6')
         self.video_label.config(image = '', bg = '#000000')
         
     def update_frame(self):
         while self.is_running:
-            ret, frame = self.camera.read()
+            # Paced by the Camera: Blocks Until the Next Frame, ret is False Only Once It Stopped
+            ret, frame, timestamp = self.camera.read()
             if not ret:
-                self.root.after(0, self.stop_camera)
+                if self.is_running:
+                    self.root.after(0, self.stop_camera)
                 break
             
-            # Calculate FPS
-            current_time = time.time()
-            if self.last_frame_time:
-                frame_time = current_time - self.last_frame_time
-                self.frame_times.append(frame_time)
-                if len(self.frame_times) > 0:
-                    self.actual_fps = 1.0 / np.mean(self.frame_times)
-                    self.root.after(0, lambda: self.fps_label.config(text = f"{self.actual_fps:.1f}"))
-            self.last_frame_time = current_time
-            
             # Processing the Frame Data
-            frame_small = cv2.resize(frame, (960, 540))
-            frame = cv2.flip(frame_small, 1)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            frame = self.engine.prepare_frame(frame)
+            result = self.engine.process_frame(frame, timestamp)
+            self.engine.annotate(frame, result)
             
-            # Detect Faces (Threshold Control)
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor = 1.05,      
-                minNeighbors = 8,        
-                minSize = (150, 150),    
-                maxSize = (600, 600),   
-                flags = cv2.CASCADE_SCALE_IMAGE 
-            )
+            if self.engine.actual_fps > 0:
+                self.queue_label(self.fps_label, f"{self.engine.actual_fps:.1f}")
             
-            if len(faces) > 0:
-                (x, y, w, h) = max(faces, key = lambda rect: rect[2] * rect[3])
-                
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                
-                # Extract Forehead Region
-                forehead_y = y + int(h * 0.1)
-                forehead_h = int(h * 0.25)
-                forehead_x = x + int(w * 0.3)
-                forehead_w = int(w * 0.4)
+            # Multi-Face Results: the Panels Show the Primary (Largest) Face
+            reading = self.primary_reading(result)
+            if reading['face'] is not None:
+                # Update Buffer Status
+                self.queue_label(self.buffer_label, f"Buffer: {reading['buffer_percent']:.0f}%")
                 
-                cv2.rectangle(
-                    frame, 
-                    (forehead_x, forehead_y), 
-                    (forehead_x + forehead_w, forehead_y + forehead_h),
-                    (255, 0, 0), 
-                    2
-                )
-                
-                roi = frame[forehead_y:forehead_y+forehead_h, 
-                        forehead_x:forehead_x+forehead_w]
-                
-                if roi.size > 0:
-                    # Extract Green Channel with Gaussian 
-                    roi_float = roi.astype(np.float32)
-                    green_channel = roi_float[:, :, 1]
-                    
-                    h_roi, w_roi = green_channel.shape
-                    y_center, x_center = h_roi // 2, w_roi // 2
-                    
-                    y_coords, x_coords = np.ogrid[:h_roi, :w_roi]
-                    gaussian_weight = np.exp(-((y_coords - y_center)**2 + (x_coords - x_center)**2) / 
-                                            (2 * (min(h_roi, w_roi) / 4)**2))
-                    
-                    green_avg = np.average(green_channel, weights = gaussian_weight)
-                    
-                    # use the thread
-                    with self.lock:
-                        self.data_buffer.append(green_avg)
-                        self.times.append(current_time)
-                        self.waveform_data.append(green_avg)
-                        self.waveform_times.append(current_time)
-                    
-                    # Calculate Heart Rate (If Buffer is Full)
-                    if len(self.data_buffer) >= self.buffer_size:
-                        self.calculate_heart_rate()
-                    
-                    # Update Buffer Status
-                    buffer_percent = (len(self.data_buffer) / self.buffer_size) * 100
-                    self.root.after(0, lambda: self.buffer_label.config(text = f"Buffer: {buffer_percent:.0f}%"))
-                    
-                    # Update Visualization
-                    self.root.after(0, self.draw_waveform)
-                    
-                    # Display BPM Value
-                    if self.bpm > 0:
-                        cv2.putText(frame, f"BPM: {self.bpm:.0f}", (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                        cv2.putText(frame, f"Quality: {self.signal_quality:.1f}", (10, 70),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    cv2.putText(frame, f"FPS: {self.actual_fps:.1f}", (10, 110),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-            else:
-                cv2.putText(frame, "No face detected", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                # Update Visualization
+                self.waveform_dirty = True
+            
+            if reading['bpm_updated']:
+                self.show_heart_rate()
             
             # Convert and Display 
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             img = Image.fromarray(frame_rgb)
             img = img.resize((640, 360), Image.Resampling.LANCZOS)
-            imgtk = ImageTk.PhotoImage(image = img)
             
-            # Update GUI in Main Thread
-            self.root.after(0, self._update_video_label, imgtk)
-            
-            time.sleep(0.033)  
+            # Hand Newest Frame to Render Scheduler (Older Ones are Dropped)
+            with self.lock:
+                self.pending_frame = img
+
+    def primary_reading(self, result):
+        # Single-Face Result, or the First (Largest) Face of a Multi-Face Result
+        if 'faces' not in result:
+            return result
+        if result['faces']:
+            return result['faces'][0]
+        return {'face': None, 'bpm_updated': False}
+
+    def queue_label(self, label, text):
+        # Record Label Text for Next Render Pass (Last Write Wins)
+        with self.lock:
+            self.pending_labels[label] = text
+
+    def render_tick(self):
+        # Coalesce All GUI Updates into One Pass per render_interval
+        with self.lock:
+            labels = self.pending_labels
+            self.pending_labels = {}
+            frame = self.pending_frame
+            self.pending_frame = None
+            waveform_dirty = self.waveform_dirty
+            spectrum_dirty = self.spectrum_dirty
+            self.waveform_dirty = False
+            self.spectrum_dirty = False
+
+        for label, text in labels.items():
+            label.config(text = text)
+
+        if frame is not None and self.is_running:
+            self._update_video_label(ImageTk.PhotoImage(image = frame))
+
+        if waveform_dirty:
+            self.draw_waveform()
+        if spectrum_dirty:
+            self.draw_spectrum()
+
+        self.render_job = self.root.after(self.render_interval, self.render_tick)
 
     def _update_video_label(self, imgtk):
         # Update Video Label in Main Thread
         self.video_label.imgtk = imgtk
         self.video_label.configure(image = imgtk)
         
-    def calculate_heart_rate(self):
-        # Convert Buffer to Array
-        data = np.array(self.data_buffer)
-        
-        # Calculate Signal Quality 
-        signal_std = np.std(data)
-
-        if signal_std < 0.5:  
-            return
-        detrended = signal.detrend(data)
-        
-        if np.std(detrended) > 0:
-            normalized = (detrended - np.mean(detrended)) / np.std(detrended)
-        else:
-            return
-        
-        # Bandpass Filter (0.75 Hz - 3.0 Hz = 45-180 BPM) 
-        fps = len(self.data_buffer) / (self.times[-1] - self.times[0])
-        lowcut = 0.75   
-        highcut = 3.0   
+    def show_heart_rate(self):
+        # Update Displays 
+        self.queue_label(self.bpm_label, f"{self.engine.bpm:.0f} BPM")
+        self.queue_label(self.quality_label, f"Signal Quality: {self.engine.signal_quality:.1f}")
         
-        # Normalize Frequencies
-        nyquist = fps / 2
-        low = lowcut / nyquist
-        high = highcut / nyquist
+        # Draw 
+        self.spectrum_dirty = True
         
-        b, a = signal.butter(5, [low, high], btype='band')  # Increased order from 3 to 5
-        filtered = signal.filtfilt(b, a, normalized)
-        
-        windowed = filtered * signal.windows.hamming(len(filtered))
-        
-        # Perform FFT (Because Affect Signal Feature from Light or Movement)
-        fft_data = np.fft.rfft(windowed)
-        fft_freq = np.fft.rfftfreq(len(windowed), 1.0 / fps)
-        
-        # Find Peak in Frequency Domain (Show Cycle Diversification)
-        fft_abs = np.abs(fft_data)
-        
-        # Limit to Heart Rate Range
-        freq_mask = (fft_freq >= lowcut) & (fft_freq <= highcut)
-        masked_fft = fft_abs[freq_mask]
-        masked_freq = fft_freq[freq_mask]
-        
-        if len(masked_fft) == 0:
-            return
-        
-        # Find Frequency
-        peak_idx = np.argmax(masked_fft)
-        peak_freq = masked_freq[peak_idx]
-        peak_power = masked_fft[peak_idx]
-        
-        # Calculate Signal Quality (SNR Metrics)
-        noise_power = np.mean(masked_fft)
-        if noise_power > 0:
-            self.signal_quality = peak_power / noise_power
-        else:
-            self.signal_quality = 0
-        
-        # SNR threshold
-        if self.signal_quality < 2.0: 
-            return
-        
-        # Convert to BPM
-        bpm = peak_freq * 60.0
-        
-        # Validate BPM Range 
-        if 45 >= bpm and bpm <= 180:
-            # Check 
-            if len(self.bpm_history) > 0:
-                recent_avg = np.mean(list(self.bpm_history)[-10:])
-               
-                if abs(bpm - recent_avg) > 30:
-                    return
-            
-            self.bpm_smooth.append(bpm)
-            
-            if len(self.bpm_smooth) >= 3:
-                display_bpm = np.median(self.bpm_smooth)
-            else:
-                display_bpm = bpm
-            
-            self.bpm = display_bpm
-            self.bpm_history.append(display_bpm)
-            self.last_valid_bpm = display_bpm
-            
-            # Store Spectrum Data 
-            self.spectrum_freqs = masked_freq.tolist()
-            self.spectrum_power = masked_fft.tolist()
-            
-            # Update Displays 
-            self.root.after(0, lambda: self.bpm_label.config(text = f"{self.bpm:.0f} BPM"))
-            self.root.after(0, lambda: self.quality_label.config(text = f"Signal Quality: {self.signal_quality:.1f}"))
-            
-            # Draw 
-            self.root.after(0, self.draw_spectrum)
-            
-            # Update Statistics
-            if len(self.bpm_history) > 5:
-                avg_bpm = np.mean(self.bpm_history)
-                min_bpm = np.min(self.bpm_history)
-                max_bpm = np.max(self.bpm_history)
-                
-                self.root.after(0, lambda: self.avg_bpm_label.config(text = f"Average BPM: {avg_bpm:.0f}"))
-                self.root.after(0, lambda: self.min_bpm_label.config(text = f"Min BPM: {min_bpm:.0f}"))
-                self.root.after(0, lambda: self.max_bpm_label.config(text = f"Max BPM: {max_bpm:.0f}"))
+        # Update Statistics
+        stats = self.engine.bpm_statistics()
+        if stats is not None:
+            self.queue_label(self.avg_bpm_label, f"Average BPM: {stats['average']:.0f}")
+            self.queue_label(self.min_bpm_label, f"Min BPM: {stats['min']:.0f}")
+            self.queue_label(self.max_bpm_label, f"Max BPM: {stats['max']:.0f}")
     
+    def create_plot_items(self):
+        # Persistent Canvas Items (Moved via coords Instead of Recreated)
+        self.spectrum_size = (280, 100)
+        self.spectrum_margin = (30, 15)
+        self.waveform_size = (280, 80)
+        self.waveform_margin = (20, 10)
+
+        canvas_width, canvas_height = self.spectrum_size
+        margin_x, margin_y = self.spectrum_margin
+
+        self.spectrum_placeholder = self.spectrum_canvas.create_text(
+            140, 50, text = "Waiting for Data...",
+            fill = '#7f8c8d', font = ('Arial', 9)
+        )
+        self.spectrum_axis = self.spectrum_canvas.create_line(
+            margin_x, canvas_height - margin_y,
+            canvas_width - margin_x, canvas_height - margin_y,
+            fill = '#7f8c8d', width = 1, state = tk.HIDDEN
+        )
+        self.spectrum_ticks = {}
+        for bpm in [60, 90, 120, 150]:
+            self.spectrum_ticks[bpm] = self.spectrum_canvas.create_text(
+                0, canvas_height - 5, text = str(bpm),
+                fill = '#ecf0f1', font = ('Arial', 7), state = tk.HIDDEN
+            )
+        self.spectrum_line = self.spectrum_canvas.create_line(
+            0, 0, 0, 0, fill = '#3498db', width = 2, state = tk.HIDDEN
+        )
+        self.spectrum_peak = self.spectrum_canvas.create_oval(
+            0, 0, 0, 0, fill = '#e74c3c', outline = '#c0392b', width = 2, state = tk.HIDDEN
+        )
+
+        canvas_width, canvas_height = self.waveform_size
+        margin_x, margin_y = self.waveform_margin
+        mid_y = canvas_height // 2
+
+        self.waveform_placeholder = self.waveform_canvas.create_text(
+            140, 40, text = "Waiting for signal...",
+            fill = '#7f8c8d', font = ('Arial', 9)
+        )
+        self.waveform_baseline = self.waveform_canvas.create_line(
+            margin_x, mid_y, canvas_width - margin_x, mid_y,
+            fill = '#7f8c8d', width = 1, dash = (2, 2), state = tk.HIDDEN
+        )
+        self.waveform_line = self.waveform_canvas.create_line(
+            0, 0, 0, 0, fill = '#2ecc71', width = 2, state = tk.HIDDEN
+        )
+
+    def clear_plots(self):
+        # Hide Plot Items and Show Placeholders
+        for item in [self.spectrum_axis, self.spectrum_line, self.spectrum_peak, *self.spectrum_ticks.values()]:
+            self.spectrum_canvas.itemconfigure(item, state = tk.HIDDEN)
+        self.spectrum_canvas.itemconfigure(self.spectrum_placeholder, state = tk.NORMAL)
+
+        for item in [self.waveform_baseline, self.waveform_line]:
+            self.waveform_canvas.itemconfigure(item, state = tk.HIDDEN)
+        self.waveform_canvas.itemconfigure(self.waveform_placeholder, state = tk.NORMAL)
+
     def draw_spectrum(self):
         # Draw Frequency Spectrum 
-        self.spectrum_canvas.delete("all")
-        
-        if len(self.spectrum_freqs) == 0 or len(self.spectrum_power) == 0:
-            self.spectrum_canvas.create_text(
-                140, 50, text = "Waiting for Data...",
-                fill = '#7f8c8d', font=('Arial', 9)
-            )
+        freqs = np.asarray(self.engine.spectrum_freqs, dtype = float)
+        power = np.asarray(self.engine.spectrum_power, dtype = float)
+
+        if len(freqs) < 2 or len(freqs) != len(power):
             return
         
-        canvas_width = 280
-        canvas_height = 100
-        margin_x = 30
-        margin_y = 15
+        canvas_width, canvas_height = self.spectrum_size
+        margin_x, margin_y = self.spectrum_margin
         plot_width = canvas_width - 2 * margin_x
         plot_height = canvas_height - 2 * margin_y
         
-        # Draw Axes
-        self.spectrum_canvas.create_line(
-            margin_x, canvas_height - margin_y,
-            canvas_width - margin_x, canvas_height - margin_y,
-            fill = '#7f8c8d', width=1
-        )
-        
-        # Draw BPM Labels
-        for bpm in [60, 90, 120, 150]:
-            freq_hz = bpm / 60.0
-            if freq_hz >= min(self.spectrum_freqs) and freq_hz <= max(self.spectrum_freqs):
-                x = margin_x + ((freq_hz - min(self.spectrum_freqs)) / 
-                            (max(self.spectrum_freqs) - min(self.spectrum_freqs))) * plot_width
-                self.spectrum_canvas.create_text(
-                    x, canvas_height - 5, text = str(bpm),
-                    fill = '#ecf0f1', font = ('Arial', 7)
-                )
-        
         # Normalize Spectrum
-        max_power = max(self.spectrum_power)
+        max_power = power.max()
         if max_power == 0:
             return
+
+        # Axis Transforms (Computed Once per Draw)
+        freq_min = freqs[0]
+        freq_max = freqs[-1]
+        if freq_max <= freq_min:
+            return
+        x_scale = plot_width / (freq_max - freq_min)
+        y_scale = plot_height / max_power
+        base_y = canvas_height - margin_y
+
+        self.spectrum_canvas.itemconfigure(self.spectrum_placeholder, state = tk.HIDDEN)
+        self.spectrum_canvas.itemconfigure(self.spectrum_axis, state = tk.NORMAL)
         
-        points = []
-        for freq, power in zip(self.spectrum_freqs, self.spectrum_power):
-            x = margin_x + ((freq - min(self.spectrum_freqs)) / 
-                        (max(self.spectrum_freqs) - min(self.spectrum_freqs))) * plot_width
-            y = canvas_height - margin_y - (power / max_power) * plot_height
-            points.append((x, y))
+        # Draw BPM Labels
+        for bpm, item in self.spectrum_ticks.items():
+            freq_hz = bpm / 60.0
+            if freq_min <= freq_hz <= freq_max:
+                x = margin_x + (freq_hz - freq_min) * x_scale
+                self.spectrum_canvas.coords(item, x, canvas_height - 5)
+                self.spectrum_canvas.itemconfigure(item, state = tk.NORMAL)
+            else:
+                self.spectrum_canvas.itemconfigure(item, state = tk.HIDDEN)
         
         # Draw Line
-        for i in range(len(points) - 1):
-            self.spectrum_canvas.create_line(
-                points[i][0], points[i][1],
-                points[i+1][0], points[i+1][1],
-                fill='#3498db', width=2
-            )
+        xs = margin_x + (freqs - freq_min) * x_scale
+        ys = base_y - power * y_scale
+        self.spectrum_canvas.coords(self.spectrum_line, np.column_stack((xs, ys)).ravel().tolist())
+        self.spectrum_canvas.itemconfigure(self.spectrum_line, state = tk.NORMAL)
         
         # Highlight Peak (Current BPM)
-        if self.bpm > 0:
-            peak_freq = self.bpm / 60.0
-            peak_x = margin_x + ((peak_freq - min(self.spectrum_freqs)) / 
-                                (max(self.spectrum_freqs) - min(self.spectrum_freqs))) * plot_width
+        if self.engine.bpm > 0:
+            peak_freq = self.engine.bpm / 60.0
+            peak_x = margin_x + (peak_freq - freq_min) * x_scale
             
-            idx = np.argmin(np.abs(np.array(self.spectrum_freqs) - peak_freq))
-            peak_power = self.spectrum_power[idx]
-            peak_y = canvas_height - margin_y - (peak_power / max_power) * plot_height
+            idx = np.argmin(np.abs(freqs - peak_freq))
+            peak_y = base_y - power[idx] * y_scale
             
-            self.spectrum_canvas.create_oval(
-                peak_x - 3, peak_y - 3, peak_x + 3, peak_y + 3,
-                fill = '#e74c3c', outline = '#c0392b', width = 2
+            self.spectrum_canvas.coords(
+                self.spectrum_peak,
+                peak_x - 3, peak_y - 3, peak_x + 3, peak_y + 3
             )
+            self.spectrum_canvas.itemconfigure(self.spectrum_peak, state = tk.NORMAL)
+        else:
+            self.spectrum_canvas.itemconfigure(self.spectrum_peak, state = tk.HIDDEN)
 
     def draw_waveform(self):
         # Draw Signal Waveform 
-        self.waveform_canvas.delete("all")
-        
-        with self.lock:
-            if len(self.waveform_data) < 2:
-                self.waveform_canvas.create_text(
-                    140, 40, text = "Waiting for signal...",
-                    fill = '#7f8c8d', font = ('Arial', 9)
-                )
+        with self.engine.lock:
+            if len(self.engine.waveform_data) < 2:
                 return
             
-            data = np.array(self.waveform_data)
+            data = np.array(self.engine.waveform_data)
         
-        canvas_width = 280
-        canvas_height = 80
-        margin_x = 20
-        margin_y = 10
+        canvas_width, canvas_height = self.waveform_size
+        margin_x, margin_y = self.waveform_margin
         plot_width = canvas_width - 2 * margin_x
         plot_height = canvas_height - 2 * margin_y
-        
-        # Draw Baseline 
         mid_y = canvas_height // 2
-        self.waveform_canvas.create_line(
-            margin_x, mid_y, canvas_width - margin_x, mid_y,
-            fill = '#7f8c8d', width = 1, dash = (2, 2)
-        )
         
         # Normalize Data
         data_mean = np.mean(data)
@@ -723,32 +637,27 @@ class HeartRateMonitor:
         
         normalized = (data - data_mean) / data_std
         
+        # X Positions Only Depend on Sample Count
+        n = len(normalized)
+        if n not in self.waveform_x_cache:
+            self.waveform_x_cache[n] = margin_x + np.arange(n) * (plot_width / n)
+        xs = self.waveform_x_cache[n]
+        ys = mid_y - normalized * (plot_height / 4)
+        
         # Draw Waveform
-        points = []
-        for i, value in enumerate(normalized):
-            x = margin_x + (i / len(normalized)) * plot_width
-            y = mid_y - value * (plot_height / 4)
-            points.append((x, y))
-        
-        for i in range(len(points) - 1):
-            self.waveform_canvas.create_line(
-                points[i][0], points[i][1],
-                points[i+1][0], points[i+1][1],
-                fill = '#2ecc71', width = 2
-            )
+        self.waveform_canvas.itemconfigure(self.waveform_placeholder, state = tk.HIDDEN)
+        self.waveform_canvas.itemconfigure(self.waveform_baseline, state = tk.NORMAL)
+        self.waveform_canvas.coords(self.waveform_line, np.column_stack((xs, ys)).ravel().tolist())
+        self.waveform_canvas.itemconfigure(self.waveform_line, state = tk.NORMAL)
 
     def reset_data(self):
+        self.engine.reset()
+        
         with self.lock:
-            self.data_buffer.clear()
-            self.times.clear()
-            self.bpm_history.clear()
-            self.bpm_smooth.clear()
-            self.waveform_data.clear()
-            self.waveform_times.clear()
-            self.spectrum_freqs = []
-            self.spectrum_power = []
-        
-        self.bpm = 0
+            self.pending_labels = {}
+            self.waveform_dirty = False
+            self.spectrum_dirty = False
+        
         self.bpm_label.config(text = "-- BPM")
         self.fps_label.config(text = "--")
         self.quality_label.config(text = "Signal Quality: --")
@@ -757,11 +666,13 @@ class HeartRateMonitor:
         self.max_bpm_label.config(text = "Max BPM: --")
         self.buffer_label.config(text = "Buffer: 0%")
         
-        self.spectrum_canvas.delete("all")
-        self.waveform_canvas.delete("all")
+        self.clear_plots()
         
     def quit_app(self):
         self.stop_camera()
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
         self.root.quit()
         self.root.destroy()
 
@@ -1,6 +1,37 @@
 import cv2
 import time
 
+from pipeline_config import save_pipeline_config
+
+'''
+    Camera check and pipeline auto-tuner
+
+    - python app_check_camera.py: camera properties, supported resolutions, test frame
+    - python app_check_camera.py --tune: profile the full pipeline (capture, pose,
+      rPPG, JPEG encode) at every supported resolution and pose model complexity on
+      this machine, then write the best setting to pipeline_config.json, which
+      app_1003.py, app_1108.py and app_PPG.py load at startup
+'''
+
+TEST_RESOLUTIONS = [
+    (320, 240),   # QVGA
+    (640, 480),   # VGA
+    (800, 600),   # SVGA
+    (1280, 720),  # HD
+    (1920, 1080), # Full HD
+]
+
+# Tuning targets
+'''
+    - MIN_PIPELINE_FPS: lowest sustained rate accepted (rPPG needs well above twice
+      the 3 Hz top of the heart rate band)
+    - Among settings that keep up: reach VGA first (smaller ROIs make pose and the
+      forehead signal unreliable), then the most accurate pose model, then more pixels
+'''
+MIN_PIPELINE_FPS = 15
+VGA_PIXELS = 640 * 480
+MAX_CAPTURE_FPS = 30
+
 
 def measure_camera_fps(camera, test_duration=2.0):
     # Measure actual camera FPS over a few seconds
@@ -50,24 +81,7 @@ def check_camera_specs():
     print("📐 Supported Resolutions Test")
     print("=" * 50)
     
-    test_resolutions = [
-        (320, 240),   # QVGA
-        (640, 480),   # VGA
-        (800, 600),   # SVGA
-        (1280, 720),  # HD
-        (1920, 1080), # Full HD
-    ]
-    
-    for w, h in test_resolutions:
-        camera.set(cv2.CAP_PROP_FRAME_WIDTH, w)
-        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
-        actual_w = camera.get(cv2.CAP_PROP_FRAME_WIDTH)
-        actual_h = camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        
-        if actual_w == w and actual_h == h:
-            print(f"✅ {w}x{h} - Supported")
-        else:
-            print(f"❌ {w}x{h} - Not supported (actual: {int(actual_w)}x{int(actual_h)})")
+    supported_resolutions(camera, verbose = True)
     
     # Capture a test frame
     ret, frame = camera.read()
@@ -83,5 +97,203 @@ def check_camera_specs():
     camera.release()
     print("\n✅ Camera check completed!")
 
+def supported_resolutions(camera, verbose = False):
+    # Resolutions from TEST_RESOLUTIONS the camera actually switches to
+    supported = []
+    for w, h in TEST_RESOLUTIONS:
+        camera.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+        actual_w = camera.get(cv2.CAP_PROP_FRAME_WIDTH)
+        actual_h = camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        
+        if actual_w == w and actual_h == h:
+            supported.append((w, h))
+            if verbose:
+                print(f"✅ {w}x{h} - Supported")
+        elif verbose:
+            print(f"❌ {w}x{h} - Not supported (actual: {int(actual_w)}x{int(actual_h)})")
+    return supported
+
+def profile_pipeline(camera, width, height, model_complexity, camera_fps, duration = 3.0, warmup_frames = 5):
+    # Full pipeline timing at one capture size and pose model complexity
+    '''
+        camera_fps: raw read rate at this size (measure_camera_fps)
+        Stages per frame: capture (camera.read), pose (BGR->RGB + MediaPipe Pose),
+        rPPG (HeartRateEngine.process_frame) and encode (JPEG, as the web apps do).
+        The first warmup_frames frames are not counted (graph initialisation).
+    '''
+    import mediapipe as mp
+    from ppg_engine import HeartRateEngine
+    
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    
+    pose = mp.solutions.pose.Pose(
+        min_detection_confidence = 0.5,
+        min_tracking_confidence = 0.5,
+        model_complexity = model_complexity,
+        static_image_mode = False
+    )
+    engine = HeartRateEngine(frame_size = (width, height), mirror = False)
+    
+    totals = {'capture': 0.0, 'pose': 0.0, 'rppg': 0.0, 'encode': 0.0}
+    frames = 0
+    detected = 0
+    seen = 0
+    start_time = None
+    
+    try:
+        while True:
+            t0 = time.perf_counter()
+            ret, frame = camera.read()
+            t1 = time.perf_counter()
+            if not ret or frame is None:
+                break
+            
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            results = pose.process(image)
+            t2 = time.perf_counter()
+            
+            engine.process_frame(engine.prepare_frame(frame), time.time())
+            t3 = time.perf_counter()
+            
+            cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            t4 = time.perf_counter()
+            
+            seen += 1
+            if seen <= warmup_frames:
+                continue
+            if start_time is None:
+                start_time = t0
+            
+            frames += 1
+            detected += results.pose_landmarks is not None
+            totals['capture'] += t1 - t0
+            totals['pose'] += t2 - t1
+            totals['rppg'] += t3 - t2
+            totals['encode'] += t4 - t3
+            
+            if t4 - start_time > duration:
+                break
+    finally:
+        pose.close()
+    
+    if frames == 0:
+        return None
+    
+    elapsed = time.perf_counter() - start_time
+    stage_ms = {stage: round(total / frames * 1000, 2) for stage, total in totals.items()}
+    processing_ms = stage_ms['pose'] + stage_ms['rppg'] + stage_ms['encode']
+    processing_fps = 1000 / processing_ms if processing_ms > 0 else float('inf')
+    
+    return {
+        'width': width,
+        'height': height,
+        'model_complexity': model_complexity,
+        'frames': frames,
+        **{f'{stage}_ms': ms for stage, ms in stage_ms.items()},
+        'camera_fps': round(camera_fps, 1),
+        'processing_fps': round(processing_fps, 1),
+        # Capture and processing in one loop (app_1003)
+        'serial_fps': round(frames / elapsed, 1),
+        # Capture on its own grab thread (app_PPG): the slower of the two
+        'fps': round(min(camera_fps, processing_fps), 1),
+        'pose_detection_rate': round(detected / frames, 2)
+    }
+
+def choose_best(profiles, min_fps = MIN_PIPELINE_FPS):
+    # Best profiled setting (see the tuning targets above)
+    sustained = [profile for profile in profiles if profile['fps'] >= min_fps]
+    if not sustained:
+        # Nothing keeps up: take the fastest
+        return max(profiles, key = lambda profile: profile['fps'])
+    
+    return max(sustained, key = lambda profile: (
+        min(profile['width'] * profile['height'], VGA_PIXELS),
+        profile['model_complexity'],
+        profile['width'] * profile['height']
+    ))
+
+def tune_pipeline(camera_index = 0, complexities = (0, 1, 2), duration = 3.0, min_fps = MIN_PIPELINE_FPS, output = None):
+    # Profile every supported resolution x model complexity and save the best setting
+    camera = cv2.VideoCapture(camera_index)
+    
+    if not camera.isOpened():
+        print("❌ Cannot open camera")
+        return None
+    
+    camera.set(cv2.CAP_PROP_FPS, MAX_CAPTURE_FPS)
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
+    print("=" * 50)
+    print("⏱️  Pipeline Profiling")
+    print("=" * 50)
+    
+    profiles = []
+    try:
+        resolutions = supported_resolutions(camera)
+        if not resolutions:
+            # Driver does not report modes back: profile whatever it delivers
+            resolutions = [(int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)), int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)))]
+        
+        for width, height in resolutions:
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            camera_fps = measure_camera_fps(camera, test_duration = 1.0)
+            
+            for complexity in complexities:
+                try:
+                    profile = profile_pipeline(camera, width, height, complexity, camera_fps, duration)
+                except Exception as e:
+                    print(f"❌ {width}x{height} complexity {complexity} - Failed: {e}")
+                    continue
+                if profile is None:
+                    print(f"❌ {width}x{height} complexity {complexity} - No frames")
+                    continue
+                
+                profiles.append(profile)
+                print(f"{'✅' if profile['fps'] >= min_fps else '⚠️ '} {width}x{height} complexity {complexity}: "
+                      f"{profile['fps']} fps (camera {profile['camera_fps']}, processing {profile['processing_fps']}) | "
+                      f"pose {profile['pose_ms']} ms, rPPG {profile['rppg_ms']} ms, encode {profile['encode_ms']} ms")
+    finally:
+        camera.release()
+    
+    if not profiles:
+        print("❌ No configuration could be profiled")
+        return None
+    
+    best = choose_best(profiles, min_fps)
+    config = {
+        'camera': {
+            'width': best['width'],
+            'height': best['height'],
+            'fps': int(min(max(best['fps'], 1), MAX_CAPTURE_FPS))
+        },
+        'pose': {'model_complexity': best['model_complexity']},
+        'measured': best
+    }
+    path = save_pipeline_config(config, output)
+    
+    print("\n" + "=" * 50)
+    print(f"🏆 Best: {best['width']}x{best['height']}, model complexity {best['model_complexity']}, {config['camera']['fps']} fps")
+    if best['fps'] < min_fps:
+        print(f"⚠️  No setting reached {min_fps} fps on this machine")
+    print(f"💾 Saved to {path}")
+    return config
+
 if __name__ == "__main__":
-    check_camera_specs()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description = "Camera check and pipeline auto-tuner")
+    parser.add_argument('--tune', action = 'store_true', help = "profile the full pipeline and save the best setting")
+    parser.add_argument('--camera-index', type = int, default = 0)
+    parser.add_argument('--complexities', type = int, nargs = '+', default = [0, 1, 2])
+    parser.add_argument('--duration', type = float, default = 3.0, help = "seconds profiled per setting")
+    parser.add_argument('--min-fps', type = float, default = MIN_PIPELINE_FPS)
+    parser.add_argument('--output', help = "config path (default: pipeline_config.json or $PIPELINE_CONFIG)")
+    args = parser.parse_args()
+    
+    if args.tune:
+        tune_pipeline(args.camera_index, args.complexities, args.duration, args.min_fps, args.output)
+    else:
+        check_camera_specs()
\ No newline at end of file
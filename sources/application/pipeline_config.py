@@ -0,0 +1,57 @@
+import os
+import json
+import socket
+
+from datetime import datetime
+
+'''
+    Per-machine pipeline settings picked by the auto-tuner (app_check_camera.py --tune)
+
+    - camera: capture width / height / fps
+    - pose: MediaPipe model_complexity
+    - measured: what the tuner saw for the chosen setting (for reference only)
+    - Apps call load_pipeline_config(defaults) at startup; values from the file
+      override their own defaults, a missing or broken file leaves them as they were
+    - Location: PIPELINE_CONFIG environment variable, else pipeline_config.json
+      next to this file
+'''
+
+CONFIG_PATH = os.environ.get(
+    'PIPELINE_CONFIG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_config.json')
+)
+
+def load_pipeline_config(defaults, path = None):
+    # Defaults updated section by section with the tuned values
+    config = {section: dict(values) for section, values in defaults.items()}
+    path = path or CONFIG_PATH
+
+    try:
+        with open(path, encoding = 'utf-8') as f:
+            tuned = json.load(f)
+    except FileNotFoundError:
+        return config
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring pipeline config {path}: {e}")
+        return config
+
+    for section, values in tuned.items():
+        if section in config and isinstance(values, dict):
+            config[section].update({key: value for key, value in values.items() if key in config[section]})
+    print(f"[INFO] Pipeline config loaded from {path}: {config}")
+    return config
+
+def save_pipeline_config(config, path = None):
+    # Write atomically, stamped with the host and time it was tuned on
+    path = path or CONFIG_PATH
+    config = {
+        **config,
+        'tuned_on': socket.gethostname(),
+        'tuned_at': datetime.now().isoformat(timespec = 'seconds')
+    }
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding = 'utf-8') as f:
+        json.dump(config, f, indent = 2)
+    os.replace(temp_path, path)
+    return path
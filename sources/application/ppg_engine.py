@@ -0,0 +1,1018 @@
+import cv2
+import os
+import json
+import time
+import socket
+import threading
+import numpy as np
+
+from collections import deque
+from scipy import signal
+
+'''
+    Headless rPPG engine: capture -> face ROI -> green signal -> BPM
+
+    - Frame sources: camera, video file, image directory, in-memory arrays
+    - Result sinks: callback, JSONL file, socket
+    - HeartRateEngine has no display dependency, so many engines can run
+      in one server process, be benchmarked, or be fed frames directly
+'''
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Capture Resolutions Tried in Order (Smallest Not Below Processing Size Wins)
+CAPTURE_RESOLUTIONS = [
+    (640, 360),
+    (640, 480),
+    (960, 540),
+    (1280, 720),
+    (1920, 1080),
+]
+
+# Frame Sources
+class CameraSource:
+    def __init__(self, index = 0, width = 960, height = 540, fps = 30):
+        self.camera = cv2.VideoCapture(index)
+
+        # Camera Setting
+        self.resolution = self.negotiate_resolution(width, height)
+        self.camera.set(cv2.CAP_PROP_FPS, fps)
+        self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.camera.set(cv2.CAP_PROP_BRIGHTNESS, 20)
+        self.camera.set(cv2.CAP_PROP_CONTRAST, 20)
+        self.camera.set(cv2.CAP_PROP_SATURATION, 64)
+
+    def negotiate_resolution(self, width, height):
+        '''
+            Ask for the smallest mode that still covers the processing size,
+            so full-HD frames are not pulled only to be downscaled.
+            Falls back to whatever the driver reports if no mode matches.
+        '''
+        candidates = [(w, h) for w, h in CAPTURE_RESOLUTIONS if w >= width and h >= height]
+        if (width, height) not in candidates:
+            candidates.insert(0, (width, height))
+
+        for w, h in sorted(candidates, key = lambda size: size[0] * size[1]):
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+            actual = (int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                      int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            if actual == (w, h):
+                return actual
+
+        return actual
+
+    def is_opened(self):
+        return self.camera.isOpened()
+
+    def read(self):
+        # Live Source: Timestamp is Wall Clock
+        ret, frame = self.camera.read()
+        return ret, frame, time.time()
+
+    def release(self):
+        self.camera.release()
+
+class VideoFileSource:
+    def __init__(self, path):
+        self.camera = cv2.VideoCapture(path)
+        self.fps = self.camera.get(cv2.CAP_PROP_FPS) or 30
+        self.frame_index = 0
+
+    def is_opened(self):
+        return self.camera.isOpened()
+
+    def read(self):
+        # Recorded Source: Timestamp from Frame Index (Runs Faster than Real Time)
+        ret, frame = self.camera.read()
+        timestamp = self.frame_index / self.fps
+        self.frame_index += 1
+        return ret, frame, timestamp
+
+    def release(self):
+        self.camera.release()
+
+class ImageDirectorySource:
+    def __init__(self, path, fps = 30):
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.fps = fps
+        self.frame_index = 0
+
+    def is_opened(self):
+        return len(self.paths) > 0
+
+    def read(self):
+        if self.frame_index >= len(self.paths):
+            return False, None, None
+
+        frame = cv2.imread(self.paths[self.frame_index])
+        timestamp = self.frame_index / self.fps
+        self.frame_index += 1
+        return frame is not None, frame, timestamp
+
+    def release(self):
+        self.frame_index = len(self.paths)
+
+class ArraySource:
+    def __init__(self, frames, fps = 30, timestamps = None):
+        '''
+            frames: list/array of BGR frames (or any iterable of them)
+            timestamps: optional per-frame timestamps, defaults to index / fps
+        '''
+        self.frames = iter(frames)
+        self.timestamps = iter(timestamps) if timestamps is not None else None
+        self.fps = fps
+        self.frame_index = 0
+
+    def is_opened(self):
+        return self.frames is not None
+
+    def read(self):
+        if self.frames is None:
+            return False, None, None
+
+        frame = next(self.frames, None)
+        if frame is None:
+            return False, None, None
+
+        if self.timestamps is not None:
+            timestamp = next(self.timestamps)
+        else:
+            timestamp = self.frame_index / self.fps
+        self.frame_index += 1
+        return True, frame, timestamp
+
+    def release(self):
+        self.frames = None
+
+class LatestFrameSource:
+    def __init__(self, source):
+        '''
+            Wraps a live source with a dedicated grab thread.
+            Only the newest frame is kept; read() blocks until a frame newer
+            than the last one returned arrives, and returns ret=False only once
+            the source has ended or been released (a slow first grab or a camera
+            stall just waits). Not meant for file sources, where skipping frames
+            would lose data.
+        '''
+        self.source = source
+        self.condition = threading.Condition()
+        self.latest = (False, None, None)
+        self.sequence = 0
+        self.read_sequence = 0
+        self.dropped = 0
+        self.is_running = True
+
+        self.thread = threading.Thread(target = self.grab_loop, daemon = True)
+        self.thread.start()
+
+    def is_opened(self):
+        return self.source.is_opened()
+
+    def grab_loop(self):
+        while self.is_running:
+            ret, frame, timestamp = self.source.read()
+            with self.condition:
+                # Previous frame was never consumed
+                if self.sequence > self.read_sequence:
+                    self.dropped += 1
+                self.latest = (ret, frame, timestamp)
+                self.sequence += 1
+                self.condition.notify_all()
+            if not ret:
+                break
+
+    def read(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > self.read_sequence or not self.is_running)
+            if self.sequence == self.read_sequence:
+                # Released while waiting
+                return False, None, None
+
+            self.read_sequence = self.sequence
+            return self.latest
+
+    def release(self):
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+        self.thread.join(timeout = 1)
+        self.source.release()
+
+class FramePacer:
+    def __init__(self, fps):
+        '''
+            Deadline-based pacing: each loop iteration is scheduled at a fixed
+            interval from the previous deadline, so processing time is absorbed
+            instead of added on top of a fixed sleep.
+            If the loop falls more than one interval behind, the schedule is
+            re-anchored rather than bursting to catch up.
+        '''
+        self.interval = 1.0 / fps
+        self.deadline = None
+
+    def wait(self):
+        now = time.perf_counter()
+        if self.deadline is None or now - self.deadline > self.interval:
+            self.deadline = now
+        elif now < self.deadline:
+            time.sleep(self.deadline - now)
+        self.deadline += self.interval
+
+    def reset(self):
+        self.deadline = None
+
+# Result Sinks
+class CallbackSink:
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, result):
+        self.callback(result)
+
+    def close(self):
+        pass
+
+class JsonlSink:
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding = 'utf-8')
+
+    def emit(self, result):
+        self.file.write(json.dumps(result, ensure_ascii = False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class SocketSink:
+    def __init__(self, host, port):
+        # Newline-Delimited JSON over TCP
+        self.sock = socket.create_connection((host, port))
+
+    def emit(self, result):
+        try:
+            self.sock.sendall((json.dumps(result, ensure_ascii = False) + '\n').encode('utf-8'))
+        except OSError as e:
+            print(f"[ERROR] Socket sink error: {e}")
+
+    def close(self):
+        self.sock.close()
+
+def smooth_bpm_reading(bpm, bpm_history, bpm_smooth):
+    # Validate a Raw BPM Reading and Median-Smooth It
+    """
+    Args:
+        bpm: Raw BPM from the spectral peak
+        bpm_history: Deque of accepted (smoothed) BPM values, appended on success
+        bpm_smooth: Deque of recent raw BPM values used for the median
+    Returns:
+        Smoothed BPM, or None if the reading was rejected
+    """
+    # Validate BPM Range
+    if not 45 <= bpm <= 180:
+        return None
+
+    # Reject Jumps Away from Recent Average
+    if len(bpm_history) > 0:
+        recent_avg = np.mean(list(bpm_history)[-10:])
+
+        if abs(bpm - recent_avg) > 30:
+            return None
+
+    bpm_smooth.append(bpm)
+
+    if len(bpm_smooth) >= 3:
+        display_bpm = np.median(bpm_smooth)
+    else:
+        display_bpm = bpm
+
+    bpm_history.append(display_bpm)
+    return display_bpm
+
+# Heart Rate Engine
+class HeartRateEngine:
+    def __init__(self, buffer_size = 300, update_interval = 15, frame_size = (960, 540), mirror = True):
+        # Detection
+        self.face_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        self.frame_size = frame_size
+        self.mirror = mirror
+
+        # Heart Rate Calculation
+        '''
+            buffered size need to add certain amount for analysis
+        '''
+        self.buffer_size = buffer_size
+        self.data_buffer = deque(maxlen = self.buffer_size)
+
+        # Sampling
+        self.times = deque(maxlen = self.buffer_size)
+
+        # Spectral Estimation Cadence
+        '''
+            BPM only changes about once a second, so the spectrum is
+            re-estimated every update_interval samples instead of per frame
+        '''
+        self.update_interval = update_interval
+        self.samples_since_update = 0
+
+        # Filter Design (Cached by FPS Bucket, Band and Order)
+        self.lowcut = 0.75
+        self.highcut = 3.0
+        self.filter_order = 5
+        self.fps_bucket = 0.5
+        self.filter_cache = {}
+        self.window_cache = {}
+        self.freq_cache = {}
+        self.weight_cache = {}
+
+        # Preallocated Work Arrays
+        self.signal_work = np.zeros(self.buffer_size)
+        self.windowed_work = np.zeros(self.buffer_size)
+        self.spectrum_work = np.zeros(self.buffer_size // 2 + 1)
+        self.freq_work = np.zeros(self.buffer_size // 2 + 1)
+
+        # Store BPM Data
+        self.bpm = 0
+        self.bpm_history = deque(maxlen = 30)
+        self.bpm_smooth = deque(maxlen = 5)
+
+        # Signal Quality
+        self.signal_quality = 0
+        self.last_valid_bpm = 0
+
+        # Threading Operations
+        self.lock = threading.Lock()
+        self.is_running = False
+
+        # Per Frame for FPS
+        self.last_frame_time = None
+        self.frame_times = deque(maxlen = 30)
+        self.actual_fps = 0
+        self.frame_index = 0
+
+        # Visualization (In 5 Seconds)
+        self.spectrum_freqs = []
+        self.spectrum_power = []
+        self.waveform_data = deque(maxlen = 150)
+        self.waveform_times = deque(maxlen = 150)
+
+    def reset(self):
+        with self.lock:
+            self.data_buffer.clear()
+            self.times.clear()
+            self.bpm_history.clear()
+            self.bpm_smooth.clear()
+            self.waveform_data.clear()
+            self.waveform_times.clear()
+            self.spectrum_freqs = []
+            self.spectrum_power = []
+
+        self.samples_since_update = 0
+        self.bpm = 0
+        self.signal_quality = 0
+        self.frame_times.clear()
+        self.last_frame_time = None
+        self.actual_fps = 0
+
+    def prepare_frame(self, frame):
+        # Resize and Mirror Raw Capture
+        if self.frame_size is not None and (frame.shape[1], frame.shape[0]) != tuple(self.frame_size):
+            frame = cv2.resize(frame, self.frame_size)
+        if self.mirror:
+            frame = cv2.flip(frame, 1)
+        return frame
+
+    def detect_face(self, gray):
+        # Detect Faces (Threshold Control)
+        faces = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor = 1.05,
+            minNeighbors = 8,
+            minSize = (150, 150),
+            maxSize = (600, 600),
+            flags = cv2.CASCADE_SCALE_IMAGE
+        )
+
+        if len(faces) == 0:
+            return None
+        return tuple(int(v) for v in max(faces, key = lambda rect: rect[2] * rect[3]))
+
+    def forehead_box(self, face):
+        # Extract Forehead Region
+        x, y, w, h = face
+        return (x + int(w * 0.3), y + int(h * 0.1), int(w * 0.4), int(h * 0.25))
+
+    def green_average(self, roi):
+        # Extract Green Channel with Gaussian (Weights Cached by ROI Shape)
+        green_channel = roi[:, :, 1].astype(np.float32)
+        h_roi, w_roi = green_channel.shape
+
+        if (h_roi, w_roi) not in self.weight_cache:
+            y_center, x_center = h_roi // 2, w_roi // 2
+            y_coords, x_coords = np.ogrid[:h_roi, :w_roi]
+            self.weight_cache[(h_roi, w_roi)] = np.exp(
+                -((y_coords - y_center)**2 + (x_coords - x_center)**2) /
+                (2 * (min(h_roi, w_roi) / 4)**2)
+            )
+
+        return float(np.average(green_channel, weights = self.weight_cache[(h_roi, w_roi)]))
+
+    def update_fps(self, timestamp):
+        # Calculate FPS from Frame Timestamps
+        if self.last_frame_time is not None and timestamp > self.last_frame_time:
+            self.frame_times.append(timestamp - self.last_frame_time)
+            self.actual_fps = 1.0 / np.mean(self.frame_times)
+        self.last_frame_time = timestamp
+
+    def process_frame(self, frame, timestamp = None):
+        # Process One Prepared Frame and Return a JSON-Serializable Result
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.update_fps(timestamp)
+        self.frame_index += 1
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        face = self.detect_face(gray)
+
+        result = {
+            'timestamp': timestamp,
+            'frame_index': self.frame_index,
+            'fps': round(float(self.actual_fps), 2),
+            'face': None,
+            'forehead': None,
+            'bpm': None,
+            'bpm_updated': False,
+            'signal_quality': round(float(self.signal_quality), 2),
+            'buffer_percent': round(len(self.data_buffer) / self.buffer_size * 100, 1)
+        }
+
+        if face is None:
+            return result
+
+        forehead_x, forehead_y, forehead_w, forehead_h = self.forehead_box(face)
+        result['face'] = list(face)
+        result['forehead'] = [forehead_x, forehead_y, forehead_w, forehead_h]
+
+        roi = frame[forehead_y:forehead_y+forehead_h,
+                    forehead_x:forehead_x+forehead_w]
+
+        if roi.size > 0:
+            self.add_sample(self.green_average(roi), timestamp)
+
+            # Calculate Heart Rate (If Buffer is Full, Every update_interval Samples)
+            self.samples_since_update += 1
+            if (len(self.data_buffer) >= self.buffer_size and
+                    self.samples_since_update >= self.update_interval):
+                self.samples_since_update = 0
+                result['bpm_updated'] = self.calculate_heart_rate()
+
+            result['buffer_percent'] = round(len(self.data_buffer) / self.buffer_size * 100, 1)
+            result['signal_quality'] = round(float(self.signal_quality), 2)
+
+        if self.bpm > 0:
+            result['bpm'] = round(float(self.bpm), 1)
+
+        return result
+
+    def add_sample(self, value, timestamp):
+        with self.lock:
+            self.data_buffer.append(value)
+            self.times.append(timestamp)
+            self.waveform_data.append(value)
+            self.waveform_times.append(timestamp)
+
+    def bpm_statistics(self):
+        # Average / Min / Max BPM Once History is Long Enough
+        if len(self.bpm_history) <= 5:
+            return None
+        return {
+            'average': float(np.mean(self.bpm_history)),
+            'min': float(np.min(self.bpm_history)),
+            'max': float(np.max(self.bpm_history))
+        }
+
+    def annotate(self, frame, result):
+        # Draw Face / Forehead Boxes and Readings onto Frame
+        if result['face'] is None:
+            cv2.putText(frame, "No face detected", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            return frame
+
+        x, y, w, h = result['face']
+        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+
+        forehead_x, forehead_y, forehead_w, forehead_h = result['forehead']
+        cv2.rectangle(
+            frame,
+            (forehead_x, forehead_y),
+            (forehead_x + forehead_w, forehead_y + forehead_h),
+            (255, 0, 0),
+            2
+        )
+
+        # Display BPM Value
+        if self.bpm > 0:
+            cv2.putText(frame, f"BPM: {self.bpm:.0f}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.putText(frame, f"Quality: {self.signal_quality:.1f}", (10, 70),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+        cv2.putText(frame, f"FPS: {self.actual_fps:.1f}", (10, 110),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+        return frame
+
+    def get_filter_coefficients(self, fps):
+        # Bandpass Design Cached by (FPS Bucket, Band, Order)
+        fps_key = round(fps / self.fps_bucket) * self.fps_bucket
+        key = (fps_key, self.lowcut, self.highcut, self.filter_order)
+
+        if key not in self.filter_cache:
+            # Normalize Frequencies
+            nyquist = fps_key / 2
+            low = self.lowcut / nyquist
+            high = self.highcut / nyquist
+            self.filter_cache[key] = signal.butter(self.filter_order, [low, high], btype = 'band')
+
+        return self.filter_cache[key]
+
+    def get_window(self, length):
+        # Hamming Window Cached by Length
+        if length not in self.window_cache:
+            self.window_cache[length] = signal.windows.hamming(length)
+        return self.window_cache[length]
+
+    def get_unit_freqs(self, length):
+        # rfft Bin Frequencies for 1 Hz Sampling, Scaled by FPS per Call
+        if length not in self.freq_cache:
+            self.freq_cache[length] = np.fft.rfftfreq(length)
+        return self.freq_cache[length]
+
+    def calculate_heart_rate(self):
+        # Returns True When a New BPM Value was Accepted
+        n = len(self.data_buffer)
+        if n < 2 or self.times[-1] <= self.times[0]:
+            return False
+
+        # Copy Buffer into Preallocated Array
+        data = self.signal_work[:n]
+        with self.lock:
+            data[:] = self.data_buffer
+            fps = n / (self.times[-1] - self.times[0])
+
+        # Calculate Signal Quality
+        signal_std = np.std(data)
+
+        if signal_std < 0.5:
+            return False
+        detrended = signal.detrend(data)
+
+        detrended_std = np.std(detrended)
+        if detrended_std > 0:
+            detrended -= np.mean(detrended)
+            detrended /= detrended_std
+            normalized = detrended
+        else:
+            return False
+
+        # Bandpass Filter (0.75 Hz - 3.0 Hz = 45-180 BPM)
+        lowcut = self.lowcut
+        highcut = self.highcut
+
+        b, a = self.get_filter_coefficients(fps)
+        filtered = signal.filtfilt(b, a, normalized)
+
+        windowed = np.multiply(filtered, self.get_window(n), out = self.windowed_work[:n])
+
+        # Perform FFT (Because Affect Signal Feature from Light or Movement)
+        fft_data = np.fft.rfft(windowed)
+        fft_freq = np.multiply(self.get_unit_freqs(n), fps, out = self.freq_work[:n // 2 + 1])
+
+        # Find Peak in Frequency Domain (Show Cycle Diversification)
+        fft_abs = np.abs(fft_data, out = self.spectrum_work[:n // 2 + 1])
+
+        # Limit to Heart Rate Range
+        freq_mask = (fft_freq >= lowcut) & (fft_freq <= highcut)
+        masked_fft = fft_abs[freq_mask]
+        masked_freq = fft_freq[freq_mask]
+
+        if len(masked_fft) == 0:
+            return False
+
+        # Find Frequency
+        peak_idx = np.argmax(masked_fft)
+        peak_freq = masked_freq[peak_idx]
+        peak_power = masked_fft[peak_idx]
+
+        # Calculate Signal Quality (SNR Metrics)
+        noise_power = np.mean(masked_fft)
+        if noise_power > 0:
+            self.signal_quality = peak_power / noise_power
+        else:
+            self.signal_quality = 0
+
+        # SNR threshold
+        if self.signal_quality < 2.0:
+            return False
+
+        # Convert to BPM
+        display_bpm = smooth_bpm_reading(peak_freq * 60.0, self.bpm_history, self.bpm_smooth)
+        if display_bpm is None:
+            return False
+
+        self.bpm = display_bpm
+        self.last_valid_bpm = display_bpm
+
+        # Store Spectrum Data
+        self.spectrum_freqs = masked_freq
+        self.spectrum_power = masked_fft
+        return True
+
+    def run(self, source, sinks = (), max_frames = None, target_fps = None):
+        # Headless Loop: Read Source Until Exhausted, Emit Each Result to All Sinks
+        self.is_running = True
+        processed = 0
+        pacer = FramePacer(target_fps) if target_fps else None
+
+        try:
+            while self.is_running:
+                if pacer is not None:
+                    pacer.wait()
+
+                ret, frame, timestamp = source.read()
+                if not ret:
+                    break
+
+                result = self.process_frame(self.prepare_frame(frame), timestamp)
+                for sink in sinks:
+                    sink.emit(result)
+
+                processed += 1
+                if max_frames is not None and processed >= max_frames:
+                    break
+        finally:
+            self.is_running = False
+            source.release()
+            for sink in sinks:
+                sink.close()
+
+        return processed
+
+    def stop(self):
+        self.is_running = False
+
+# Multi-Face Tracking
+class FaceTrack:
+    def __init__(self, track_id, box, buffer_size):
+        # Per-Face Identity, Signal Buffer and BPM State
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+
+        self.data_buffer = deque(maxlen = buffer_size)
+        self.times = deque(maxlen = buffer_size)
+
+        self.bpm = 0
+        self.bpm_history = deque(maxlen = 30)
+        self.bpm_smooth = deque(maxlen = 5)
+        self.signal_quality = 0
+
+        self.spectrum_freqs = []
+        self.spectrum_power = []
+
+def box_iou(boxes_a, boxes_b):
+    # Pairwise IoU of (x, y, w, h) Boxes, Shape (len(a), len(b))
+    a = np.asarray(boxes_a, dtype = float).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype = float).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, None, 2] * a[:, None, 3]) + (b[None, :, 2] * b[None, :, 3]) - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0)
+
+class MultiFaceHeartRateEngine(HeartRateEngine):
+    def __init__(self, max_faces = 8, max_missed = 15, match_iou = 0.3, **kwargs):
+        '''
+            Tracks every detected face with its own buffer and BPM state.
+            - ROI means for all faces come from one integral image per frame
+            - Spectra for all ready faces are computed as one batched FFT,
+              on a shared frame cadence so tracks are estimated together
+            - The largest face in view is the primary track: its BPM, quality,
+              history, spectrum and signal are mirrored into the single-face
+              attributes, so displays built for HeartRateEngine show it
+        '''
+        super().__init__(**kwargs)
+        self.max_faces = max_faces
+        self.max_missed = max_missed
+        self.match_iou = match_iou
+
+        self.tracks = {}
+        self.next_track_id = 1
+
+        # Preallocated Batch Work Array (One Row per Face)
+        self.batch_work = np.zeros((self.max_faces, self.buffer_size))
+
+    def reset(self):
+        super().reset()
+        with self.lock:
+            self.tracks = {}
+        self.next_track_id = 1
+
+    def detect_faces(self, gray):
+        # All Faces, Largest First, at Most max_faces
+        faces = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor = 1.05,
+            minNeighbors = 8,
+            minSize = (150, 150),
+            maxSize = (600, 600),
+            flags = cv2.CASCADE_SCALE_IMAGE
+        )
+
+        if len(faces) == 0:
+            return np.zeros((0, 4), dtype = int)
+
+        faces = np.asarray(faces, dtype = int)
+        order = np.argsort(-(faces[:, 2] * faces[:, 3]))
+        return faces[order[:self.max_faces]]
+
+    def match_tracks(self, faces):
+        # Greedy IoU Matching of Detections to Existing Tracks
+        track_ids = list(self.tracks.keys())
+        assigned = [None] * len(faces)
+
+        if track_ids and len(faces) > 0:
+            iou = box_iou([self.tracks[i].box for i in track_ids], faces)
+            used_tracks = set()
+
+            for flat in np.argsort(-iou, axis = None):
+                t, f = np.unravel_index(flat, iou.shape)
+                if iou[t, f] < self.match_iou:
+                    break
+                if t in used_tracks or assigned[f] is not None:
+                    continue
+                used_tracks.add(t)
+                assigned[f] = self.tracks[track_ids[t]]
+
+        # Unmatched Detections Start New Tracks
+        for f, face in enumerate(faces):
+            if assigned[f] is None:
+                track = FaceTrack(self.next_track_id, tuple(face), self.buffer_size)
+                self.tracks[track.id] = track
+                self.next_track_id += 1
+                assigned[f] = track
+            assigned[f].box = tuple(int(v) for v in face)
+            assigned[f].missed = 0
+
+        # Age Out Tracks Not Seen for max_missed Frames
+        seen = {track.id for track in assigned}
+        for track_id in list(self.tracks.keys()):
+            if track_id not in seen:
+                self.tracks[track_id].missed += 1
+                if self.tracks[track_id].missed > self.max_missed:
+                    del self.tracks[track_id]
+
+        return assigned
+
+    def forehead_boxes(self, faces):
+        # Vectorized forehead_box for (F, 4) Faces
+        x, y, w, h = faces[:, 0], faces[:, 1], faces[:, 2], faces[:, 3]
+        return np.stack([
+            x + (w * 0.3).astype(int),
+            y + (h * 0.1).astype(int),
+            (w * 0.4).astype(int),
+            (h * 0.25).astype(int)
+        ], axis = 1)
+
+    def roi_means(self, frame, boxes):
+        # Green Mean of Every ROI from One Integral Image (O(1) per Face)
+        if len(boxes) == 0:
+            return np.zeros(0)
+
+        frame_h, frame_w = frame.shape[:2]
+        integral = cv2.integral(cv2.extractChannel(frame, 1), sdepth = cv2.CV_64F)
+
+        x1 = np.clip(boxes[:, 0], 0, frame_w)
+        y1 = np.clip(boxes[:, 1], 0, frame_h)
+        x2 = np.clip(boxes[:, 0] + boxes[:, 2], 0, frame_w)
+        y2 = np.clip(boxes[:, 1] + boxes[:, 3], 0, frame_h)
+
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        area = (x2 - x1) * (y2 - y1)
+        return np.where(area > 0, sums / np.maximum(area, 1), np.nan)
+
+    def process_frame(self, frame, timestamp = None):
+        # Process One Prepared Frame for All Faces
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.update_fps(timestamp)
+        self.frame_index += 1
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.detect_faces(gray)
+
+        with self.lock:
+            tracks = self.match_tracks(faces)
+            foreheads = self.forehead_boxes(faces)
+            means = self.roi_means(frame, foreheads)
+
+            for track, value in zip(tracks, means):
+                if np.isfinite(value):
+                    track.data_buffer.append(float(value))
+                    track.times.append(timestamp)
+
+        # Batched Spectral Estimation on a Shared Cadence
+        updated = set()
+        if self.frame_index % self.update_interval == 0:
+            ready = [track for track in tracks if len(track.data_buffer) >= self.buffer_size]
+            if ready:
+                updated = self.calculate_heart_rates(ready)
+
+        # Faces are largest first, so the first track is the primary one
+        if tracks:
+            self.follow_primary(tracks[0])
+
+        return {
+            'timestamp': timestamp,
+            'frame_index': self.frame_index,
+            'fps': round(float(self.actual_fps), 2),
+            'faces': [
+                {
+                    'id': track.id,
+                    'face': [int(v) for v in track.box],
+                    'forehead': [int(v) for v in forehead],
+                    'bpm': round(float(track.bpm), 1) if track.bpm > 0 else None,
+                    'bpm_updated': track.id in updated,
+                    'signal_quality': round(float(track.signal_quality), 2),
+                    'buffer_percent': round(len(track.data_buffer) / self.buffer_size * 100, 1)
+                }
+                for track, forehead in zip(tracks, foreheads)
+            ]
+        }
+
+    def follow_primary(self, track):
+        # Mirror a Track into the Single-Face Attributes (Shared References, No Copies)
+        with self.lock:
+            self.bpm = track.bpm
+            self.signal_quality = track.signal_quality
+            self.bpm_history = track.bpm_history
+            self.spectrum_freqs = track.spectrum_freqs
+            self.spectrum_power = track.spectrum_power
+            self.waveform_data = track.data_buffer
+
+    def calculate_heart_rates(self, tracks):
+        # One Batched Detrend / Filter / FFT per FPS Bucket, Returns Updated Track IDs
+        n = self.buffer_size
+        groups = {}
+        for track in tracks:
+            if track.times[-1] <= track.times[0]:
+                continue
+            fps = n / (track.times[-1] - track.times[0])
+            key = round(fps / self.fps_bucket) * self.fps_bucket
+            groups.setdefault(key, []).append((track, fps))
+
+        updated = set()
+        for members in groups.values():
+            count = len(members)
+            data = self.batch_work[:count]
+            with self.lock:
+                for i, (track, _) in enumerate(members):
+                    data[i] = track.data_buffer
+            fps = np.array([member_fps for _, member_fps in members])
+
+            # Calculate Signal Quality
+            valid = np.std(data, axis = 1) >= 0.5
+            detrended = signal.detrend(data, axis = 1)
+
+            detrended_std = np.std(detrended, axis = 1)
+            valid &= detrended_std > 0
+            detrended -= np.mean(detrended, axis = 1, keepdims = True)
+            detrended /= np.where(detrended_std > 0, detrended_std, 1)[:, None]
+
+            # Bandpass Filter, Window and FFT for All Faces at Once
+            b, a = self.get_filter_coefficients(float(np.mean(fps)))
+            filtered = signal.filtfilt(b, a, detrended, axis = 1)
+            filtered *= self.get_window(n)
+
+            power = np.abs(np.fft.rfft(filtered, axis = 1))
+            freqs = self.get_unit_freqs(n)[None, :] * fps[:, None]
+
+            # Limit to Heart Rate Range (Per-Row Mask)
+            mask = (freqs >= self.lowcut) & (freqs <= self.highcut)
+            masked_power = np.where(mask, power, 0)
+            bins = mask.sum(axis = 1)
+
+            rows = np.arange(count)
+            peak_idx = np.argmax(masked_power, axis = 1)
+            peak_power = masked_power[rows, peak_idx]
+            peak_freq = freqs[rows, peak_idx]
+
+            # Calculate Signal Quality (SNR Metrics)
+            noise_power = masked_power.sum(axis = 1) / np.maximum(bins, 1)
+            quality = np.where(noise_power > 0, peak_power / np.maximum(noise_power, 1e-12), 0)
+
+            for i, (track, _) in enumerate(members):
+                if not valid[i] or bins[i] == 0:
+                    continue
+
+                track.signal_quality = quality[i]
+
+                # SNR threshold
+                if quality[i] < 2.0:
+                    continue
+
+                display_bpm = smooth_bpm_reading(peak_freq[i] * 60.0, track.bpm_history, track.bpm_smooth)
+                if display_bpm is None:
+                    continue
+
+                track.bpm = display_bpm
+                track.spectrum_freqs = freqs[i][mask[i]]
+                track.spectrum_power = power[i][mask[i]]
+                updated.add(track.id)
+
+        return updated
+
+    def annotate(self, frame, result):
+        # Draw Each Tracked Face with Its ID and Reading
+        if not result['faces']:
+            cv2.putText(frame, "No face detected", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            return frame
+
+        for face in result['faces']:
+            x, y, w, h = face['face']
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+
+            forehead_x, forehead_y, forehead_w, forehead_h = face['forehead']
+            cv2.rectangle(
+                frame,
+                (forehead_x, forehead_y),
+                (forehead_x + forehead_w, forehead_y + forehead_h),
+                (255, 0, 0),
+                2
+            )
+
+            label = f"#{face['id']} BPM: {face['bpm']:.0f}" if face['bpm'] else f"#{face['id']} --"
+            cv2.putText(frame, label, (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+        cv2.putText(frame, f"FPS: {self.actual_fps:.1f}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+        return frame
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Headless rPPG heart rate engine")
+    parser.add_argument('--source', choices = ['camera', 'video', 'images'], default = 'camera')
+    parser.add_argument('--path', help = "video file or image directory")
+    parser.add_argument('--camera-index', type = int, default = 0)
+    parser.add_argument('--jsonl', help = "append results to this JSONL file")
+    parser.add_argument('--socket', help = "send results to host:port as JSON lines")
+    parser.add_argument('--max-frames', type = int, default = None)
+    parser.add_argument('--multi-face', action = 'store_true', help = "track every face in view")
+    args = parser.parse_args()
+
+    if args.source == 'camera':
+        source = LatestFrameSource(CameraSource(args.camera_index))
+    elif args.source == 'video':
+        source = VideoFileSource(args.path)
+    else:
+        source = ImageDirectorySource(args.path)
+
+    if not source.is_opened():
+        print("❌ Cannot open source")
+        raise SystemExit(1)
+
+    def print_result(result):
+        # Print Each New BPM Reading (Every Tracked Face in Multi-Face Mode)
+        if 'faces' in result:
+            for face in result['faces']:
+                if face['bpm_updated']:
+                    print(f"#{face['id']} BPM: {face['bpm']}")
+        elif result['bpm_updated']:
+            print(f"BPM: {result['bpm']}")
+
+    engine = MultiFaceHeartRateEngine() if args.multi_face else HeartRateEngine()
+    sinks = [CallbackSink(print_result)]
+
+    if args.jsonl:
+        sinks.append(JsonlSink(args.jsonl))
+    if args.socket:
+        host, port = args.socket.rsplit(':', 1)
+        sinks.append(SocketSink(host, int(port)))
+
+    start = time.time()
+    count = engine.run(source, sinks, max_frames = args.max_frames)
+    elapsed = time.time() - start
+    print(f"Processed {count} frames in {elapsed:.1f}s ({count / elapsed if elapsed > 0 else 0:.1f} fps)")
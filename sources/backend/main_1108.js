@@ -2,6 +2,8 @@ let cameraActive = false;           // open camera or not
 let recording = false;              // control recording staus
 let updateInterval = null;          // data flow time interval
 let heartRateInterval = null;
+let eventSource = null;             // server-sent events (heart rate, recording, queue)
+let queueState = null;              // last queue health state logged
 let videoStream = null;
 let videoElement = null;
 let canvasElement = null;
@@ -390,6 +392,9 @@ function sendFrameWithRetry(imageData, attemptCount) {
 }
 
 function startHeartRateMonitoring() {
+    // Heart rate arrives on the event stream; poll only where EventSource is missing
+    if (window.EventSource) return;
+    
     // Update heart rate display periodically
     heartRateInterval = setInterval(() => {
         fetch('/get_heart_rate')
@@ -501,8 +506,41 @@ function showStatus(message, type) {
 }
 
 function startUpdating() {
-    // Monitor queue status periodically
-    updateInterval = setInterval(checkQueueStatus, 5000); // Every 5 seconds
+    // Subscribe to the server's event stream; poll queue status where EventSource is missing
+    if (!window.EventSource) {
+        updateInterval = setInterval(checkQueueStatus, 5000); // Every 5 seconds
+        return;
+    }
+    
+    eventSource = new EventSource('/events');
+    eventSource.addEventListener('heart_rate', event => {
+        const data = JSON.parse(event.data);
+        updateHeartRateDisplay(data.bpm, data.detecting);
+    });
+    eventSource.addEventListener('recording', event => {
+        const data = JSON.parse(event.data);
+        if (data.is_recording !== recording) {
+            // Recording started / stopped from another page
+            recording = data.is_recording;
+            document.getElementById('btnRecord').disabled = recording;
+            document.getElementById('btnStop').disabled = !recording;
+        }
+    });
+    eventSource.addEventListener('queue', event => {
+        // Log transitions only (the event also fires when other queue fields change)
+        const data = JSON.parse(event.data);
+        if (data.state === queueState) return;
+        queueState = data.state;
+        if (data.state !== 'ok') {
+            console.warn('[WARN] Server queue', data.state);
+        } else {
+            console.log('[INFO] Server queue ok');
+        }
+    });
+    eventSource.onerror = () => {
+        // The browser reconnects by itself (retry interval set by the server)
+        console.warn('[WARN] Event stream interrupted, reconnecting');
+    };
 }
 
 function stopUpdating() {
@@ -510,6 +548,10 @@ function stopUpdating() {
         clearInterval(updateInterval);
         updateInterval = null;
     }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
 }
 
 function checkQueueStatus() {
@@ -33,9 +33,28 @@ const MAX_DATA_POINTS = 50;
 // Frame interval: 100 ms to reduce server load (10 FPS)
 const FRAME_INTERVAL = 100;
 
+// Capture interval / size currently recommended by the server ('capture' in every reply)
+let frameInterval = FRAME_INTERVAL;
+
 // Maximum attempts for processing
 const MAX_RETRY_ATTEMPTS = 3;
 
+// Version of the last result shown; the server answers 'unchanged' instead of resending it
+let lastResultVersion = null;
+let lastResultEpoch = null;
+
+// Session id so the server keeps per-tab processing state
+const SESSION_ID = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+
+// Lets a front proxy keep this tab on one server worker (see gunicorn_conf.py)
+const SESSION_HEADERS = { 'X-Session-Id': SESSION_ID };
+
+// Server-sent events: results, recording and queue health pushed by the server
+let eventSource = null;
+let queueState = null;
+
 function toggleCamera() {
     const btn = document.getElementById('btnCamera');
     
@@ -118,11 +137,14 @@ function stopCamera() {
     
     stopUpdating();
     recording = false;
+    lastResultVersion = null;
+    lastResultEpoch = null;
+    frameInterval = FRAME_INTERVAL;
 }
 
 function initProcessingThread() {
     // Initialize backend processing thread
-    fetch('/start_processing', { method: 'POST' })
+    fetch('/start_processing', { method: 'POST', headers: SESSION_HEADERS })
         .then(response => response.json())
         .then(data => {
             console.log('[INFO] Processing thread initialized:', data.message);
@@ -150,14 +172,13 @@ function startProcessingFrames() {
     if (!cameraActive) return;
     
     const ctx = canvasElement.getContext('2d');
-    const videoFeed = document.getElementById('videoFeed');
     
     function processFrame() {
         if (!cameraActive || !videoElement) return;
         
         // Skip if already processing a frame (prevent queue buildup)
         if (processingFrame) {
-            setTimeout(processFrame, FRAME_INTERVAL);
+            setTimeout(processFrame, frameInterval);
             return;
         }
         
@@ -171,25 +192,14 @@ function startProcessingFrames() {
         
         // Send to backend for processing
         sendFrameWithRetry(imageData, 0)
-            .then(data => {
-                if (data.status === 'success' && data.image) {
-                    // Display processed image
-                    videoFeed.src = data.image;
-                    
-                    // Update visualizations with pose data
-                    if (data.landmarks) {
-                        updateLineChart(data.landmarks);
-                        update3DPlots(data.landmarks);
-                    }
-                }
-            })
+            .then(showResult)
             .catch(error => {
                 console.error('[ERROR] Frame processing failed:', error);
             })
             .finally(() => {
                 processingFrame = false;
-                // Schedule next frame
-                setTimeout(processFrame, FRAME_INTERVAL);
+                // Schedule next frame at the server's pace (frames it cannot process are never sent)
+                setTimeout(processFrame, frameInterval);
             });
     }
     
@@ -197,14 +207,53 @@ function startProcessingFrames() {
     processFrame();
 }
 
+function showResult(data) {
+    // Show a result from a /process_frame reply or a 'result' event (each version once)
+    applyCaptureSettings(data.capture);
+    
+    // Versions restart when the server recreates the session, so the epoch is compared too
+    if (data.status === 'success' && data.image_url &&
+            (data.version !== lastResultVersion || data.epoch !== lastResultEpoch)) {
+        lastResultVersion = data.version;
+        lastResultEpoch = data.epoch;
+        
+        // Display processed image (binary JPEG, fetched and cached by the browser)
+        document.getElementById('videoFeed').src = data.image_url;
+        
+        // Update visualizations with pose data
+        if (data.landmarks) {
+            updateLineChart(data.landmarks, data.kinematics);
+            update3DPlots(data.landmarks);
+        }
+    }
+}
+
+function applyCaptureSettings(capture) {
+    // Adopt the server-recommended capture interval and resolution
+    if (!capture) return;
+    
+    frameInterval = capture.interval_ms || FRAME_INTERVAL;
+    if (canvasElement && capture.width && canvasElement.width !== capture.width) {
+        canvasElement.width = capture.width;
+        canvasElement.height = capture.height;
+        console.log(`[INFO] Capture size set to ${capture.width}x${capture.height}`);
+    }
+}
+
 function sendFrameWithRetry(imageData, attemptCount) {
     // Retry mechanism to handle temporary network issues
     return fetch('/process_frame', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            ...SESSION_HEADERS
         },
-        body: JSON.stringify({ image: imageData })
+        body: JSON.stringify({
+            image: imageData,
+            session_id: SESSION_ID,
+            last_version: lastResultVersion,
+            last_epoch: lastResultEpoch
+        })
     })
     .then(response => {
         if (!response.ok) {
@@ -225,7 +274,7 @@ function sendFrameWithRetry(imageData, attemptCount) {
 }
 
 function startRecording() {
-    fetch('/start_recording', { method: 'POST' })
+    fetch('/start_recording', { method: 'POST', headers: SESSION_HEADERS })
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
@@ -266,7 +315,7 @@ function startRecording() {
 }
 
 function stopRecording() {
-    fetch('/stop_recording', { method: 'POST' })
+    fetch('/stop_recording', { method: 'POST', headers: SESSION_HEADERS })
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
@@ -296,8 +345,30 @@ function showStatus(message, type) {
 }
 
 function startUpdating() {
-    // Monitor queue status periodically
-    updateInterval = setInterval(checkQueueStatus, 5000); // Every 5 seconds
+    // Subscribe to the session's event stream; poll queue status where EventSource is missing
+    if (!window.EventSource) {
+        updateInterval = setInterval(checkQueueStatus, 5000); // Every 5 seconds
+        return;
+    }
+    
+    eventSource = new EventSource(`/events?session_id=${encodeURIComponent(SESSION_ID)}`);
+    eventSource.addEventListener('result', event => showResult(JSON.parse(event.data)));
+    eventSource.addEventListener('recording', event => updateRecordingState(JSON.parse(event.data)));
+    eventSource.addEventListener('queue', event => {
+        // Log transitions only (the event also fires when other queue fields change)
+        const data = JSON.parse(event.data);
+        if (data.state === queueState) return;
+        queueState = data.state;
+        if (data.state !== 'ok') {
+            console.warn('[WARN] Server queue', data.state);
+        } else {
+            console.log('[INFO] Server queue ok');
+        }
+    });
+    eventSource.onerror = () => {
+        // The browser reconnects by itself (retry interval set by the server)
+        console.warn('[WARN] Event stream interrupted, reconnecting');
+    };
 }
 
 function stopUpdating() {
@@ -305,11 +376,27 @@ function stopUpdating() {
         clearInterval(updateInterval);
         updateInterval = null;
     }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+}
+
+function updateRecordingState(data) {
+    // Follow recording started / stopped elsewhere (another tab or the instructor)
+    if (!cameraActive || data.is_recording === recording) return;
+    
+    recording = data.is_recording;
+    document.getElementById('btnRecord').disabled = recording;
+    document.getElementById('btnStop').disabled = !recording;
+    if (recording) {
+        showStatus('開始記錄資料', 'recording');
+    }
 }
 
 function checkQueueStatus() {
     // Monitor backend queue status for debugging
-    fetch('/queue_status')
+    fetch('/queue_status', { headers: SESSION_HEADERS })
         .then(response => response.json())
         .then(data => {
             console.log('[INFO] Queue status:', data);
@@ -623,7 +710,7 @@ function updateMetricsDisplay() {
     
 }
 
-function updateLineChart(landmarks) {
+function updateLineChart(landmarks, kinematics) {
     if (!landmarks || !landmarks[13] || !landmarks[14] || !landmarks[15] || !landmarks[16]) {
         return;
     }
@@ -649,7 +736,31 @@ function updateLineChart(landmarks) {
         'xaxis.range': [Math.max(0, elapsedTime - 10), elapsedTime]
     });
 
-    updateMotionMetrics(landmarks);
+    // Prefer the server's kinematics (3D, every joint chain); compute locally for older servers
+    if (kinematics) {
+        applyServerKinematics(kinematics);
+    } else {
+        updateMotionMetrics(landmarks);
+    }
+}
+
+function applyServerKinematics(kinematics) {
+    // Show metrics computed on the server instead of recomputing them per frame
+    const format = (value, scale, digits) =>
+        (value === null || value === undefined) ? '-' : (value * scale).toFixed(digits);
+    const angle = kinematics.angle || {};
+    const speed = kinematics.speed || {};
+    const acceleration = kinematics.acceleration || {};
+    
+    // The elbow chain's distal point is the wrist; x100 keeps the percent-of-frame units used before
+    motionTracker.metrics = {
+        leftElbowAngle: format(angle.left_elbow, 1, 1),
+        rightElbowAngle: format(angle.right_elbow, 1, 1),
+        speed: format(speed.left_elbow, 100, 2),
+        acceleration: format(acceleration.left_elbow, 100, 2)
+    };
+    
+    updateMetricsDisplay();
 }
 
 // Initialize empty plots on page load